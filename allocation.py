@@ -0,0 +1,149 @@
+# allocation.py
+import numpy as np
+import pandas as pd
+
+from window_index import month_ordinal
+
+# Stock/bond allocation sweep with periodic rebalancing.
+#
+# Between two rebalancing dates the stock and bond sleeves grow on their own, so the portfolio
+# value at month t is the value at the last rebalancing date times w * S(t) + (1 - w) * B(t), with
+# S and B the sleeves' growth since that date. The per-period growth of every allocation is one
+# (allocations x periods) product, compounded with a cumulative product, which evaluates the whole
+# allocation grid for a rebalancing frequency as a handful of 2-D array operations.
+
+# Months between rebalancing dates (None: buy and hold, never rebalanced)
+REBALANCING_FREQUENCIES = {'Monthly': 1, 'Quarterly': 3, 'Annually': 12, 'Never': None}
+
+# Return series of each sleeve in monte_carlo.build_monthly_returns
+SLEEVE_RETURNS = {'Nominal': ('total', 'bond'), 'Real': ('real_total', 'real_bond')}
+
+DEFAULT_ALLOCATIONS = np.linspace(0, 1, 101)
+
+
+def window_returns(monthly_returns, begin_date, end_date, data_type="Nominal"):
+    """
+    Selects the monthly stock and bond growth ratios between two dates.
+
+    Parameters:
+    - monthly_returns (dict): Output of monte_carlo.build_monthly_returns.
+    - begin_date, end_date (str or datetime): Window; the ratios cover begin month to end month.
+    - data_type (str): "Nominal" (Total Return, nominal_total_return) or "Real" (Real Total Return,
+      real_total_return).
+
+    Returns:
+    - tuple: (stock ratios, bond ratios) as NumPy arrays, one entry per month after the begin month.
+    """
+    stock_key, bond_key = SLEEVE_RETURNS[data_type]
+    months = monthly_returns['months']
+    begin, end = month_ordinal(begin_date, 'begin'), month_ordinal(end_date, 'end')
+    if begin < months[0] - 1 or end > months[-1]:
+        first, last = months[0] - 1, months[-1]
+        raise ValueError(
+            f"Stock and bond data are only available together from {first // 12}-{first % 12 + 1:02} "
+            f"to {last // 12}-{last % 12 + 1:02}."
+        )
+    selected = (months > begin) & (months <= end)
+    if not selected.any():
+        raise ValueError(f"No monthly returns between {begin_date} and {end_date}.")
+    return monthly_returns[stock_key][selected], monthly_returns[bond_key][selected]
+
+
+def simulate_allocations(stock_returns, bond_returns, allocations=DEFAULT_ALLOCATIONS, rebalance_months=1,
+                         initial_investment=1.0):
+    """
+    Value paths of stock/bond portfolios rebalanced to fixed weights every rebalance_months.
+
+    Parameters:
+    - stock_returns, bond_returns (np.ndarray): Monthly growth ratios of the two sleeves.
+    - allocations (array-like): Stock shares between 0 and 1.
+    - rebalance_months (int or None): Months between rebalancing dates; None never rebalances.
+    - initial_investment (float): Starting value of every portfolio.
+
+    Returns:
+    - np.ndarray: (allocations x months + 1) values, starting with initial_investment.
+    """
+    stock_weight = np.asarray(allocations, dtype=float)[:, None]
+    n_months = len(stock_returns)
+    period = n_months if rebalance_months is None else max(int(rebalance_months), 1)
+
+    stock_level = np.concatenate([[1.0], np.cumprod(stock_returns)])
+    bond_level = np.concatenate([[1.0], np.cumprod(bond_returns)])
+
+    # Growth of each sleeve since the last rebalancing date, for every month
+    months = np.arange(1, n_months + 1)
+    period_start = (months - 1) // period * period
+    stock_growth = stock_level[months] / stock_level[period_start]
+    bond_growth = bond_level[months] / bond_level[period_start]
+    mix = stock_weight * stock_growth + (1 - stock_weight) * bond_growth
+
+    # Portfolio value on each rebalancing date: the compounded growth of the full periods before it
+    period_ends = np.append(np.arange(period, n_months, period), n_months) - 1
+    value_at_start = np.ones((len(stock_weight), len(period_ends)))
+    np.cumprod(mix[:, period_ends[:-1]], axis=1, out=value_at_start[:, 1:])
+
+    values = np.empty((len(stock_weight), n_months + 1))
+    values[:, 0] = 1.0
+    values[:, 1:] = value_at_start[:, period_start // period] * mix
+    return initial_investment * values
+
+
+def path_statistics(values):
+    """
+    Ending value, annualized return, annualized volatility and maximum drawdown of value paths.
+
+    Parameters:
+    - values (np.ndarray): (paths x months + 1) monthly values, e.g. from simulate_allocations.
+
+    Returns:
+    - dict: NumPy arrays 'Ending Value', 'CAGR', 'Volatility' and 'Max Drawdown' (a negative
+      fraction), one entry per path. Volatility is NaN for paths shorter than two months.
+    """
+    n_months = values.shape[1] - 1
+    monthly = values[:, 1:] / values[:, :-1] - 1
+    volatility = monthly.std(axis=1, ddof=1) * np.sqrt(12) if n_months > 1 else np.full(len(values), np.nan)
+    drawdown = values / np.maximum.accumulate(values, axis=1) - 1
+    return {
+        'Ending Value': values[:, -1],
+        'CAGR': (values[:, -1] / values[:, 0]) ** (12 / n_months) - 1,
+        'Volatility': volatility,
+        'Max Drawdown': drawdown.min(axis=1),
+    }
+
+
+def sweep_allocations(monthly_returns, begin_date, end_date, data_type="Nominal", initial_investment=10000,
+                      allocations=DEFAULT_ALLOCATIONS, frequencies=REBALANCING_FREQUENCIES):
+    """
+    Evaluates every stock allocation and rebalancing frequency over one window.
+
+    Parameters:
+    - monthly_returns (dict): Output of monte_carlo.build_monthly_returns.
+    - begin_date, end_date (str or datetime): Window.
+    - data_type (str): "Nominal" or "Real".
+    - initial_investment (float): Starting value of every portfolio.
+    - allocations (array-like): Stock shares between 0 and 1 (default 0-100% in 1% steps).
+    - frequencies (dict): {label: months between rebalancing dates or None}.
+
+    Returns:
+    - pd.DataFrame: One row per (frequency, allocation) with 'Rebalancing', 'Stock Allocation'
+      (fraction), 'Ending Value', 'CAGR', 'Volatility' and 'Max Drawdown' (numeric).
+    """
+    stock_returns, bond_returns = window_returns(monthly_returns, begin_date, end_date, data_type)
+    allocations = np.asarray(allocations, dtype=float)
+    frames = []
+    for label, rebalance_months in frequencies.items():
+        values = simulate_allocations(stock_returns, bond_returns, allocations, rebalance_months, initial_investment)
+        frames.append(pd.DataFrame({
+            'Rebalancing': label,
+            'Stock Allocation': allocations,
+            **path_statistics(values),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_allocations(sweep, column='Ending Value'):
+    """
+    Returns the row with the highest value of a column for each rebalancing frequency.
+    """
+    best = sweep.loc[sweep.groupby('Rebalancing', sort=False)[column].idxmax()]
+    return best.reset_index(drop=True)
@@ -0,0 +1,496 @@
+# batch_report.py
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import config
+from data_loader import load_data, load_bear_market_periods, load_recession_data
+from ltc_bonds import load_data as load_bond_data, calculate_bond_windows
+from market_dataset import MarketDataset
+from metrics import period_begin_date
+from bears import calculate_bear_market_metrics, build_bear_market_index
+from recession_data import calculate_recession_metrics, build_recession_index
+from window_index import WindowIndex, DIVIDEND_STRATEGIES
+
+# Headless batch report: the tables main.py shows for one period, computed for many scenarios.
+#
+# A scenario is (label, begin 'YYYY-MM', end 'YYYY-MM', initial investment). The comparison and
+# income tables of all scenarios are computed in one vectorized pass over a WindowIndex and
+# ltc_bonds.calculate_bond_windows, and assembled column-wise instead of as one small DataFrame per
+# scenario. Only the bear market / recession summaries are computed per distinct period; they are
+# spread over a process pool whose workers load the data once. Large .xlsx reports spend most of
+# their time in the workbook writer; .parquet output is much faster to write.
+#
+#   python batch_report.py --predefined --end-dates 2000-01 2024-09 --output report.xlsx
+#   python batch_report.py --begin-dates 1950-01 2000-01 --end-dates 1980-01 2024-09 --step 12 \
+#       --investments 10000 100000 --output report.parquet
+#   python batch_report.py --scenarios scenarios.csv --output report.xlsx
+
+SCENARIO_COLUMNS = ['Scenario', 'Begin Date', 'End Date', 'Initial Investment']
+DEFAULT_INVESTMENTS = [10000]
+
+# Table name -> sheet name in the output workbook
+REPORT_TABLES = {
+    'comparison': 'Comparison Tables',
+    'income': 'Income Metrics',
+    'bear_markets': 'Bear Market Summary',
+    'recessions': 'Recession Summary',
+    'errors': 'Errors',
+}
+
+# Data shared by the tasks of one worker process, loaded by _init_worker
+_worker_data = {}
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+
+def month_range(first, last, step=1):
+    """
+    Returns the 'YYYY-MM' months from first to last (inclusive) every `step` months.
+    """
+    return pd.period_range(first, last, freq='M')[::step].strftime('%Y-%m').tolist()
+
+
+def predefined_scenarios(end_dates, investments=DEFAULT_INVESTMENTS, periods=None):
+    """
+    Returns one scenario per predefined period, end date and investment amount.
+
+    Parameters:
+    - end_dates (list): End dates in 'YYYY-MM' format.
+    - investments (list): Initial investment amounts.
+    - periods (dict, optional): Label -> years or fixed begin date; defaults to config.PREDEFINED_PERIODS.
+
+    Returns:
+    - list: (label, begin_date, end_date, initial_investment) tuples; periods that would begin
+      after their end date are skipped.
+    """
+    periods = config.PREDEFINED_PERIODS if periods is None else periods
+    scenarios = []
+    for end_date in end_dates:
+        for label, period in periods.items():
+            begin_date = period_begin_date(period, end_date)
+            if begin_date >= end_date:
+                continue
+            scenarios.extend((label, begin_date, end_date, amount) for amount in investments)
+    return scenarios
+
+
+def grid_scenarios(begin_dates, end_dates, investments=DEFAULT_INVESTMENTS):
+    """
+    Returns a scenario for every begin date, later end date and investment amount.
+    """
+    return [
+        (f"{begin_date} to {end_date}", begin_date, end_date, amount)
+        for begin_date in begin_dates
+        for end_date in end_dates
+        if begin_date < end_date
+        for amount in investments
+    ]
+
+
+def read_scenarios(path, investments=DEFAULT_INVESTMENTS):
+    """
+    Reads scenarios from a CSV file with 'Begin Date' and 'End Date' columns ('YYYY-MM') and
+    optional 'Scenario' and 'Initial Investment' columns. Rows without an investment amount are
+    expanded over `investments`. Rows whose dates are missing, unparseable or not in order
+    (begin before end, as in grid_scenarios) are skipped with a warning on stderr.
+    """
+    table = pd.read_csv(path, dtype={'Begin Date': str, 'End Date': str})
+    scenarios = []
+    for line, row in enumerate(table.to_dict('records'), start=2):
+        begin, end = (pd.to_datetime(row[column], format='%Y-%m', errors='coerce')
+                      for column in ['Begin Date', 'End Date'])
+        if pd.isna(begin) or pd.isna(end) or begin >= end:
+            print(f"Skipping scenario on line {line} of '{path}': begin date {row['Begin Date']} must be a "
+                  f"'YYYY-MM' month before end date {row['End Date']}.", file=sys.stderr)
+            continue
+        label = row.get('Scenario')
+        if not isinstance(label, str):
+            label = f"{row['Begin Date']} to {row['End Date']}"
+        amount = row.get('Initial Investment')
+        amounts = investments if amount is None or pd.isna(amount) else [float(amount)]
+        scenarios.extend((label, row['Begin Date'], row['End Date'], value) for value in amounts)
+    return scenarios
+
+
+# -----------------------------
+# Computation
+# -----------------------------
+
+def load_inputs():
+    """
+    Loads the market, bond, bear market and recession data the report is computed from.
+    """
+    return {
+        'market_data': MarketDataset.from_frame(load_data()),
+        'bond_data': load_bond_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds'),
+        'bear_market_data': load_bear_market_periods(),
+        'recession_data': load_recession_data(),
+    }
+
+
+def prepare_inputs(inputs):
+    """
+    Returns the inputs plus the bear market / recession interval indexes and an empty memo of event
+    summaries, which compute_event_summaries uses to reuse the summary of an identical set of events.
+    """
+    return {
+        **inputs,
+        'bear_index': build_bear_market_index(inputs['bear_market_data']),
+        'recession_index': build_recession_index(inputs['recession_data']),
+        'summaries': {},
+    }
+
+
+def _init_worker(inputs):
+    _worker_data.update(prepare_inputs(inputs))
+
+
+def _event_summary(inputs, kind, begin_date, end_date):
+    # The bear market and recession summaries only depend on which events lie inside the period,
+    # so they are memoized under that set of events (returned as the key)
+    index = inputs[f'{kind}_index']
+    window = index.window(begin_date, end_date)
+    key = (kind, window if isinstance(window, tuple) else tuple(window))
+    if key not in inputs['summaries']:
+        if kind == 'bear':
+            summary = calculate_bear_market_metrics(index, begin_date, end_date)[0]
+        else:
+            summary = calculate_recession_metrics(index, begin_date, end_date)[0]
+        inputs['summaries'][key] = summary.to_frame() if summary is not None else None
+    return key, inputs['summaries'][key]
+
+
+def compute_event_summaries(begin_date, end_date, inputs=None):
+    """
+    Computes the bear market and recession summaries of one period.
+
+    Parameters:
+    - begin_date (str): Begin date in 'YYYY-MM' format.
+    - end_date (str): End date in 'YYYY-MM' format.
+    - inputs (dict, optional): Data from prepare_inputs; defaults to the data loaded by the worker.
+
+    Returns:
+    - dict: 'bear_markets' and 'recessions' -> (key, DataFrame or None), where equal keys mean
+      equal summaries, and 'errors' -> list of (section, message) pairs.
+    """
+    inputs = inputs if inputs is not None else _worker_data
+    results = {'bear_markets': (None, None), 'recessions': (None, None), 'errors': []}
+    for kind, name in [('bear', 'bear_markets'), ('recession', 'recessions')]:
+        try:
+            results[name] = _event_summary(inputs, kind, begin_date, end_date)
+        except Exception as e:
+            results['errors'].append((name, str(e)))
+    return results
+
+
+def _compute_event_summaries_task(period):
+    return compute_event_summaries(*period)
+
+
+def _scenario_arrays(scenarios):
+    # One object array per scenario column, for selecting and repeating scenarios by position
+    arrays = [np.empty(len(scenarios), dtype=object) for _ in SCENARIO_COLUMNS]
+    for position, array in enumerate(arrays):
+        array[:] = [scenario[position] for scenario in scenarios]
+    return arrays
+
+
+def _block_table(scenario_arrays, rows, columns):
+    # A block of k rows per selected scenario: the scenario columns repeated k times, then each
+    # (scenarios, k) column array flattened scenario by scenario
+    block_rows = next(iter(columns.values())).shape[1]
+    table = {name: np.repeat(values[rows], block_rows) for name, values in zip(SCENARIO_COLUMNS, scenario_arrays)}
+    table.update({name: values[rows].ravel() for name, values in columns.items()})
+    return pd.DataFrame(table).infer_objects()
+
+
+def _row_labels(labels, n):
+    return np.broadcast_to(np.array(labels, dtype=object), (n, len(labels)))
+
+
+def compute_window_tables(scenarios, inputs, window_index=None):
+    """
+    Computes the comparison and income tables of every scenario in one vectorized pass.
+
+    The stock strategies and CPI come from WindowIndex lookups and the bond strategies from
+    ltc_bonds.calculate_bond_windows, so each window costs a few array reads; the tables are then
+    assembled column-wise. The values are those of investment_comparison.create_comparison_table
+    and income_metrics.calculate_income_metrics, and the scenarios those functions reject (no market
+    data in the period, a single bond row, no bond data for the income table) become errors.
+
+    Parameters:
+    - scenarios (list): (label, begin_date, end_date, initial_investment) tuples.
+    - inputs (dict): Data from load_inputs.
+    - window_index (WindowIndex, optional): Index over the inputs; built here when omitted.
+
+    Returns:
+    - dict: 'comparison' and 'income' -> DataFrame with the scenario columns first, in scenario
+      order, and 'errors' -> list of (scenario position, section, message) triples.
+    """
+    index = window_index if window_index is not None else WindowIndex(inputs['market_data'], inputs['bond_data'])
+    scenario_arrays = _scenario_arrays(scenarios)
+    _, begin_dates, end_dates, amounts = scenario_arrays
+    n = len(scenarios)
+    investment = amounts.astype(float)
+
+    sb, se, stock_valid = index.stock_windows(begin_dates, end_dates)
+    bb, be, bond_valid = index.bond_windows(begin_dates, end_dates)
+    bond_rows = np.where(bond_valid, be - bb + 1, 0)
+    # calculate_bond_windows leaves windows without bond rows NaN, as the tables show them
+    bonds = calculate_bond_windows(inputs['bond_data'], begin_dates, end_dates)
+
+    stocks = {
+        strategy: (index.total_dividends_at(strategy, sb, se, investment),
+                   index.ending_value_at(strategy, sb, se, investment))
+        for strategy in DIVIDEND_STRATEGIES
+    }
+    bond_interest = {key: investment * bonds[key]['Total Interest'] for key in bonds}
+    bond_value = {key: investment * bonds[key]['Ending Value'] for key in bonds}
+
+    # Real bonds held without reinvestment lose the CPI increase over the period
+    cpi = index.stocks.values['CPI']
+    cpi_begin, cpi_end = cpi[sb], cpi[se]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cpi_increase_factor = np.where(cpi_begin > 0, cpi_end / cpi_begin, 1.0)
+
+    nan = np.full(n, np.nan)
+    comparison_columns = {'Strategy': [], 'Total Dividends/Interest': [], 'Ending Value': []}
+    for data_type in ["Nominal", "Real"]:
+        bond_no_reinvestment_value = bond_value[f"{data_type}_No_Reinvestment"]
+        if data_type == "Real":
+            bond_no_reinvestment_value = np.where(bond_valid, investment / cpi_increase_factor, np.nan)
+        comparison_columns['Strategy'].append(_row_labels([
+            f"{data_type} SP500 Investment–No Reinvestment",
+            f"{data_type} Bonds Investment–No Reinvestment",
+            f"{data_type} SP500 Investment–With Reinvestment",
+            f"{data_type} Bonds Investment–With Reinvestment",
+        ], n))
+        comparison_columns['Total Dividends/Interest'].append(np.column_stack([
+            stocks[f"{data_type}_No_Reinvestment"][0], bond_interest[f"{data_type}_No_Reinvestment"], nan, nan,
+        ]))
+        comparison_columns['Ending Value'].append(np.column_stack([
+            stocks[f"{data_type}_No_Reinvestment"][1], bond_no_reinvestment_value,
+            stocks[f"{data_type}_With_Reinvestment"][1], bond_value[f"{data_type}_With_Reinvestment"],
+        ]))
+    comparison_columns = {name: np.hstack(blocks) for name, blocks in comparison_columns.items()}
+
+    # Current income: the latest dividend yield and bond rate applied to the nominal ending values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dividend_rate = index.stocks.values['Nominal Dividends'][se] / index.stocks.values['Composite'][se]
+    bond_rate = index.bonds.values['nominal_interest'][be]
+    ending_values = np.column_stack([
+        stocks["Nominal_No_Reinvestment"][1], bond_value["Nominal_No_Reinvestment"],
+        stocks["Nominal_With_Reinvestment"][1], bond_value["Nominal_With_Reinvestment"],
+    ])
+    current_income = ending_values * np.column_stack([dividend_rate, bond_rate, dividend_rate, bond_rate])
+    income_columns = {
+        'Category': _row_labels([
+            "Nominal SP500 Investment–No Reinvestment",
+            "Nominal Bonds Investment–No Reinvestment",
+            "Nominal SP500 Investment–With Reinvestment",
+            "Nominal Bonds Investment–With Reinvestment",
+        ], n),
+        'Initial Value': np.repeat(amounts[:, None], 4, axis=1),
+        'Ending Value': ending_values,
+        'Current Income': current_income,
+        'Current Income as % of Original Investment': current_income / investment[:, None] * 100,
+    }
+
+    comparison_valid = stock_valid & (bond_rows != 1)
+    income_valid = stock_valid & (bond_rows >= 2)
+    errors = []
+    for position in np.flatnonzero(~income_valid):
+        begin_date, end_date = begin_dates[position], end_dates[position]
+        if not stock_valid[position]:
+            errors.append((position, 'results', f"No data available between {begin_date} and {end_date}."))
+            continue
+        if bond_rows[position] == 1:
+            errors.append((position, 'comparison', "Error creating the comparison table: Insufficient data to "
+                                                   "calculate nominal reinvestment strategy."))
+        errors.append((position, 'income', "Error calculating income metrics: Not enough bond data between "
+                                           f"{begin_date} and {end_date}."))
+
+    return {
+        'comparison': _block_table(scenario_arrays, np.flatnonzero(comparison_valid), comparison_columns),
+        'income': _block_table(scenario_arrays, np.flatnonzero(income_valid), income_columns),
+        'errors': errors,
+    }
+
+
+def _stack(scenario_arrays, entries):
+    # Stacks (scenario position, table) pairs in order with the scenario columns first. Entries
+    # mostly share a few tables (one summary per set of events), so each distinct table is
+    # concatenated once and its rows repeated.
+    if not entries:
+        return pd.DataFrame(columns=SCENARIO_COLUMNS)
+    distinct = {}
+    for _, table in entries:
+        distinct.setdefault(id(table), (len(distinct), table))
+    tables = [table for _, table in distinct.values()]
+    lengths = np.array([len(table) for table in tables])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    which = np.array([distinct[id(table)][0] for _, table in entries])
+    positions = np.array([position for position, _ in entries])
+    entry_lengths = lengths[which]
+    # Row numbers of each entry's table inside the concatenation, entry after entry
+    rows = np.repeat(offsets[which] - np.cumsum(entry_lengths) + entry_lengths, entry_lengths)
+    rows += np.arange(entry_lengths.sum())
+
+    stacked = pd.concat(tables, ignore_index=True).iloc[rows].reset_index(drop=True)
+    for column_position, (column, values) in enumerate(zip(SCENARIO_COLUMNS, scenario_arrays)):
+        stacked.insert(column_position, column, np.repeat(values[positions], entry_lengths))
+    return stacked.infer_objects()
+
+
+def _error_table(scenario_arrays, errors):
+    # (scenario position, section, message) triples as the Errors table, in scenario order
+    errors = sorted(errors, key=lambda error: error[0])
+    positions = np.array([position for position, _, _ in errors], dtype=np.int64)
+    table = {name: values[positions] for name, values in zip(SCENARIO_COLUMNS, scenario_arrays)}
+    table['Section'] = [section for _, section, _ in errors]
+    table['Error'] = [message for _, _, message in errors]
+    return pd.DataFrame(table).infer_objects()
+
+
+def run_batch(scenarios, workers=None, inputs=None):
+    """
+    Computes the report tables for a list of scenarios.
+
+    The comparison and income tables are computed for all scenarios at once (compute_window_tables);
+    the bear market and recession summaries once per distinct period, spread over the worker
+    processes.
+
+    Parameters:
+    - scenarios (list): (label, begin_date, end_date, initial_investment) tuples.
+    - workers (int, optional): Worker processes; defaults to the CPU count. With 1 worker (or a
+      single period) everything runs in this process.
+    - inputs (dict, optional): Data from load_inputs, loaded here when omitted.
+
+    Returns:
+    - dict: Table name (see REPORT_TABLES) -> DataFrame with the scenario columns first, in scenario order.
+    """
+    inputs = inputs if inputs is not None else load_inputs()
+    if not scenarios:
+        return {name: pd.DataFrame(columns=SCENARIO_COLUMNS) for name in REPORT_TABLES}
+    scenario_arrays = _scenario_arrays(scenarios)
+    tables = compute_window_tables(scenarios, inputs)
+
+    # Distinct periods in first-seen order, and the period of every scenario
+    periods = {}
+    for scenario in scenarios:
+        periods.setdefault((scenario[1], scenario[2]), len(periods))
+    period_positions = [periods[(scenario[1], scenario[2])] for scenario in scenarios]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(periods) <= 1:
+        prepared = prepare_inputs(inputs)
+        summaries = [compute_event_summaries(*period, inputs=prepared) for period in periods]
+    else:
+        chunksize = max(1, len(periods) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inputs,)) as executor:
+            summaries = list(executor.map(_compute_event_summaries_task, periods, chunksize=chunksize))
+
+    # Summaries computed by different workers are shared again through their keys
+    shared = {}
+    entries = {'bear_markets': [], 'recessions': []}
+    errors = []
+    reported = set()
+    for position, period_position in enumerate(period_positions):
+        result = summaries[period_position]
+        for name in entries:
+            key, summary = result[name]
+            if summary is not None:
+                entries[name].append((position, shared.setdefault(key, summary)))
+        if period_position not in reported:
+            # Summary errors are reported once, on the period's first scenario
+            reported.add(period_position)
+            errors.extend((position, section, message) for section, message in result['errors'])
+
+    return {
+        'comparison': tables['comparison'],
+        'income': tables['income'],
+        'bear_markets': _stack(scenario_arrays, entries['bear_markets']),
+        'recessions': _stack(scenario_arrays, entries['recessions']),
+        'errors': _error_table(scenario_arrays, errors + tables['errors']),
+    }
+
+
+def write_report(report, path):
+    """
+    Writes the report to one file: an .xlsx workbook with a sheet per table, or a .parquet file
+    holding every table stacked in long form (one row per table cell, with 'Table', 'Row',
+    'Column', a numeric 'Value' and, for the cells that are not numbers such as error messages,
+    a 'Text' column).
+    """
+    if path.endswith('.parquet'):
+        long_frames = []
+        for name, table in report.items():
+            if table.empty:
+                continue
+            value_columns = [column for column in table.columns if column not in SCENARIO_COLUMNS]
+            # The first column after the scenario columns labels the row (Strategy, Category, Metric, ...)
+            row_column = value_columns[0]
+            long_table = table.melt(
+                id_vars=SCENARIO_COLUMNS + [row_column], value_vars=value_columns[1:], var_name='Column', value_name='_value'
+            ).rename(columns={row_column: 'Row', '_value': 'Value'})
+            long_table.insert(len(SCENARIO_COLUMNS), 'Table', name)
+            long_frames.append(long_table)
+        long_report = pd.concat(long_frames, ignore_index=True)
+        values = long_report['Value']
+        long_report['Value'] = pd.to_numeric(values, errors='coerce').astype(float)
+        long_report['Text'] = values.where(values.map(lambda value: isinstance(value, str))).astype(object)
+        long_report.to_parquet(path, index=False)
+    else:
+        with pd.ExcelWriter(path) as writer:
+            for name, table in report.items():
+                if name == 'errors' and table.empty:
+                    continue
+                table.to_excel(writer, sheet_name=REPORT_TABLES[name], index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the comparison, income, bear market and recession tables for many periods.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--predefined", action="store_true",
+                        help="Every predefined sidebar period for each end date in --end-dates.")
+    source.add_argument("--begin-dates", nargs=2, metavar=("FIRST", "LAST"),
+                        help="Grid of begin months (with --end-dates as the grid of end months).")
+    source.add_argument("--scenarios", help="CSV file with 'Begin Date', 'End Date' and optional 'Scenario', 'Initial Investment' columns.")
+    parser.add_argument("--end-dates", nargs=2, metavar=("FIRST", "LAST"), help="Range of end months, 'YYYY-MM'.")
+    parser.add_argument("--step", type=int, default=12, help="Months between consecutive begin/end dates (default: 12).")
+    parser.add_argument("--investments", type=float, nargs="+", default=DEFAULT_INVESTMENTS, help="Initial investment amounts.")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument("--output", default="batch_report.xlsx", help="Output .xlsx or .parquet file.")
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        scenarios = read_scenarios(args.scenarios, args.investments)
+    else:
+        if not args.end_dates:
+            parser.error("--end-dates is required with --predefined and --begin-dates")
+        end_dates = month_range(*args.end_dates, step=args.step)
+        if args.predefined:
+            scenarios = predefined_scenarios(end_dates, args.investments)
+        else:
+            scenarios = grid_scenarios(month_range(*args.begin_dates, step=args.step), end_dates, args.investments)
+
+    start = time.perf_counter()
+    report = run_batch(scenarios, workers=args.workers)
+    write_report(report, args.output)
+    print(f"Computed {len(scenarios)} scenarios in {time.perf_counter() - start:.1f}s; wrote '{args.output}'.")
+    if not report['errors'].empty:
+        print(f"{len(report['errors'])} scenario sections failed; see the Errors table.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
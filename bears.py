@@ -1,223 +1,122 @@
 # bears.py
 
+from dataclasses import asdict, dataclass
+
 import pandas as pd
-import streamlit as st
 import config  # Import the config module for BEGIN_DATE and END_DATE
 from data_loader import load_bear_market_periods
-import plotly.express as px
+from event_index import EventIndex
+from instrumentation import timed
 
 
-def calculate_bear_market_metrics(bear_market_data, start_date, end_date, decline_threshold=-0.48):
+@dataclass(frozen=True)
+class BearMarketSummary:
     """
-    Calculates various bear market metrics within a specified date range.
+    Bear market statistics of one period (declines as decimal fractions, e.g. -0.568).
+    The average gaps are NaN when the period holds a single bear market.
+    """
+    count: int
+    largest_decline: float
+    average_decline: float
+    average_days_start_to_start: float
+    average_days_end_to_start: float
+    count_worse_than_threshold: int
+    decline_threshold: float
+
+    def to_frame(self):
+        """
+        Returns the statistics as a numeric (Metric, Value) DataFrame.
+        """
+        values = asdict(self)
+        return pd.DataFrame({'Metric': list(values), 'Value': [float(value) for value in values.values()]})
+
+
+def build_bear_market_index(bear_market_data):
+    """
+    Parses the bear market periods once into an EventIndex for calculate_bear_market_metrics.
 
     Parameters:
-    - bear_market_data (pd.DataFrame): DataFrame containing bear market periods and related metrics.
-    - start_date (str or pd.Timestamp): The start date for filtering bear markets.
-    - end_date (str or pd.Timestamp): The end date for filtering bear markets.
-    - decline_threshold (float): The threshold for counting significant bear markets (default: -0.48 for -48%).
+    - bear_market_data (pd.DataFrame): Bear market periods as returned by load_bear_market_periods
+      (left unchanged).
 
     Returns:
-    - summary_table (pd.DataFrame): DataFrame summarizing bear market metrics.
-    - filtered_bear_markets_display (pd.DataFrame): DataFrame of bear markets within the specified date range for display.
+    - EventIndex: Events keyed by the period start/end dates, with the numeric 'Percentage Decline'
+      (as a decimal fraction).
     """
+    periods = bear_market_data['Bear Market Period'].str.split(' - ')
+    start_dates = pd.to_datetime(periods.str[0])
+    end_dates = pd.to_datetime(periods.str[1])
 
-    # Ensure the Date columns are properly formatted
-    bear_market_data['Start Date'] = pd.to_datetime(
-        bear_market_data['Bear Market Period'].str.split(' - ').str[0]
-    )
-    bear_market_data['End Date'] = pd.to_datetime(
-        bear_market_data['Bear Market Period'].str.split(' - ').str[1]
-    )
-
-    # Validate date range
-    if pd.to_datetime(end_date) < pd.to_datetime(start_date):
-        st.error("End date must be after the start date.")
-        return pd.DataFrame(), pd.DataFrame()
-
-    # Filter bear markets within the date range and create a copy to avoid SettingWithCopyWarning
-    filtered_bear_markets = bear_market_data[
-        (bear_market_data['Start Date'] >= pd.to_datetime(start_date)) & 
-        (bear_market_data['End Date'] <= pd.to_datetime(end_date))
-    ].copy()
-
-    if filtered_bear_markets.empty:
-        st.warning("No bear markets found within the selected date range.")
-        return pd.DataFrame(), pd.DataFrame()
-
-    # -----------------------------
     # Ensure the 'Percentage Decline' column is numeric
-    # -----------------------------
-
-    # Check if 'Percentage Decline' is of string type and contains '%'
-    if filtered_bear_markets['Percentage Decline'].dtype == 'object':
-        # Remove '%' sign if present
-        filtered_bear_markets['Percentage Decline'] = filtered_bear_markets['Percentage Decline'].str.rstrip('%')
-        # Convert to numeric
-        filtered_bear_markets['Percentage Decline'] = pd.to_numeric(
-            filtered_bear_markets['Percentage Decline'], errors='coerce'
-        ).fillna(0)
-    else:
-        # If already numeric, ensure no NaN values
-        filtered_bear_markets['Percentage Decline'] = filtered_bear_markets['Percentage Decline'].fillna(0)
-
-    # Convert 'Percentage Decline' from percentage to decimal for calculations (e.g., -56.8% to -0.568)
-    filtered_bear_markets['Percentage Decline'] = filtered_bear_markets['Percentage Decline'] / 1
-
-    # Sort the bear markets by 'Start Date' to ensure chronological order
-    filtered_bear_markets = filtered_bear_markets.sort_values('Start Date').reset_index(drop=True)
-
-    # Calculate the largest and average decline
-    largest_decline = filtered_bear_markets['Percentage Decline'].min()
-    average_decline = filtered_bear_markets['Percentage Decline'].mean()
-
-    # Count bear markets worse than the specified threshold (default: -0.48 for -48%)
-    num_bear_markets_worse_than_threshold = len(
-        filtered_bear_markets[filtered_bear_markets['Percentage Decline'] <= decline_threshold]
-    )
-
-    # -----------------------------
-    # Calculate Average Time Between Bear Markets (Start to Start)
-    # -----------------------------
-
-    # Compute the gap in days between the start dates of consecutive bear markets
-    filtered_bear_markets['Gap Days Start to Start'] = filtered_bear_markets['Start Date'].diff().dt.days
-
-    # Exclude the first bear market as it has no previous bear market to compare
-    average_gap_days_start_to_start = filtered_bear_markets['Gap Days Start to Start'].iloc[1:].mean()
-
-    # Handle cases where there might be no gaps (only one bear market)
-    if pd.isna(average_gap_days_start_to_start):
-        average_gap_days_start_to_start = 0
-
-    # Convert average gap from days to years and months
-    average_years_start = int(average_gap_days_start_to_start) // 365
-    average_months_start = (int(average_gap_days_start_to_start) % 365) // 30
-
-    # -----------------------------
-    # Calculate Average Time Between End of One Bear Market to Start of Another
-    # -----------------------------
-
-    # Shift the 'End Date' down to align with the next bear market's 'Start Date'
-    filtered_bear_markets['Previous End Date'] = filtered_bear_markets['End Date'].shift(1)
-
-    # Calculate the gap in days between the previous end date and the current start date
-    filtered_bear_markets['Gap Days End to Start'] = (
-        filtered_bear_markets['Start Date'] - filtered_bear_markets['Previous End Date']
-    ).dt.days
-
-    # Exclude the first bear market as it has no previous bear market to compare
-    average_gap_days_end_to_start = filtered_bear_markets['Gap Days End to Start'].iloc[1:].mean()
+    declines = bear_market_data['Percentage Decline']
+    if declines.dtype == 'object':
+        # Remove '%' sign if present and convert to numeric
+        declines = pd.to_numeric(declines.str.rstrip('%'), errors='coerce')
+    declines = declines.fillna(0)
 
-    # Handle cases where there might be no gaps (only one bear market)
-    if pd.isna(average_gap_days_end_to_start):
-        average_gap_days_end_to_start = 0
+    events = bear_market_data.copy()
+    events['Percentage Decline'] = declines
+    return EventIndex(start_dates, end_dates, {'Percentage Decline': declines.to_numpy(dtype=float)}, events)
 
-    # Convert average gap from days to years and months
-    average_years_end = int(average_gap_days_end_to_start) // 365
-    average_months_end = (int(average_gap_days_end_to_start) % 365) // 30
 
-    # -----------------------------
-    # Correct Formatting Before Creating Display DataFrame
-    # -----------------------------
-
-    # Format the 'Percentage Decline' column back to percentage strings for display
-    filtered_bear_markets['Percentage Decline'] = filtered_bear_markets['Percentage Decline'].apply(
-        lambda x: f"{x * 100:.1f}%"
-    )
-
-    # Format the 'Peak Value' and 'Trough Value' columns to two decimal places
-    filtered_bear_markets['Peak Value'] = filtered_bear_markets['Peak Value'].apply(
-        lambda x: f"{x:.2f}"
-    )
-    filtered_bear_markets['Trough Value'] = filtered_bear_markets['Trough Value'].apply(
-        lambda x: f"{x:.2f}"
-    )
-
-    # -----------------------------
-    # Create a Summary Table with Both Metrics
-    # -----------------------------
-
-    summary_table = pd.DataFrame({
-        'Metric': [
-            'Number of Bear Markets', 
-            'Largest Decline (%)', 
-            'Average Decline (%)', 
-            'Average Time Between Bear Markets (Start to Start) (Years, Months)',
-            'Average Time Between End of Bear Market to the Start of Another (Years, Months)',
-            f'Number of Bear Market Declines >= -50%'
-        ],
-        'Value': [
-            len(filtered_bear_markets), 
-            f"{largest_decline * 100:.1f}%",  # Multiply by 100 to convert to percentage
-            f"{average_decline * 100:.1f}%",  # Multiply by 100 to convert to percentage
-            f"{average_years_start} years, {average_months_start} months", 
-            f"{average_years_end} years, {average_months_end} months",
-            num_bear_markets_worse_than_threshold
-        ]
-    })
-
-    # -----------------------------
-    # Prepare Display DataFrame
-    # -----------------------------
-
-    # Create a display DataFrame by dropping unnecessary columns
-    filtered_bear_markets_display = filtered_bear_markets.drop(
-        columns=['Start Date', 'End Date', 'Gap Days Start to Start', 'Gap Days End to Start', 'Previous End Date']
-    )
-
-    return summary_table, filtered_bear_markets_display  # Return both summary and filtered data
-
-
-def plot_decline_distribution(filtered_bear_markets):
+@timed
+def calculate_bear_market_metrics(bear_market_data, start_date, end_date, decline_threshold=-0.48):
     """
-    Plots a histogram of bear market percentage declines.
+    Calculates various bear market metrics within a specified date range.
 
     Parameters:
-    - filtered_bear_markets (pd.DataFrame): DataFrame of bear markets within the specified date range.
-    """
-    # Extract numeric decline values by removing the '%' sign and converting to float
-    decline_values = filtered_bear_markets['Percentage Decline'].str.rstrip('%').astype(float)
+    - bear_market_data (EventIndex or pd.DataFrame): Bear market periods, ideally indexed once with
+      build_bear_market_index; a DataFrame is indexed on every call.
+    - start_date (str or pd.Timestamp): The start date for filtering bear markets.
+    - end_date (str or pd.Timestamp): The end date for filtering bear markets.
+    - decline_threshold (float): The threshold for counting significant bear markets (default: -0.48 for -48%).
 
-    fig = px.histogram(
-        x=decline_values, 
-        nbins=10, 
-        title='Distribution of Bear Market Declines',
-        labels={'x': 'Percentage Decline (%)', 'y': 'Count'},
-        color_discrete_sequence=['indianred']
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    Returns:
+    - summary (BearMarketSummary or None): Bear market statistics; None when messages explain why
+      there are none (see formatting.format_bear_market_summary for the display table).
+    - filtered_bear_markets (pd.DataFrame): The bear markets within the specified date range, with
+      numeric values (see formatting.format_bear_markets).
+    - messages (list): (level, text) tuples for the caller to show, level being "error" or "warning";
+      empty when the metrics were calculated.
+    """
+    if not isinstance(bear_market_data, EventIndex):
+        bear_market_data = build_bear_market_index(bear_market_data)
 
+    # Validate date range
+    if pd.to_datetime(end_date) < pd.to_datetime(start_date):
+        return None, pd.DataFrame(), [("error", "End date must be after the start date.")]
 
-def plot_bear_market_timeline(filtered_bear_markets, bear_market_data, start_date, end_date):
-    """
-    Plots a timeline of bear markets.
+    # Bear markets within the date range
+    window = bear_market_data.window(start_date, end_date)
+    num_bear_markets = bear_market_data.count(window)
+    if num_bear_markets == 0:
+        return None, pd.DataFrame(), [("warning", "No bear markets found within the selected date range.")]
 
-    Parameters:
-    - filtered_bear_markets (pd.DataFrame): DataFrame of bear markets within the specified date range.
-    - bear_market_data (pd.DataFrame): Original bear market data for accurate date retrieval.
-    - start_date (str or pd.Timestamp): The start date for filtering bear markets.
-    - end_date (str or pd.Timestamp): The end date for filtering bear markets.
-    """
-    # Reconstruct 'Start Date' and 'End Date' from the original DataFrame
-    bear_market_periods = bear_market_data[
-        (bear_market_data['Start Date'] >= pd.to_datetime(start_date)) & 
-        (bear_market_data['End Date'] <= pd.to_datetime(end_date))
-    ].sort_values('Start Date').reset_index(drop=True)
+    # Calculate the largest and average decline
+    largest_decline = bear_market_data.minimum('Percentage Decline', window)
+    average_decline = bear_market_data.mean('Percentage Decline', window)
 
-    fig = px.timeline(
-        bear_market_periods, 
-        x_start="Start Date", 
-        x_end="End Date", 
-        y="Bear Market Period",
-        title='Timeline of Bear Markets',
-        labels={'Bear Market Period': 'Bear Market'}
+    # Count bear markets worse than the specified threshold (default: -0.48 for -48%)
+    num_bear_markets_worse_than_threshold = bear_market_data.count_at_most('Percentage Decline', decline_threshold, window)
+
+    summary = BearMarketSummary(
+        count=num_bear_markets,
+        largest_decline=float(largest_decline),
+        average_decline=float(average_decline),
+        # Average time between bear markets, start to start and end of one to start of the next
+        average_days_start_to_start=float(bear_market_data.mean_start_gap_days(window)),
+        average_days_end_to_start=float(bear_market_data.mean_end_to_start_gap_days(window)),
+        count_worse_than_threshold=num_bear_markets_worse_than_threshold,
+        decline_threshold=decline_threshold,
     )
-    fig.update_yaxes(autorange="reversed")  # Optional: To display the earliest periods at the top
-    st.plotly_chart(fig, use_container_width=True)
+    return summary, bear_market_data.rows(window), []
 
 
 if __name__ == "__main__":
+    import streamlit as st
+    import graph
+    from formatting import format_bear_market_summary, format_bear_markets
+
     # Load bear market data
     bear_market_data = load_bear_market_periods()
     
@@ -237,7 +136,7 @@ if __name__ == "__main__":
     decline_threshold_decimal = decline_threshold / 100
 
     # Calculate metrics with the user-defined threshold
-    bear_metrics_summary, bear_filtered_data = calculate_bear_market_metrics(
+    bear_metrics_summary, bear_filtered_data, messages = calculate_bear_market_metrics(
         bear_market_data, 
         start_date, 
         end_date,
@@ -245,18 +144,23 @@ if __name__ == "__main__":
     )
 
     # Display results in Streamlit
+    for level, message in messages:
+        getattr(st, level)(message)
+
     st.write("Bear Market Summary Table")
-    st.dataframe(bear_metrics_summary)
+    st.dataframe(format_bear_market_summary(bear_metrics_summary))
 
     st.write("Bear Markets During This Period")
-    st.dataframe(bear_filtered_data)
+    st.dataframe(format_bear_markets(bear_filtered_data))
 
     # Plotting
     if not bear_filtered_data.empty:
         st.write("Bear Market Decline Distribution")
-        plot_decline_distribution(bear_filtered_data)
+        st.plotly_chart(graph.create_decline_distribution_chart(bear_filtered_data), use_container_width=True)
 
         st.write("Bear Market Timeline")
-        plot_bear_market_timeline(bear_filtered_data, bear_market_data, start_date, end_date)
+        st.plotly_chart(
+            graph.create_bear_market_timeline_chart(bear_market_data, start_date, end_date), use_container_width=True
+        )
     else:
         st.warning("No bear market data available for plotting.")
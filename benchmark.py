@@ -0,0 +1,482 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from streamlit.logger import set_log_level
+
+from divs import calculate_dividends
+from bears import calculate_bear_market_metrics, build_bear_market_index
+from recession_data import calculate_recession_metrics, build_recession_index
+from metrics import calculate_metrics, calculate_horizons_matrix
+from investment_comparison import create_comparison_table
+from income_metrics import calculate_income_metrics
+from ltc_bonds import filter_bond_data
+from drawdowns import DrawdownDetector
+import graph
+
+# Benchmark suite for the calculation paths behind main.py.
+#
+# Synthetic fixtures mirror the shape of data.xlsx, the ltc_bonds sheet, bear_market_periods.xlsx
+# and recessions.xlsx at 1x; the 10x and 100x fixtures keep the same 1871-2024 span with more rows
+# per month, standing in for daily data. The full page is timed on the real workbooks through
+# Streamlit's AppTest harness, and the import time of the compute modules is checked against a
+# target. Results are written as JSON and can be compared against a previous run:
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --baseline bench.json --threshold 0.2
+
+# Row counts of the real workbooks (scale 1)
+MARKET_ROWS = 1846
+BOND_ROWS = 1186
+BEAR_MARKETS = 22
+RECESSIONS = 15
+
+MARKET_START = pd.Timestamp("1871-01-01")
+BOND_START = pd.Timestamp("1925-12-01")
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.20
+
+# Compute modules that must import without Streamlit or Plotly, and the time budget for importing
+# all of them in a fresh interpreter (dominated by pandas itself)
+CORE_MODULES = [
+    'market_dataset', 'data_loader', 'divs', 'bears', 'recession_data', 'metrics', 'ltc_bonds',
+    'investment_comparison', 'income_metrics', 'result_cache', 'window_index', 'cohorts',
+    'monte_carlo', 'return_matrix', 'event_index', 'formatting', 'withdrawals', 'dca', 'allocation', 'drawdowns',
+    'ingest',
+]
+UI_MODULES = ['streamlit', 'plotly']
+CORE_IMPORT_TARGET = 1.0
+
+# Window timed for every function (the default "Since End of WW II" page)
+BEGIN_DATE = "1945-09"
+END_DATE = "2024-09"
+INITIAL_INVESTMENT = 10000
+# Point budget of the downsampled chart case (main.py's default)
+CHART_POINT_BUDGET = 400
+
+# Sidebar checkboxes that change the inputs or add tracing rather than show a section
+PAGE_OPTION_CHECKBOXES = {"Use Custom Begin and End Dates", "Show Performance Debug Panel"}
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+# -----------------------------
+# Synthetic fixtures
+# -----------------------------
+
+def _row_dates(start, n_rows, scale):
+    """
+    Returns n_rows 'Date' strings starting at start: month starts at scale 1, otherwise `scale`
+    evenly spaced rows per month formatted as timestamps.
+    """
+    if scale == 1:
+        return pd.date_range(start, periods=n_rows, freq="MS").strftime("%Y-%m")
+    end = start + pd.DateOffset(months=n_rows // scale)
+    step = (end - start) / n_rows
+    return (start + pd.to_timedelta(np.arange(n_rows) * step.value, unit="ns")).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def make_market_data(scale=1, seed=0):
+    """
+    Builds a DataFrame with the columns and dtypes of data_loader.load_data.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = MARKET_ROWS * scale
+    per_row = 1.0 / scale
+
+    composite = 4.44 * np.exp(np.cumsum(rng.normal(0.004 * per_row, 0.04 * np.sqrt(per_row), n_rows)))
+    dividends = composite * rng.uniform(0.02, 0.06, n_rows)
+    earnings = composite * rng.uniform(0.04, 0.10, n_rows)
+    cpi = 12.0 * np.exp(np.cumsum(rng.normal(0.0017 * per_row, 0.005 * np.sqrt(per_row), n_rows)))
+    total_return = 100.0 * composite / composite[0] * np.cumprod(1 + dividends / composite / 12 * per_row)
+    deflator = cpi[-1] / cpi
+
+    return pd.DataFrame({
+        'Date': _row_dates(MARKET_START, n_rows, scale),
+        'Composite': composite,
+        'Nominal Dividends': dividends,
+        'Nominal Earnings': earnings,
+        'CPI': cpi,
+        'Total Return': total_return,
+        'Real Earnings': earnings * deflator,
+        'Real Composite': composite * deflator,
+        'Real Dividends': dividends * deflator,
+        'Real Total Return': total_return * deflator,
+    })
+
+
+def make_bond_data(scale=1, seed=0):
+    """
+    Builds a DataFrame with the columns of ltc_bonds.load_data.
+    """
+    rng = np.random.default_rng(seed + 1)
+    n_rows = BOND_ROWS * scale
+    per_row = 1.0 / scale
+
+    aaa_yields = np.clip(0.05 + np.cumsum(rng.normal(0, 0.001 * np.sqrt(per_row), n_rows)), 0.01, 0.15)
+    cpi = 17.0 * np.exp(np.cumsum(rng.normal(0.0025 * per_row, 0.004 * np.sqrt(per_row), n_rows)))
+    monthly_return = aaa_yields / 12 * per_row + rng.normal(0, 0.01 * np.sqrt(per_row), n_rows)
+    nominal_total_return = np.cumprod(1 + monthly_return)
+    cpi_ratio = cpi[0] / cpi
+
+    return pd.DataFrame({
+        'date': _row_dates(BOND_START, n_rows, scale),
+        'aaa_yields': aaa_yields,
+        'cpi': cpi,
+        'nominal_interest': aaa_yields,
+        'nominal_monthly_total_return': monthly_return,
+        'nominal_total_return': nominal_total_return,
+        'real_interest': aaa_yields * cpi_ratio,
+        'real_total_return': nominal_total_return * cpi_ratio,
+    })
+
+
+def make_bear_market_periods(scale=1, seed=0):
+    """
+    Builds a DataFrame with the columns of data_loader.load_bear_market_periods.
+    """
+    rng = np.random.default_rng(seed + 2)
+    n_events = BEAR_MARKETS * scale
+    span_days = (pd.Timestamp("2024-09-30") - pd.Timestamp("1929-01-01")).days
+    starts = pd.Timestamp("1929-01-01") + pd.to_timedelta(np.sort(rng.integers(0, span_days, n_events)), unit="D")
+    durations = rng.integers(30, 900, n_events)
+    ends = starts + pd.to_timedelta(durations, unit="D")
+    peaks = rng.uniform(10, 5000, n_events)
+    declines = -rng.uniform(0.19, 0.60, n_events)
+
+    return pd.DataFrame({
+        'Bear Market Period': [
+            f"{start:%B} {start.day}, {start.year} - {end:%B} {end.day}, {end.year}" for start, end in zip(starts, ends)
+        ],
+        'Peak Value': peaks,
+        'Trough Value': peaks * (1 + declines),
+        'Percentage Decline': declines,
+        'Duration (Days)': durations,
+    })
+
+
+def make_recession_data(scale=1, seed=0):
+    """
+    Builds a DataFrame with the columns of data_loader.load_recession_data.
+    """
+    rng = np.random.default_rng(seed + 3)
+    n_events = RECESSIONS * scale
+    span_days = (pd.Timestamp("2024-09-30") - pd.Timestamp("1929-01-01")).days
+    begins = pd.Timestamp("1929-01-01") + pd.to_timedelta(np.sort(rng.integers(0, span_days, n_events)), unit="D")
+    durations = rng.integers(60, 1400, n_events)
+
+    return pd.DataFrame({
+        'Begin Date': begins,
+        'End Date': begins + pd.to_timedelta(durations, unit="D"),
+        'Duration (Days)': durations,
+        'Decline (%)': -rng.uniform(0.003, 0.27, n_events),
+        'Peak Unemployment (%)': rng.uniform(0.02, 0.25, n_events),
+    })
+
+
+def make_fixtures(scale=1, seed=0):
+    """
+    Returns the synthetic market, bond, bear market and recession data for one scale.
+    """
+    return {
+        'data_df': make_market_data(scale, seed),
+        'bond_data': make_bond_data(scale, seed),
+        'bear_market_data': make_bear_market_periods(scale, seed),
+        'recession_data': make_recession_data(scale, seed),
+    }
+
+
+# -----------------------------
+# Timing
+# -----------------------------
+
+def time_call(func, repeat=DEFAULT_REPEAT, warmup=1):
+    """
+    Times func() repeatedly.
+
+    Parameters:
+    - func (callable): Zero-argument function to time.
+    - repeat (int): Number of timed calls.
+    - warmup (int): Untimed calls made first.
+
+    Returns:
+    - dict: 'min', 'median' and 'mean' wall time in seconds, plus 'repeat'.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'repeat': repeat,
+    }
+
+
+def function_cases(fixtures):
+    """
+    Returns {name: zero-argument callable} for every benchmarked function on one set of fixtures.
+    None of the functions write into their arguments, so the inputs are shared between calls.
+    """
+    data_df = fixtures['data_df']
+    bond_filtered_data = filter_bond_data(fixtures['bond_data'], BEGIN_DATE, END_DATE)
+    # The event tables are indexed once at load in the app; the index builds are timed on their own
+    bear_market_index = build_bear_market_index(fixtures['bear_market_data'])
+    recession_index = build_recession_index(fixtures['recession_data'])
+    dividend_frame = calculate_dividends(
+        data_df, start_date=BEGIN_DATE, end_date=END_DATE, initial_investment=INITIAL_INVESTMENT
+    )['Nominal_With_Reinvestment'][0]
+
+    market_dates = pd.to_datetime(data_df['Date'])
+
+    return {
+        'calculate_dividends': lambda: calculate_dividends(
+            data_df, start_date=BEGIN_DATE, end_date=END_DATE, initial_investment=INITIAL_INVESTMENT
+        ),
+        'build_bear_market_index': lambda: build_bear_market_index(fixtures['bear_market_data']),
+        'calculate_bear_market_metrics': lambda: calculate_bear_market_metrics(
+            bear_market_index, start_date=BEGIN_DATE, end_date=END_DATE
+        ),
+        'DrawdownDetector': lambda: DrawdownDetector(-0.2).update(market_dates, data_df['Composite']),
+        'build_recession_index': lambda: build_recession_index(fixtures['recession_data']),
+        'calculate_recession_metrics': lambda: calculate_recession_metrics(
+            recession_index, start_date=BEGIN_DATE, end_date=END_DATE
+        ),
+        'calculate_metrics': lambda: calculate_metrics(data_df, BEGIN_DATE, END_DATE, INITIAL_INVESTMENT),
+        'calculate_horizons_matrix': lambda: calculate_horizons_matrix(data_df, END_DATE, initial_investment=INITIAL_INVESTMENT),
+        'create_comparison_table': lambda: create_comparison_table(
+            data_df, bond_filtered_data, INITIAL_INVESTMENT, BEGIN_DATE, END_DATE, data_type="Real", cpi_data=data_df
+        ),
+        'calculate_income_metrics': lambda: calculate_income_metrics(
+            data_df, bond_filtered_data, INITIAL_INVESTMENT, BEGIN_DATE, END_DATE
+        ),
+        'create_bar_chart': lambda: graph.create_bar_chart(data_df, start_date=BEGIN_DATE, end_date=END_DATE),
+        'create_dividends_ending_value_chart': lambda: graph.create_dividends_ending_value_chart(dividend_frame),
+        'create_dividends_ending_value_chart[lttb]': lambda: graph.create_dividends_ending_value_chart(
+            dividend_frame, max_points=CHART_POINT_BUDGET
+        ),
+    }
+
+
+def benchmark_functions(scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    Times every function case at every scale.
+
+    Returns:
+    - dict: '<function>[x<scale>]' -> timing dict (see time_call) with 'scale' and 'rows' added.
+    """
+    results = {}
+    for scale in scales:
+        fixtures = make_fixtures(scale, seed)
+        for name, func in function_cases(fixtures).items():
+            timing = time_call(func, repeat)
+            results[f"{name}[x{scale}]"] = {**timing, 'scale': scale, 'rows': len(fixtures['data_df'])}
+    return results
+
+
+def benchmark_page(repeat=DEFAULT_REPEAT, timeout=300):
+    """
+    Times full runs of main.py on the real workbooks through Streamlit's AppTest harness.
+
+    Returns:
+    - dict: 'main.py[cold]' (first run in this process, empty Streamlit caches), 'main.py[rerun]'
+      (rerun of the same session) and 'main.py[all_sections]' (rerun with every checkbox ticked).
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def new_app():
+        return AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+
+    def run(app):
+        app.run()
+        # Running a script re-applies Streamlit's configured log level
+        set_log_level("error")
+        if app.exception:
+            raise RuntimeError(f"main.py raised: {app.exception[0].value}")
+
+    # The cold run can only happen once per process, so it is timed a single time
+    start = time.perf_counter()
+    run(new_app())
+    cold = time.perf_counter() - start
+    results = {'main.py[cold]': {'min': cold, 'median': cold, 'mean': cold, 'repeat': 1, 'scale': 1}}
+
+    app = new_app()
+    run(app)
+    results['main.py[rerun]'] = {**time_call(lambda: run(app), repeat, warmup=0), 'scale': 1}
+
+    app = new_app()
+    run(app)
+    for checkbox in app.checkbox:
+        if checkbox.label not in PAGE_OPTION_CHECKBOXES:
+            checkbox.check()
+    results['main.py[all_sections]'] = {**time_call(lambda: run(app), repeat), 'scale': 1}
+    return results
+
+
+def benchmark_core_import(repeat=DEFAULT_REPEAT):
+    """
+    Times importing CORE_MODULES in fresh interpreters and checks that no UI module comes along.
+
+    Returns:
+    - dict: 'import_core' -> timing dict (see time_call) plus 'ui_modules', the UI packages that
+      were imported (expected to be empty).
+    """
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {CORE_MODULES!r}: __import__(name)\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(json.dumps({{'seconds': seconds, 'ui_modules': [m for m in {UI_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=os.path.dirname(MAIN_SCRIPT), capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    timings = [run['seconds'] for run in runs]
+    return {'import_core': {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'repeat': repeat,
+        'ui_modules': sorted({module for run in runs for module in run['ui_modules']}),
+    }}
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT, include_page=True, seed=0):
+    """
+    Runs the whole suite and returns a JSON-serializable report.
+    """
+    results = benchmark_core_import(repeat)
+    results.update(benchmark_functions(scales, repeat, seed))
+    if include_page:
+        # AppTest resolves the workbooks relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(MAIN_SCRIPT))
+        try:
+            results.update(benchmark_page(repeat))
+        finally:
+            os.chdir(cwd)
+
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'scales': list(scales),
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD, statistic='median'):
+    """
+    Compares a report against a baseline report.
+
+    Parameters:
+    - report (dict): Current run_benchmarks report.
+    - baseline (dict): Earlier run_benchmarks report.
+    - threshold (float): Relative slowdown tolerated before a case counts as a regression (0.2 = 20%).
+    - statistic (str): Timing statistic compared ('min', 'median' or 'mean').
+
+    Returns:
+    - list: One dict per case present in both reports with 'name', 'baseline', 'current',
+      'ratio' and 'regression', sorted with the largest slowdown first.
+    """
+    rows = []
+    for name, timing in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = timing[statistic] / base[statistic] if base[statistic] > 0 else float('inf')
+        rows.append({
+            'name': name,
+            'baseline': base[statistic],
+            'current': timing[statistic],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return sorted(rows, key=lambda row: row['ratio'], reverse=True)
+
+
+def format_report(report):
+    lines = [f"{'case':<48} {'median (ms)':>12} {'min (ms)':>10}"]
+    for name, timing in report['results'].items():
+        lines.append(f"{name:<48} {timing['median'] * 1000:>12.2f} {timing['min'] * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows, threshold=DEFAULT_THRESHOLD):
+    lines = [f"{'case':<48} {'baseline (ms)':>14} {'current (ms)':>13} {'ratio':>7}"]
+    for row in rows:
+        flag = f"  REGRESSION (> {threshold:.0%} slower)" if row['regression'] else ""
+        lines.append(
+            f"{row['name']:<48} {row['baseline'] * 1000:>14.2f} {row['current'] * 1000:>13.2f} {row['ratio']:>7.2f}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculation and page render paths.")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the report is written to.")
+    parser.add_argument("--baseline", help="Earlier report to compare against; exits with status 1 on regressions.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown flagged as a regression (default: 0.2 = 20%%).")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Fixture scales to run.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed calls per case.")
+    parser.add_argument("--no-page", action="store_true", help="Skip the AppTest runs of main.py.")
+    parser.add_argument("--import-target", type=float, default=CORE_IMPORT_TARGET,
+                        help="Seconds the core modules may take to import (default: %(default)s).")
+    args = parser.parse_args(argv)
+
+    # Keep Streamlit's bare-mode and Arrow conversion warnings out of the report
+    set_log_level("error")
+
+    report = run_benchmarks(args.scales, args.repeat, include_page=not args.no_page)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    print(f"\nWrote '{args.output}'.")
+
+    status = 0
+    core_import = report['results']['import_core']
+    if core_import['ui_modules']:
+        print(f"\nFAIL: importing the core modules also imported {', '.join(core_import['ui_modules'])}.")
+        status = 1
+    if core_import['median'] > args.import_target:
+        print(f"\nFAIL: importing the core modules took {core_import['median']:.2f}s (target {args.import_target:.2f}s).")
+        status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print()
+        print(format_comparison(rows, args.threshold))
+        if any(row['regression'] for row in rows):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# cohorts.py
+import numpy as np
+import pandas as pd
+
+from window_index import WindowIndex, DIVIDEND_STRATEGIES, months_to_dates
+
+# Rolling-cohort engine: every historical start month for a fixed holding period,
+# evaluated in one vectorized pass over the WindowIndex prefix arrays.
+
+BOND_STRATEGIES = [
+    "Bonds_Nominal_No_Reinvestment",
+    "Bonds_Nominal_With_Reinvestment",
+    "Bonds_Real_No_Reinvestment",
+    "Bonds_Real_With_Reinvestment",
+]
+
+
+def _cagr(ending_value, initial_investment, horizon_months):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (ending_value / initial_investment) ** (12 / horizon_months) - 1
+
+
+def calculate_cohorts(data_df, bond_df, horizon_months, initial_investment=10000, index=None):
+    """
+    Evaluates every valid start month for a holding period of horizon_months.
+
+    A cohort starting in month s ends in month s + horizon_months, i.e. the same window
+    main.py uses for "Last N Years" (horizon_months = 12 * N).
+
+    Parameters:
+    - data_df (MarketDataset or pd.DataFrame): Market data.
+    - bond_df (pd.DataFrame or None): Bond data as returned by ltc_bonds.load_data.
+    - horizon_months (int): Holding period in months (>= 1).
+    - initial_investment (float): Initial investment for every cohort.
+    - index (WindowIndex, optional): Prebuilt index over the same data, reused when given.
+
+    Returns:
+    - dict: 'Start Date' and 'End Date' (pd.DatetimeIndex) plus, for each of the four divs.py
+      strategies and the four bond strategies in BOND_STRATEGIES, a dict of NumPy arrays
+      'Ending Value', 'Total Dividends/Interest' and 'CAGR' aligned with the start dates.
+      Bond entries are NaN for cohorts outside the bond data, and total interest is NaN for
+      the reinvesting bond strategies (as in create_comparison_table).
+    """
+    if horizon_months < 1:
+        raise ValueError("horizon_months must be at least 1.")
+    if index is None:
+        index = WindowIndex(data_df, bond_df)
+
+    stocks = index.stocks
+    n_cohorts = len(stocks) - horizon_months
+    if n_cohorts <= 0:
+        raise ValueError(f"Not enough data for a {horizon_months}-month horizon.")
+
+    b = np.arange(n_cohorts)
+    e = b + horizon_months
+    start_months = stocks.months[b]
+    results = {
+        'Start Date': months_to_dates(start_months),
+        'End Date': months_to_dates(stocks.months[e]),
+    }
+
+    # Stock strategies
+    for strategy in DIVIDEND_STRATEGIES:
+        ending_value = index.ending_value_at(strategy, b, e, initial_investment)
+        results[strategy] = {
+            'Ending Value': ending_value,
+            'Total Dividends/Interest': index.total_dividends_at(strategy, b, e, initial_investment),
+            'CAGR': _cagr(ending_value, initial_investment, horizon_months),
+        }
+
+    if index.bonds is None:
+        return results
+
+    # Bond strategies, aligned on the stock start months
+    bonds = index.bonds
+    bond_b = bonds.position(start_months, 'begin')
+    bond_e = bonds.position(stocks.months[e], 'end')
+    valid = (bonds.months[bond_b] == start_months) & (bond_e >= 0) & (bonds.months[np.maximum(bond_e, 0)] == stocks.months[e])
+    bond_b, bond_e = np.where(valid, bond_b, 0), np.where(valid, bond_e, 0)
+    cpi_factor = index.increase_factor_at('CPI', b, e)
+
+    for data_type in ['Nominal', 'Real']:
+        interest = np.where(valid, index.bond_total_interest_at(data_type, bond_b, bond_e, initial_investment), np.nan)
+        # Without reinvestment the principal stays flat in nominal terms and loses CPI in real terms
+        flat_value = initial_investment if data_type == 'Nominal' else initial_investment / cpi_factor
+        flat_value = np.where(valid, flat_value, np.nan)
+        reinvested_value = np.where(valid, index.bond_ending_value_at(data_type, bond_b, bond_e, initial_investment), np.nan)
+
+        results[f"Bonds_{data_type}_No_Reinvestment"] = {
+            'Ending Value': flat_value,
+            'Total Dividends/Interest': interest,
+            'CAGR': _cagr(flat_value, initial_investment, horizon_months),
+        }
+        results[f"Bonds_{data_type}_With_Reinvestment"] = {
+            'Ending Value': reinvested_value,
+            'Total Dividends/Interest': np.full(n_cohorts, np.nan),
+            'CAGR': _cagr(reinvested_value, initial_investment, horizon_months),
+        }
+
+    return results
+
+
+def cohorts_to_frame(results):
+    """
+    Flattens calculate_cohorts output into a DataFrame with one row per start month and
+    (strategy, metric) MultiIndex columns.
+    """
+    frames = {
+        strategy: pd.DataFrame(metrics)
+        for strategy, metrics in results.items()
+        if strategy not in ['Start Date', 'End Date']
+    }
+    table = pd.concat(frames, axis=1)
+    table.index = results['Start Date'].strftime('%Y-%m')
+    table.index.name = 'Start Date'
+    table.insert(0, ('End Date', ''), results['End Date'].strftime('%Y-%m'))
+    return table
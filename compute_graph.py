@@ -0,0 +1,116 @@
+# compute_graph.py
+
+# Lazy dependency graph for the page computations in main.py.
+#
+# Each section of the page is a named node that declares the inputs and other nodes it
+# depends on. Nothing runs until a visible widget asks for a node with get(); the result is
+# then memoized against the values of the inputs the node (transitively) depends on, so a
+# hidden section costs nothing and a visible one is only recomputed when its own inputs change.
+
+
+class ComputeGraph:
+    """
+    Named computations evaluated on demand and memoized for the current inputs.
+
+    Typical use (once per rerun):
+
+        graph.set_inputs(begin_date=..., end_date=...)
+
+        @graph.node("bear_metrics", depends_on=["begin_date", "end_date"])
+        def bear_metrics(begin_date, end_date):
+            ...
+
+        if st.checkbox(...):
+            summary = graph.get("bear_metrics")
+
+    Input values must be hashable. Node functions receive their dependencies positionally,
+    in depends_on order.
+    """
+
+    def __init__(self):
+        self._inputs = {}
+        self._nodes = {}
+        self._memo = {}
+        self.evaluations = {}
+
+    def set_inputs(self, **inputs):
+        """
+        Sets (or updates) the input values for the current run.
+        """
+        self._inputs.update(inputs)
+
+    def node(self, name, depends_on=()):
+        """
+        Decorator registering a node. Re-registering a name (e.g. on every Streamlit rerun)
+        replaces its function but keeps its memoized result.
+        """
+        def register(func):
+            self._nodes[name] = (func, tuple(depends_on))
+            return func
+        return register
+
+    def _input_names(self, name, seen=None):
+        if name in self._inputs:
+            return {name}
+        if name not in self._nodes:
+            raise KeyError(f"Unknown computation or input: '{name}'")
+        seen = set() if seen is None else seen
+        if name in seen:
+            raise ValueError(f"Cycle detected at computation '{name}'")
+        seen.add(name)
+        names = set()
+        for dependency in self._nodes[name][1]:
+            names |= self._input_names(dependency, seen)
+        seen.discard(name)
+        return names
+
+    def _memo_key(self, name):
+        return tuple((input_name, self._inputs[input_name]) for input_name in sorted(self._input_names(name)))
+
+    def get(self, name):
+        """
+        Returns the value of an input or node, evaluating the node and its dependencies if the
+        memoized result is missing or was computed for different input values.
+        """
+        if name in self._inputs:
+            return self._inputs[name]
+
+        key = self._memo_key(name)
+        memo = self._memo.get(name)
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        func, depends_on = self._nodes[name]
+        value = func(*[self.get(dependency) for dependency in depends_on])
+        self._memo[name] = (key, value)
+        self.evaluations[name] = self.evaluations.get(name, 0) + 1
+        return value
+
+    def is_cached(self, name):
+        """
+        Returns True if get(name) would be served from the memo without evaluating anything.
+        """
+        memo = self._memo.get(name)
+        return memo is not None and memo[0] == self._memo_key(name)
+
+    def invalidate(self, name=None):
+        """
+        Drops the memoized result of one node, or of every node when name is None.
+        """
+        if name is None:
+            self._memo.clear()
+        else:
+            self._memo.pop(name, None)
+
+    def invalidate_where(self, predicate):
+        """
+        Drops the memoized result of every node whose memoized input values satisfy
+        predicate(inputs), where inputs is a dict of the inputs the node depends on.
+
+        Returns:
+        - list: Names of the dropped nodes.
+        """
+        stale = [name for name, (key, _) in self._memo.items() if predicate(dict(key))]
+        for name in stale:
+            del self._memo[name]
+        return stale
@@ -1,8 +1,35 @@
 # config.py
+import os
 from datetime import datetime
 
 # nov 14
 
 # Set default start and end dates here
 BEGIN_DATE = datetime(1959, 10, 1)
-END_DATE = datetime(2024, 9, 30)
\ No newline at end of file
+END_DATE = datetime(2024, 9, 30)
+
+# Predefined periods offered in the sidebar: years back from the end date, or a fixed 'YYYY-MM' begin date
+PREDEFINED_PERIODS = {
+    "Last 1 Year": 1,
+    "Last 3 Years": 3,
+    "Last 5 Years": 5,
+    "Last 10 Years": 10,
+    "Last 15 Years": 15,
+    "Last 20 Years": 20,
+    "Last 25 Years": 25,
+    "Last 30 Years": 30,
+    "Last 35 Years": 35,
+    "Last 40 Years": 40,
+    "Last 50 Years": 50,
+    "Last 60 Years": 60,
+    "Last 70 Years": 70,
+    "Last 80 Years": 80,
+    "Last 90 Years": 90,
+    "Since End of WW II": "1945-09",
+}
+
+# Process-wide performance instrumentation (see instrumentation.py). tracemalloc and the log
+# handler are shared by every session, so they are switched on here or through the environment
+# (TRACE_MEMORY=1, JSON_STAGE_LOGGING=1) rather than from the app
+TRACE_MEMORY = os.environ.get("TRACE_MEMORY", "0") == "1"
+JSON_STAGE_LOGGING = os.environ.get("JSON_STAGE_LOGGING", "0") == "1"
@@ -1,31 +1,174 @@
 # data_loader.py
+import hashlib
+import json
+import os
+
 import pandas as pd
 
 # November 15
 
+# Version of the on-disk cache layout; bump to invalidate every cached worksheet
+CACHE_VERSION = 1
+
+
+def source_signature(filepath):
+    """
+    Returns the size and modification time of a source workbook.
+    """
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def content_hash(filepath, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_cache_dir(filepath):
+    """
+    Returns the '.cache' directory next to a source workbook.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), '.cache')
+
+
+def cache_paths(filepath, sheet_name, cache_dir=None):
+    """
+    Returns the (parquet, metadata) paths used to cache one worksheet of a workbook.
+
+    The cache lives in a '.cache' directory next to the workbook unless cache_dir is given.
+    """
+    cache_dir = cache_dir or default_cache_dir(filepath)
+    stem = f"{os.path.basename(filepath)}.{sheet_name}"
+    return os.path.join(cache_dir, f"{stem}.parquet"), os.path.join(cache_dir, f"{stem}.json")
+
+
+def read_cache_metadata(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def write_cache(filepath, sheet_name, df, cache_dir=None, sha256=None):
+    """
+    Stores a worksheet as Parquet along with the source workbook's signature.
+
+    Returns True when the cache was written, False if the frame could not be stored
+    (e.g. mixed-type columns Arrow cannot represent); the caller then simply keeps
+    reading the workbook.
+    """
+    parquet_path, meta_path = cache_paths(filepath, sheet_name, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        tmp_path = f"{parquet_path}.tmp"
+        df.to_parquet(tmp_path, engine='pyarrow')
+        os.replace(tmp_path, parquet_path)
+        write_json_atomic(meta_path, {
+            'version': CACHE_VERSION,
+            'sheet_name': sheet_name,
+            'sha256': sha256 or content_hash(filepath),
+            **source_signature(filepath),
+        })
+    except Exception:
+        return False
+    return True
+
+
+def signature_matches(filepath, meta):
+    """
+    Checks cache metadata against the current source file.
+
+    Returns (matches, sha256): a size/mtime match is trusted as-is; otherwise the content hash
+    decides (sha256 is returned when it had to be computed so callers can refresh metadata).
+    """
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False, None
+    signature = source_signature(filepath)
+    if meta.get('size') != signature['size']:
+        return False, None
+    if meta.get('mtime_ns') == signature['mtime_ns']:
+        return True, None
+    sha256 = content_hash(filepath)
+    return meta.get('sha256') == sha256, sha256
+
+
+def read_excel_cached(filepath, sheet_name, cache_dir=None):
+    """
+    Reads a worksheet through a persistent Parquet cache.
+
+    The cache is keyed on the workbook's size and modification time. When those change
+    but the content hash still matches (e.g. the file was touched or copied), the cached
+    frame is reused and the signature refreshed. Excel is only parsed when the cache is
+    missing or stale.
+
+    Parameters:
+    - filepath (str): Path to the Excel workbook.
+    - sheet_name (str): Worksheet to read.
+    - cache_dir (str, optional): Directory for cache files (default: '.cache' next to the workbook).
+
+    Returns:
+    - pd.DataFrame: The worksheet as returned by pd.read_excel.
+    """
+    parquet_path, meta_path = cache_paths(filepath, sheet_name, cache_dir)
+    meta = read_cache_metadata(meta_path)
+    fresh, sha256 = signature_matches(filepath, meta)
+
+    if fresh and os.path.exists(parquet_path):
+        try:
+            df = pd.read_parquet(parquet_path, engine='pyarrow')
+        except Exception:
+            df = None
+        if df is not None:
+            if sha256 is not None:
+                # Content unchanged but the file was touched: refresh the stored signature
+                try:
+                    write_json_atomic(meta_path, {**meta, **source_signature(filepath)})
+                except OSError:
+                    pass
+            return df
+
+    df = pd.read_excel(filepath, sheet_name=sheet_name)
+    write_cache(filepath, sheet_name, df, cache_dir=cache_dir)
+    return df
+
+
 def load_bear_market_periods(filepath='bear_market_periods.xlsx'):
     """
     Loads bear market periods data from the specified Excel worksheet.
     """
-    return pd.read_excel(filepath, sheet_name='bears')
+    return read_excel_cached(filepath, sheet_name='bears')
 
 
 def load_data(filepath='data.xlsx'):
     """
     Loads general market data from the specified Excel worksheet.
     """
-    return pd.read_excel(filepath, sheet_name='data')
+    return read_excel_cached(filepath, sheet_name='data')
 
 
 def load_recession_data(filepath='recessions.xlsx'):
     """
     Loads recession data from the specified Excel worksheet.
     """
-    return pd.read_excel(filepath, sheet_name='Sheet1')
+    return read_excel_cached(filepath, sheet_name='Sheet1')
 
 def load_market_data(filepath='data.xlsx'):
     try:
-        data = pd.read_excel(filepath, sheet_name='data')
+        data = read_excel_cached(filepath, sheet_name='data')
     except FileNotFoundError:
         raise FileNotFoundError(f"The file '{filepath}' was not found.")
     except Exception as e:
@@ -42,4 +185,4 @@ def load_market_data(filepath='data.xlsx'):
     data['Date'] = pd.to_datetime(data['Date'], errors='coerce').dt.strftime('%Y-%m')
     data = data.dropna(subset=['Date'])
 
-    return data    
\ No newline at end of file
+    return data    
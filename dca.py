@@ -0,0 +1,236 @@
+# dca.py
+import numpy as np
+import pandas as pd
+
+from window_index import WindowIndex, DIVIDEND_STRATEGIES, BOND_LEVEL_COLUMNS, months_to_dates
+
+# Dollar-cost averaging over every historical start month.
+#
+# A fixed contribution buys units of a level series (Composite, Total Return, their real versions,
+# or the bond total return index) at the start of each month of the horizon. The units held at
+# month i are contribution * sum_{k<=i} 1 / level_k, so with a prefix sum of 1 / level the ending
+# value of every cohort is two array lookups, and the monthly income of every cohort is one gather
+# over a (cohort x month) grid. The money-weighted return (IRR) of all cohorts is then solved
+# together by Newton's method on that grid instead of one numpy_financial.irr call per cohort.
+
+DCA_STRATEGIES = list(DIVIDEND_STRATEGIES) + [
+    "Bonds_Nominal_With_Reinvestment",
+    "Bonds_Real_With_Reinvestment",
+]
+
+
+def _prefix_sum(values):
+    """
+    Returns (prefix sums with NaN counted as 0, prefix NaN counts), both of length len(values) + 1.
+    """
+    missing = ~np.isfinite(values)
+    prefix = np.zeros(len(values) + 1)
+    np.cumsum(np.where(missing, 0.0, values), out=prefix[1:])
+    missing_count = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(missing, out=missing_count[1:])
+    return prefix, missing_count
+
+
+def batched_irr(cash_flows, guess=0.005, tolerance=1e-10, max_iterations=100, bracket=(-0.5, 1.0)):
+    """
+    Solves the internal rate of return of many cash flow rows at once.
+
+    Every row runs a safeguarded Newton iteration: the rate is kept inside a bracket whose ends
+    give a positive and a negative net value, and a Newton step that would leave the bracket is
+    replaced by bisection, so rows converge even from a poor guess.
+
+    Parameters:
+    - cash_flows (np.ndarray): 2-D array, one row of evenly spaced cash flows per investor
+      (negative contributions, positive income/ending value).
+    - guess (float or np.ndarray): Starting rate per period, for every row or per row.
+    - tolerance (float): Convergence threshold on the change of the rate.
+    - max_iterations (int): Iteration limit; rows that have not converged by then are NaN.
+    - bracket (tuple): Lowest and highest rate per period searched.
+
+    Returns:
+    - np.ndarray: Rate per period of each row (NaN for rows with missing flows or without a
+      root inside the bracket).
+    """
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    periods_left = np.arange(cash_flows.shape[1])[::-1].astype(float)
+    rates = np.full(len(cash_flows), np.nan)
+
+    def future_value(rows, rate):
+        # Value of the flows compounded to the last period and its derivative, both scaled by
+        # (1 + rate) ** -horizon for positive rates so long horizons cannot overflow (a positive
+        # factor per row leaves the sign and the Newton step unchanged). Compounding forward
+        # rather than discounting makes contributions followed by a final value a concave,
+        # decreasing function of the rate, on which Newton does not creep across flat stretches.
+        shift = np.where(rate > 0, periods_left[0], 0.0)
+        flows = np.exp(np.log1p(rate)[:, None] * (periods_left - shift[:, None]))
+        flows *= cash_flows[rows]
+        return flows.sum(axis=1), flows @ periods_left / (1 + rate)
+
+    active = np.flatnonzero(np.isfinite(cash_flows).all(axis=1))
+    lo = np.full(len(active), float(bracket[0]))
+    hi = np.full(len(active), float(bracket[1]))
+    bracketed = (future_value(active, lo)[0] > 0) & (future_value(active, hi)[0] < 0)
+    active, lo, hi = active[bracketed], lo[bracketed], hi[bracketed]
+    rate = np.broadcast_to(np.asarray(guess, dtype=float), rates.shape)[active]
+    rate = np.where((rate > lo) & (rate < hi), rate, (lo + hi) / 2)
+    previous_step = hi - lo
+
+    # Only the rows still iterating are evaluated, so the grid shrinks as rows converge
+    for _ in range(max_iterations):
+        if len(active) == 0:
+            break
+        value, slope = future_value(active, rate)
+        lo = np.where(value > 0, rate, lo)
+        hi = np.where(value > 0, hi, rate)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = rate - value / slope
+        # Bisect when Newton leaves the bracket or shrinks the step by less than half
+        use_newton = (newton >= lo) & (newton <= hi) & (np.abs(newton - rate) <= np.abs(previous_step) / 2)
+        new_rate = np.where(use_newton, newton, (lo + hi) / 2)
+        new_rate = np.where(value == 0, rate, new_rate)
+
+        previous_step = new_rate - rate
+        converged = np.abs(previous_step) < tolerance
+        rates[active[converged]] = new_rate[converged]
+        keep = ~converged
+        active, rate, lo, hi, previous_step = (
+            active[keep], new_rate[keep], lo[keep], hi[keep], previous_step[keep])
+    return rates
+
+
+def _annualize(monthly_rate):
+    return (1 + monthly_rate) ** 12 - 1
+
+
+def _dca_cohorts(level, monthly_yield, starts, horizon_months, contribution, income_paid_out):
+    """
+    Ending value, total income and IRR of monthly contributions into one level series.
+
+    Units are bought at level[s..s + horizon - 1]; the value is taken at level[s + horizon]. Income
+    in month i is monthly_yield[i] * value held in month i (as in divs.py), paid out when
+    income_paid_out and otherwise already inside the level series.
+    """
+    inverse_prefix, missing_prefix = _prefix_sum(1 / level)
+    ends = starts + horizon_months
+    with np.errstate(invalid='ignore'):
+        units = np.where(missing_prefix[ends] > missing_prefix[starts], np.nan,
+                         inverse_prefix[ends] - inverse_prefix[starts])
+    ending_value = contribution * level[ends] * units
+
+    # (cohort x month) grid of the units held, months s..s + horizon
+    rows = starts[:, None] + np.arange(horizon_months + 1)
+    units_held = inverse_prefix[np.minimum(rows + 1, ends[:, None])] - inverse_prefix[starts][:, None]
+    income = contribution * monthly_yield[rows] * level[rows] * units_held
+    income[np.isnan(units)] = np.nan
+    total_income = income.sum(axis=1)
+
+    cash_flows = np.zeros(rows.shape)
+    cash_flows[:, :-1] = -contribution
+    cash_flows[:, -1] += ending_value
+    received = ending_value
+    if income_paid_out:
+        cash_flows += income
+        received = received + total_income
+    # Start from the rate that grows the contributions into what was received over the average
+    # time a contribution is invested, which is close to the money-weighted return
+    with np.errstate(divide='ignore', invalid='ignore'):
+        guess = (received / (contribution * horizon_months)) ** (2 / (horizon_months + 1)) - 1
+    return ending_value, total_income, _annualize(batched_irr(cash_flows, guess=guess))
+
+
+def calculate_dca_cohorts(data_df, bond_df, horizon_months, monthly_contribution=1000, index=None):
+    """
+    Evaluates fixed monthly contributions for every valid start month of a holding period.
+
+    A cohort starting in month s contributes at the start of months s .. s + horizon_months - 1
+    and is valued in month s + horizon_months (the same window as cohorts.calculate_cohorts).
+    Real strategies contribute a constant amount in real terms.
+
+    Parameters:
+    - data_df (MarketDataset or pd.DataFrame): Market data.
+    - bond_df (pd.DataFrame or None): Bond data as returned by ltc_bonds.load_data.
+    - horizon_months (int): Holding period in months (>= 1).
+    - monthly_contribution (float): Amount invested at the start of every month.
+    - index (WindowIndex, optional): Prebuilt index over the same data, reused when given.
+
+    Returns:
+    - dict: 'Start Date' and 'End Date' (pd.DatetimeIndex), 'Total Contributions' and, for each
+      strategy in DCA_STRATEGIES, a dict of NumPy arrays 'Ending Value', 'Total Dividends/Interest'
+      and 'IRR' (annualized money-weighted return) aligned with the start dates. Dividends are
+      paid out by the No_Reinvestment strategies (and count towards their IRR) and reinvested by
+      the others; bond entries are NaN for cohorts outside the bond data.
+    """
+    if horizon_months < 1:
+        raise ValueError("horizon_months must be at least 1.")
+    if index is None:
+        index = WindowIndex(data_df, bond_df)
+
+    stocks = index.stocks
+    n_cohorts = len(stocks) - horizon_months
+    if n_cohorts <= 0:
+        raise ValueError(f"Not enough data for a {horizon_months}-month horizon.")
+
+    starts = np.arange(n_cohorts)
+    start_months = stocks.months[starts]
+    results = {
+        'Start Date': months_to_dates(start_months),
+        'End Date': months_to_dates(stocks.months[starts + horizon_months]),
+        'Total Contributions': monthly_contribution * horizon_months,
+    }
+
+    # Stock strategies
+    for strategy, (value_col, dividend_col, price_col) in DIVIDEND_STRATEGIES.items():
+        values = stocks.values
+        monthly_yield = values[dividend_col] / values[price_col] / 12
+        ending_value, dividends, irr = _dca_cohorts(
+            values[value_col], monthly_yield, starts, horizon_months, monthly_contribution,
+            income_paid_out=strategy.endswith("No_Reinvestment"),
+        )
+        results[strategy] = {'Ending Value': ending_value, 'Total Dividends/Interest': dividends, 'IRR': irr}
+
+    if index.bonds is None:
+        return results
+
+    # Bond strategies on the cohorts whose whole window lies inside the (contiguous) bond data
+    bonds = index.bonds
+    bond_starts = start_months - bonds.first_month
+    valid = bonds.contiguous & (bond_starts >= 0) & (bond_starts + horizon_months < len(bonds))
+    for data_type, level_col in BOND_LEVEL_COLUMNS.items():
+        strategy = f"Bonds_{data_type}_With_Reinvestment"
+        columns = {name: np.full(n_cohorts, np.nan) for name in ['Ending Value', 'Total Dividends/Interest', 'IRR']}
+        if valid.any():
+            level = bonds.values[level_col]
+            ending_value, _, irr = _dca_cohorts(
+                level, np.zeros(len(level)), bond_starts[valid], horizon_months, monthly_contribution,
+                income_paid_out=False,
+            )
+            columns['Ending Value'][valid] = ending_value
+            columns['IRR'][valid] = irr
+        results[strategy] = columns
+
+    return results
+
+
+def dca_summary(results, percentiles=(5, 50, 95)):
+    """
+    Summarizes calculate_dca_cohorts output with one row per strategy.
+
+    Returns:
+    - pd.DataFrame: 'Strategy', 'Cohorts' and the given percentiles of the ending value and the
+      IRR across start months (numeric; NaN cohorts are skipped).
+    """
+    rows = []
+    for strategy in DCA_STRATEGIES:
+        if strategy not in results:
+            continue
+        ending_value = results[strategy]['Ending Value']
+        irr = results[strategy]['IRR']
+        present = np.isfinite(ending_value) & np.isfinite(irr)
+        if not present.any():
+            continue
+        row = {'Strategy': strategy.replace('_', ' '), 'Cohorts': int(present.sum())}
+        row.update({f"Ending Value P{p}": value
+                    for p, value in zip(percentiles, np.percentile(ending_value[present], percentiles))})
+        row.update({f"IRR P{p}": value for p, value in zip(percentiles, np.percentile(irr[present], percentiles))})
+        rows.append(row)
+    return pd.DataFrame(rows)
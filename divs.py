@@ -1,191 +1,181 @@
 # divs.py
+import numpy as np
 import pandas as pd
-from data_loader import load_market_data, load_bear_market_periods, load_recession_data
 
-import graph  # Import the graph module for charting
-import streamlit as st
 import config  # Import config to access BEGIN_DATE and END_DATE constants
+from market_dataset import MarketDataset
+from instrumentation import timed
 
 # November 15
 
-# Nominal Dividend Calculations
+# Array helpers shared by the four strategies
 
-def calculate_dividends_no_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000):
-    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m')
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)].reset_index(drop=True)
-    results = {
-        'Date': [], 'Composite Value': [], 'Dividend': [], 'Dividend %': [], 'Dividend Paid': [], 'Ending Value': []
-    }
-    ending_value = initial_investment
-    total_dividends = 0
-
-    for i in range(len(filtered_df)):
-        date = filtered_df['Date'].iloc[i]
-        composite_value = filtered_df['Composite'].iloc[i]
-        dividend = filtered_df['Nominal Dividends'].iloc[i]
-        dividend_percentage = (dividend / composite_value) / 12  # Monthly dividend %
-
-        if i == 0:
-            ending_value = initial_investment
-        else:
-            previous_composite_value = filtered_df['Composite'].iloc[i - 1]
-            composite_return = composite_value / previous_composite_value
-            ending_value *= composite_return
-
-        dividend_paid = dividend_percentage * ending_value
-        total_dividends += dividend_paid
-
-        results['Date'].append(date)
-        results['Composite Value'].append(composite_value)
-        results['Dividend'].append(dividend)
-        results['Dividend %'].append(dividend_percentage)
-        results['Dividend Paid'].append(dividend_paid)
-        results['Ending Value'].append(ending_value)
-
-    final_ending_value = results['Ending Value'][-1]
-    return pd.DataFrame(results), total_dividends, final_ending_value
-
-
-def calculate_dividends_with_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000):
-    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m')
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)].reset_index(drop=True)
-    results = {
-        'Date': [], 'Total Return Value': [], 'Composite Value': [], 'Dividend': [], 'Dividend %': [],
-        'Dividend Reinvested': [], 'Ending Value': []
-    }
-    ending_value = initial_investment
-    total_dividends_reinvested = 0
+def _ending_value_path(values, initial_investment):
+    """
+    Returns the ending-value path obtained by compounding initial_investment with the
+    month-over-month ratios of values (cumulative product of ratios, first month = initial_investment).
+    """
+    growth = np.empty(len(values))
+    growth[:1] = initial_investment
+    growth[1:] = values[1:] / values[:-1]
+    return np.cumprod(growth)
 
-    for i in range(len(filtered_df)):
-        date = filtered_df['Date'].iloc[i]
-        total_return_value = filtered_df['Total Return'].iloc[i]
-        composite_value = filtered_df['Composite'].iloc[i]
-        dividend = filtered_df['Nominal Dividends'].iloc[i]
-        dividend_percentage = (dividend / composite_value) / 12
 
-        if i > 0:
-            previous_total_return_value = filtered_df['Total Return'].iloc[i - 1]
-            total_return_growth = (total_return_value - previous_total_return_value) / previous_total_return_value
-            ending_value *= (1 + total_return_growth)
+def _dividend_percentage(dividends, prices, periods_per_year):
+    # Dividends are quoted as annual amounts and paid out evenly over the year's periods
+    return (dividends / prices) / periods_per_year
 
-        dividend_reinvested = dividend_percentage * ending_value
-        total_dividends_reinvested += dividend_reinvested
 
-        results['Date'].append(date)
-        results['Total Return Value'].append(total_return_value)
-        results['Composite Value'].append(composite_value)
-        results['Dividend'].append(dividend)
-        results['Dividend %'].append(dividend_percentage)
-        results['Dividend Reinvested'].append(dividend_reinvested)
-        results['Ending Value'].append(ending_value)
+class _WindowArrays:
+    """
+    Column arrays of one MarketDataset window, with the intermediates shared between strategies
+    (per-period dividend percentages and ending-value paths) computed at most once.
+    """
 
-    final_ending_value = results['Ending Value'][-1]
-    return pd.DataFrame(results), total_dividends_reinvested, final_ending_value
+    def __init__(self, window, periods_per_year):
+        self.dates = window.dates
+        self.periods_per_year = periods_per_year
+        self._window = window
+        self._derived = {}
 
+    def column(self, name):
+        return self._window.column(name)
 
-# Real Dividend Calculations
+    def dividend_percentage(self, dividend_column, price_column):
+        key = ('dividend %', dividend_column, price_column)
+        if key not in self._derived:
+            self._derived[key] = _dividend_percentage(
+                self.column(dividend_column), self.column(price_column), self.periods_per_year)
+        return self._derived[key]
 
-def calculate_real_dividends_no_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000):
-    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m')
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)].reset_index(drop=True)
-    results = {
-        'Date': [], 'Real Composite Value': [], 'Real Dividend': [], 'Dividend %': [], 'Dividend Paid': [], 'Real Ending Value': []
-    }
-    ending_value = initial_investment
-    total_real_dividends = 0
-
-    for i in range(len(filtered_df)):
-        date = filtered_df['Date'].iloc[i]
-        real_composite_value = filtered_df['Real Composite'].iloc[i]
-        real_dividend = filtered_df['Real Dividends'].iloc[i]
-        real_dividend_percentage = (real_dividend / real_composite_value) / 12
-
-        if i > 0:
-            previous_real_composite_value = filtered_df['Real Composite'].iloc[i - 1]
-            real_composite_return = real_composite_value / previous_real_composite_value
-            ending_value *= real_composite_return
-
-        dividend_paid = real_dividend_percentage * ending_value
-        total_real_dividends += dividend_paid
-
-        results['Date'].append(date)
-        results['Real Composite Value'].append(real_composite_value)
-        results['Real Dividend'].append(real_dividend)
-        results['Dividend %'].append(real_dividend_percentage)
-        results['Dividend Paid'].append(dividend_paid)
-        results['Real Ending Value'].append(ending_value)
-
-    final_real_ending_value = results['Real Ending Value'][-1]
-    return pd.DataFrame(results), total_real_dividends, final_real_ending_value
-
-
-def calculate_real_dividends_with_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000):
-    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m')
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)].reset_index(drop=True)
-    results = {
-        'Date': [], 'Real Total Return Value': [], 'Real Composite Value': [], 'Real Dividend': [], 'Dividend %': [],
-        'Dividend Reinvested': [], 'Real Ending Value': []
-    }
-    ending_value = initial_investment
-    total_real_dividends_reinvested = 0
+    def ending_value(self, value_column, initial_investment):
+        key = ('ending value', value_column, initial_investment)
+        if key not in self._derived:
+            self._derived[key] = _ending_value_path(self.column(value_column), initial_investment)
+        return self._derived[key]
 
-    for i in range(len(filtered_df)):
-        date = filtered_df['Date'].iloc[i]
-        real_total_return_value = filtered_df['Real Total Return'].iloc[i]
-        real_composite_value = filtered_df['Real Composite'].iloc[i]
-        real_dividend = filtered_df['Real Dividends'].iloc[i]
-        real_dividend_percentage = (real_dividend / real_composite_value) / 12
 
-        if i > 0:
-            previous_real_total_return_value = filtered_df['Real Total Return'].iloc[i - 1]
-            real_total_return_growth = (real_total_return_value - previous_real_total_return_value) / previous_real_total_return_value
-            ending_value *= (1 + real_total_return_growth)
+def _window_arrays(df, start_date, end_date, periods_per_year=None):
+    dataset = MarketDataset.coerce(df)
+    return _WindowArrays(dataset.window(start_date, end_date), periods_per_year or dataset.periods_per_year)
 
-        dividend_reinvested = real_dividend_percentage * ending_value
-        total_real_dividends_reinvested += dividend_reinvested
 
-        results['Date'].append(date)
-        results['Real Total Return Value'].append(real_total_return_value)
-        results['Real Composite Value'].append(real_composite_value)
-        results['Real Dividend'].append(real_dividend)
-        results['Dividend %'].append(real_dividend_percentage)
-        results['Dividend Reinvested'].append(dividend_reinvested)
-        results['Real Ending Value'].append(ending_value)
+# Strategy builders operating on a shared window
 
-    final_real_ending_value = results['Real Ending Value'][-1]
-    return pd.DataFrame(results), total_real_dividends_reinvested, final_real_ending_value
+def _nominal_no_reinvestment(window, initial_investment):
+    composite = window.column('Composite')
+    dividend_percentage = window.dividend_percentage('Nominal Dividends', 'Composite')  # Dividend % per period
+    ending_value = window.ending_value('Composite', initial_investment)
+    dividend_paid = dividend_percentage * ending_value
 
+    results = pd.DataFrame({
+        'Date': window.dates, 'Composite Value': composite, 'Dividend': window.column('Nominal Dividends'),
+        'Dividend %': dividend_percentage, 'Dividend Paid': dividend_paid, 'Ending Value': ending_value
+    })
+    return results, dividend_paid.sum(), ending_value[-1]
 
-# Wrapper Function to Calculate All Dividend Types
 
-def calculate_dividends(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000):
-    nominal_no_reinvestment_df, total_dividends_no_reinvestment, final_ending_value_no_reinvestment = calculate_dividends_no_reinvestment(
-        df, start_date=start_date, end_date=end_date, initial_investment=initial_investment
-    )
+def _nominal_with_reinvestment(window, initial_investment):
+    dividend_percentage = window.dividend_percentage('Nominal Dividends', 'Composite')
+    ending_value = window.ending_value('Total Return', initial_investment)
+    dividend_reinvested = dividend_percentage * ending_value
 
-    nominal_with_reinvestment_df, total_dividends_reinvested, final_ending_value_reinvested = calculate_dividends_with_reinvestment(
-        df, start_date=start_date, end_date=end_date, initial_investment=initial_investment
-    )
+    results = pd.DataFrame({
+        'Date': window.dates, 'Total Return Value': window.column('Total Return'),
+        'Composite Value': window.column('Composite'), 'Dividend': window.column('Nominal Dividends'),
+        'Dividend %': dividend_percentage, 'Dividend Reinvested': dividend_reinvested, 'Ending Value': ending_value
+    })
+    return results, dividend_reinvested.sum(), ending_value[-1]
 
-    real_no_reinvestment_df, total_real_dividends_no_reinvestment, final_real_ending_value_no_reinvestment = calculate_real_dividends_no_reinvestment(
-        df, start_date=start_date, end_date=end_date, initial_investment=initial_investment
-    )
 
-    real_with_reinvestment_df, total_real_dividends_reinvested, final_real_ending_value_reinvested = calculate_real_dividends_with_reinvestment(
-        df, start_date=start_date, end_date=end_date, initial_investment=initial_investment
-    )
+def _real_no_reinvestment(window, initial_investment):
+    real_dividend_percentage = window.dividend_percentage('Real Dividends', 'Real Composite')
+    ending_value = window.ending_value('Real Composite', initial_investment)
+    dividend_paid = real_dividend_percentage * ending_value
+
+    results = pd.DataFrame({
+        'Date': window.dates, 'Real Composite Value': window.column('Real Composite'),
+        'Real Dividend': window.column('Real Dividends'), 'Dividend %': real_dividend_percentage,
+        'Dividend Paid': dividend_paid, 'Real Ending Value': ending_value
+    })
+    return results, dividend_paid.sum(), ending_value[-1]
+
+
+def _real_with_reinvestment(window, initial_investment):
+    real_dividend_percentage = window.dividend_percentage('Real Dividends', 'Real Composite')
+    ending_value = window.ending_value('Real Total Return', initial_investment)
+    dividend_reinvested = real_dividend_percentage * ending_value
+
+    results = pd.DataFrame({
+        'Date': window.dates, 'Real Total Return Value': window.column('Real Total Return'),
+        'Real Composite Value': window.column('Real Composite'), 'Real Dividend': window.column('Real Dividends'),
+        'Dividend %': real_dividend_percentage, 'Dividend Reinvested': dividend_reinvested,
+        'Real Ending Value': ending_value
+    })
+    return results, dividend_reinvested.sum(), ending_value[-1]
+
+
+# Nominal Dividend Calculations
 
+@timed
+def calculate_dividends_no_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000,
+                                        periods_per_year=None):
+    return _nominal_no_reinvestment(_window_arrays(df, start_date, end_date, periods_per_year), initial_investment)
+
+
+@timed
+def calculate_dividends_with_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000,
+                                          periods_per_year=None):
+    return _nominal_with_reinvestment(_window_arrays(df, start_date, end_date, periods_per_year), initial_investment)
+
+
+# Real Dividend Calculations
+
+@timed
+def calculate_real_dividends_no_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000,
+                                             periods_per_year=None):
+    return _real_no_reinvestment(_window_arrays(df, start_date, end_date, periods_per_year), initial_investment)
+
+
+@timed
+def calculate_real_dividends_with_reinvestment(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000,
+                                               periods_per_year=None):
+    return _real_with_reinvestment(_window_arrays(df, start_date, end_date, periods_per_year), initial_investment)
+
+
+# Wrapper Function to Calculate All Dividend Types
+
+@timed
+def calculate_dividends(df, start_date=config.BEGIN_DATE, end_date=config.END_DATE, initial_investment=10000,
+                        periods_per_year=None):
+    """
+    Calculates all four dividend strategies in a single pass: the date window is located
+    once and the dividend percentages are shared between the nominal and real builders.
+
+    The returned dict is the result object for one set of inputs; callers in the same rerun
+    (create_comparison_table, calculate_income_metrics) accept it through their
+    dividend_results parameter instead of recomputing it.
+
+    The annual dividends are spread over periods_per_year payments (default: the dataset's
+    frequency, 12 for the monthly data and 252 for daily data).
+    """
+    window = _window_arrays(df, start_date, end_date, periods_per_year)
     return {
-        "Nominal_No_Reinvestment": (nominal_no_reinvestment_df, total_dividends_no_reinvestment, final_ending_value_no_reinvestment),
-        "Nominal_With_Reinvestment": (nominal_with_reinvestment_df, total_dividends_reinvested, final_ending_value_reinvested),
-        "Real_No_Reinvestment": (real_no_reinvestment_df, total_real_dividends_no_reinvestment, final_real_ending_value_no_reinvestment),
-        "Real_With_Reinvestment": (real_with_reinvestment_df, total_real_dividends_reinvested, final_real_ending_value_reinvested),
+        "Nominal_No_Reinvestment": _nominal_no_reinvestment(window, initial_investment),
+        "Nominal_With_Reinvestment": _nominal_with_reinvestment(window, initial_investment),
+        "Real_No_Reinvestment": _real_no_reinvestment(window, initial_investment),
+        "Real_With_Reinvestment": _real_with_reinvestment(window, initial_investment),
     }
 
 
 # Streamlit Display Code for Testing
 
 if __name__ == "__main__":
+    # The Streamlit preview imports the UI and loading modules only when run directly
+    import streamlit as st
+    import graph  # Import the graph module for charting
+    from data_loader import load_data
+
     # Load the data
     try:
         data_df = load_data()
@@ -0,0 +1,192 @@
+# drawdowns.py
+import threading
+
+import numpy as np
+import pandas as pd
+
+from bears import build_bear_market_index
+from market_dataset import first_changed_row
+
+# Bear markets detected directly from a price series.
+#
+# A single pass alternates between two states: while rising it tracks the running peak and starts
+# a bear market once the series falls `threshold` below it; while falling it tracks the running
+# trough and ends the bear market once the series rallies `threshold` (in absolute terms) above
+# the trough. Completed bear markets wait on a stack until the series regains their peak, which
+# gives the recovery time. The stack's peaks are decreasing (a later bear market can only start
+# below an unrecovered earlier peak), so each month pops at most the recovered tail and the
+# whole pass stays O(n). The state survives between calls, so appended months are fed in
+# without rescanning the history.
+
+DETECTION_COLUMNS = ['Composite', 'Real Composite', 'Total Return']
+
+BEAR_MARKET_COLUMNS = [
+    'Bear Market Period', 'Peak Value', 'Trough Value', 'Percentage Decline', 'Duration (Days)',
+    'Recovery Date', 'Recovery (Days)',
+]
+
+
+def _format_day(date):
+    return f"{date:%B} {date.day}, {date.year}"
+
+
+class DrawdownDetector:
+    """
+    Streaming peak/trough detector for one series and one decline threshold.
+
+    Parameters:
+    - threshold (float): Decline that starts a bear market, as a negative fraction (e.g. -0.2).
+    """
+
+    def __init__(self, threshold):
+        if not -1 < threshold < 0:
+            raise ValueError("threshold must be a negative fraction between -1 and 0.")
+        self.threshold = threshold
+        self.rally = -threshold
+        self.rows_seen = 0
+        self.falling = False
+        self.peak = self.trough = None  # (date, value)
+        self.completed = []  # [peak date, peak value, trough date, trough value, recovery date]
+        self._unrecovered = []  # positions in completed, peaks decreasing
+
+    def update(self, dates, values):
+        """
+        Feeds the next months (in date order); missing values are skipped.
+
+        Returns:
+        - DrawdownDetector: self, for chaining.
+        """
+        dates = pd.DatetimeIndex(dates)
+        values = np.asarray(values, dtype=float)
+        for date, value in zip(dates, values):
+            self.rows_seen += 1
+            if np.isnan(value):
+                continue
+
+            # Recoveries of earlier bear markets, cheapest peak first
+            while self._unrecovered and value >= self.completed[self._unrecovered[-1]][1]:
+                self.completed[self._unrecovered.pop()][4] = date
+
+            if self.peak is None:
+                self.peak = (date, value)
+            elif not self.falling:
+                if value > self.peak[1]:
+                    self.peak = (date, value)
+                elif value <= self.peak[1] * (1 + self.threshold):
+                    self.falling = True
+                    self.trough = (date, value)
+            elif value < self.trough[1]:
+                self.trough = (date, value)
+            elif value >= self.trough[1] * (1 + self.rally):
+                self._complete()
+                self.peak = (date, value)
+        return self
+
+    def _complete(self):
+        peak_date, peak_value = self.peak
+        trough_date, trough_value = self.trough
+        self.completed.append([peak_date, peak_value, trough_date, trough_value, None])
+        self._unrecovered.append(len(self.completed) - 1)
+        self.falling = False
+        self.trough = None
+
+    def bear_markets(self, include_open=False):
+        """
+        Returns the detected bear markets in the shape of load_bear_market_periods plus the
+        recovery to the prior peak.
+
+        Parameters:
+        - include_open (bool): Also list a decline still in progress (trough so far).
+
+        Returns:
+        - pd.DataFrame: Columns BEAR_MARKET_COLUMNS; 'Recovery Date' is NaT and 'Recovery (Days)'
+          NaN until the series regains the peak.
+        """
+        rows = [list(row) for row in self.completed]
+        if include_open and self.falling:
+            rows.append([*self.peak, *self.trough, None])
+        table = pd.DataFrame(rows, columns=['Peak Date', 'Peak Value', 'Trough Date', 'Trough Value', 'Recovery Date'])
+        peak_dates = pd.DatetimeIndex(table['Peak Date'])
+        trough_dates = pd.DatetimeIndex(table['Trough Date'])
+        recovery_dates = pd.DatetimeIndex(table['Recovery Date'])
+        return pd.DataFrame({
+            'Bear Market Period': [f"{_format_day(peak)} - {_format_day(trough)}"
+                                   for peak, trough in zip(peak_dates, trough_dates)],
+            'Peak Value': table['Peak Value'].astype(float),
+            'Trough Value': table['Trough Value'].astype(float),
+            'Percentage Decline': (table['Trough Value'] / table['Peak Value'] - 1).astype(float),
+            'Duration (Days)': (trough_dates - peak_dates).days.astype(int),
+            'Recovery Date': recovery_dates,
+            'Recovery (Days)': (recovery_dates - trough_dates).days.to_numpy(dtype=float),
+        }, columns=BEAR_MARKET_COLUMNS)
+
+
+class BearMarketDetections:
+    """
+    Detected bear markets of a MarketDataset, cached per (column, threshold).
+
+    Each detector keeps its streaming state, so extend() only feeds the months appended since the
+    last call; the tables and EventIndexes built from them are rebuilt lazily afterwards.
+
+    Parameters:
+    - dataset (MarketDataset): The market data.
+    - lock (threading.RLock, optional): Lock guarding the detectors and the dataset switch; pass the
+      owner's lock (MarketDataStore does) so lookups never see a half-applied update.
+    """
+
+    def __init__(self, dataset, lock=None):
+        self.dataset = dataset
+        self._lock = threading.RLock() if lock is None else lock
+        self._detectors = {}
+        self._indexes = {}
+
+    @staticmethod
+    def _key(column, threshold):
+        # Slider values such as -0.2 and -0.20000000000000001 share one detector
+        return column, round(float(threshold), 6)
+
+    def detector(self, column, threshold):
+        """
+        Returns the detector of a column and threshold, running it over the dataset on first use.
+        """
+        key = self._key(column, threshold)
+        with self._lock:
+            if key not in self._detectors:
+                dataset = self.dataset
+                self._detectors[key] = DrawdownDetector(key[1]).update(dataset.dates, dataset[column])
+            return self._detectors[key]
+
+    def bear_markets(self, column, threshold):
+        """
+        Returns the completed bear markets of a column (see DrawdownDetector.bear_markets).
+        """
+        with self._lock:
+            return self.detector(column, threshold).bear_markets()
+
+    def index(self, column, threshold):
+        """
+        Returns the bear markets of a column as an EventIndex for bears.calculate_bear_market_metrics.
+        """
+        key = self._key(column, threshold)
+        with self._lock:
+            if key not in self._indexes:
+                self._indexes[key] = build_bear_market_index(self.bear_markets(column, threshold))
+            return self._indexes[key]
+
+    def extend(self, dataset):
+        """
+        Switches to an updated dataset. Detectors whose column only gained months are fed the new
+        months; a detector that already saw a revised row is run again from the start.
+        """
+        with self._lock:
+            old = self.dataset
+            for key, detector in list(self._detectors.items()):
+                column = key[0]
+                changed = first_changed_row(old.months, {column: old[column]},
+                                            dataset.months, {column: dataset[column]})
+                if changed < detector.rows_seen:
+                    detector = self._detectors[key] = DrawdownDetector(key[1])
+                detector.update(dataset.dates[detector.rows_seen:], dataset[column][detector.rows_seen:])
+            self.dataset = dataset
+            self._indexes.clear()
+        return self
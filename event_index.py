@@ -0,0 +1,163 @@
+# event_index.py
+import numpy as np
+import pandas as pd
+
+# Interval index over a table of dated events (bear markets, recessions).
+#
+# The events are parsed and sorted once; a date-range query is then two binary searches over
+# the start/end arrays, and the window statistics come from prefix sums and sparse tables
+# (range min/max) instead of re-parsing and masking the table on every call.
+
+NANOSECONDS_PER_DAY = 86_400 * 10**9
+
+
+def _prefix_sum(values):
+    prefix = np.zeros(len(values) + 1)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+class _SparseTable:
+    """
+    O(1) range queries for an idempotent reduction (np.fmin / np.fmax, which skip NaN).
+    """
+
+    def __init__(self, values, reduce):
+        self.reduce = reduce
+        self.levels = [np.asarray(values, dtype=float)]
+        width = 1
+        while 2 * width <= len(values):
+            previous = self.levels[-1]
+            self.levels.append(reduce(previous[:-width], previous[width:]))
+            width *= 2
+
+    def query(self, lo, hi):
+        # Reduction over values[lo:hi]; hi > lo
+        level = int(hi - lo).bit_length() - 1
+        values = self.levels[level]
+        return self.reduce(values[lo], values[hi - (1 << level)])
+
+
+class EventIndex:
+    """
+    Read-only index of events sorted by start date.
+
+    Parameters:
+    - starts, ends (array-like): Start and end dates of each event.
+    - values (dict): {name: float array} of per-event numbers (e.g. declines) aligned with the dates.
+    - events (pd.DataFrame): Per-event rows returned by rows(), aligned with the dates.
+    """
+
+    def __init__(self, starts, ends, values, events):
+        order = np.argsort(pd.DatetimeIndex(starts).asi8, kind='stable')
+        self.starts = pd.DatetimeIndex(starts).asi8[order]
+        self.ends = pd.DatetimeIndex(ends).asi8[order]
+        self.values = {name: np.asarray(column, dtype=float)[order] for name, column in values.items()}
+        for array in [self.starts, self.ends, *self.values.values()]:
+            array.setflags(write=False)
+        self.events = events.iloc[order].reset_index(drop=True)
+
+        # Events inside a window form one contiguous run when the end dates are sorted too
+        # (i.e. the events do not nest); otherwise queries fall back to a mask.
+        self.contiguous = bool(np.all(np.diff(self.ends) >= 0))
+
+        start_days = self.starts // NANOSECONDS_PER_DAY
+        end_days = self.ends // NANOSECONDS_PER_DAY
+        self._start_days = start_days
+        # Gap k is the time from the end of event k - 1 to the start of event k
+        self._end_to_start_prefix = _prefix_sum(np.concatenate([[0], start_days[1:] - end_days[:-1]]))
+        self._minimum = {name: _SparseTable(column, np.fmin) for name, column in self.values.items()}
+        self._maximum = {name: _SparseTable(column, np.fmax) for name, column in self.values.items()}
+        self._at_most_prefix = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def window(self, start_date, end_date):
+        """
+        Returns the positions of the events with start >= start_date and end <= end_date: a
+        (lo, hi) slice bound pair for non-nesting events, otherwise an index array.
+        """
+        start, end = pd.Timestamp(start_date).value, pd.Timestamp(end_date).value
+        lo = int(np.searchsorted(self.starts, start, side='left'))
+        if self.contiguous:
+            hi = int(np.searchsorted(self.ends, end, side='right'))
+            return lo, max(lo, hi)
+        return lo + np.flatnonzero(self.ends[lo:] <= end)
+
+    def count(self, window):
+        return window[1] - window[0] if isinstance(window, tuple) else len(window)
+
+    def minimum(self, name, window):
+        """
+        Smallest value of a column inside the window (NaN if empty).
+        """
+        if isinstance(window, tuple):
+            return self._minimum[name].query(*window) if window[1] > window[0] else np.nan
+        return np.nanmin(self.values[name][window]) if len(window) else np.nan
+
+    def maximum(self, name, window):
+        """
+        Largest value of a column inside the window (NaN if empty).
+        """
+        if isinstance(window, tuple):
+            return self._maximum[name].query(*window) if window[1] > window[0] else np.nan
+        return np.nanmax(self.values[name][window]) if len(window) else np.nan
+
+    def mean(self, name, window):
+        """
+        Mean of a column inside the window, skipping NaN (NaN if empty).
+
+        Summed over the selected values rather than differenced from a prefix sum, so the result
+        is bit-identical to pandas' mean and rounds the same way for display.
+        """
+        values = self.values[name][slice(*window) if isinstance(window, tuple) else window]
+        present = values[~np.isnan(values)]
+        return present.sum() / len(present) if len(present) else np.nan
+
+    def count_at_most(self, name, threshold, window):
+        """
+        Number of events inside the window whose value is <= threshold.
+        """
+        if isinstance(window, tuple):
+            key = (name, threshold)
+            if key not in self._at_most_prefix:
+                self._at_most_prefix[key] = _prefix_sum(self.values[name] <= threshold)
+            prefix = self._at_most_prefix[key]
+            return int(prefix[window[1]] - prefix[window[0]])
+        return int(np.count_nonzero(self.values[name][window] <= threshold))
+
+    def mean_start_gap_days(self, window):
+        """
+        Mean number of days between consecutive event starts inside the window (NaN for fewer than two).
+        """
+        if self.count(window) < 2:
+            return np.nan
+        # The start-to-start gaps of a run telescope to last start - first start
+        if isinstance(window, tuple):
+            lo, hi = window
+            return (self._start_days[hi - 1] - self._start_days[lo]) / (hi - lo - 1)
+        return np.diff(self._start_days[window]).mean()
+
+    def mean_end_to_start_gap_days(self, window):
+        """
+        Mean number of days from the end of one event to the start of the next inside the window
+        (NaN for fewer than two).
+        """
+        if self.count(window) < 2:
+            return np.nan
+        if isinstance(window, tuple):
+            lo, hi = window
+            return (self._end_to_start_prefix[hi] - self._end_to_start_prefix[lo + 1]) / (hi - lo - 1)
+        end_days = self.ends[window] // NANOSECONDS_PER_DAY
+        return (self._start_days[window][1:] - end_days[:-1]).mean()
+
+    def rows(self, window):
+        """
+        Returns the rows of the events inside the window as a new DataFrame.
+        """
+        if isinstance(window, tuple):
+            rows = self.events.iloc[window[0]:window[1]]
+        else:
+            rows = self.events.iloc[window]
+        return rows.reset_index(drop=True)
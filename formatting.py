@@ -0,0 +1,229 @@
+# formatting.py
+import numpy as np
+import pandas as pd
+
+from metrics import INVESTMENT_COLUMNS
+
+# Presentation layer: turns the numeric results of the calculation modules into the string
+# tables the app shows (see utility.format_table for the styling). Nothing in here is used by
+# the calculations themselves, so batch consumers read the raw numbers directly.
+
+NA = "NA"
+
+
+def format_currency(value, decimals=0):
+    """
+    Formats a money amount as "$1,234" ("NA" for a missing value).
+    """
+    if value is None or pd.isna(value):
+        return NA
+    return f"${value:,.{decimals}f}"
+
+
+def format_percent(fraction, decimals=1):
+    """
+    Formats a decimal fraction as a percentage, e.g. -0.568 as "-56.8%".
+    """
+    return f"{fraction * 100:.{decimals}f}%"
+
+
+def format_years_months(days, missing_as_zero=True):
+    """
+    Formats a number of days as "<years> years, <months> months" (365-day years, 30-day months).
+
+    Parameters:
+    - days (float): Number of days; NaN when there was nothing to measure.
+    - missing_as_zero (bool): Show NaN as "0 years, 0 months" rather than "nan years, nan months".
+    """
+    if pd.isna(days):
+        if missing_as_zero:
+            days = 0
+        else:
+            return "nan years, nan months"
+    days = int(days)
+    return f"{days // 365} years, {(days % 365) // 30} months"
+
+
+# Comparison and income tables
+
+def format_comparison_table(table):
+    """
+    Formats an investment_comparison.create_comparison_table result for display.
+    """
+    formatted = table.copy()
+    for column in ["Total Dividends/Interest", "Ending Value"]:
+        formatted[column] = table[column].map(format_currency).astype(object)
+    return formatted
+
+
+def format_income_metrics(table):
+    """
+    Formats an income_metrics.calculate_income_metrics result for display.
+    """
+    formatted = table.copy()
+    for column in ["Initial Value", "Ending Value", "Current Income"]:
+        formatted[column] = table[column].map("${:,.0f}".format)  # Currency, no decimals
+    formatted["Current Income as % of Original Investment"] = table[
+        "Current Income as % of Original Investment"
+    ].map("{:.2f}%".format)  # Percentage, two decimals
+    return formatted
+
+
+# Market metrics
+
+def format_metrics_table(table, decimals=2):
+    """
+    Formats a metrics.calculate_metrics result: currency without decimals for the begin and end
+    values of the investment columns, `decimals` places everywhere else.
+    """
+    decimal_format = f"{{:.{decimals}f}}"
+    currency = table['Metric'].isin(INVESTMENT_COLUMNS).to_numpy()
+    formatted = table.copy()
+    for column in ['Begin Value', 'End Value']:
+        formatted[column] = [
+            f"${value:,.0f}" if is_currency else decimal_format.format(value)
+            for value, is_currency in zip(table[column], currency)
+        ]
+    formatted['Increase Factor'] = table['Increase Factor'].map(decimal_format.format)
+    return formatted
+
+
+def format_horizons_table(horizons_matrix, quantity='Increase Factor', decimals=2):
+    """
+    Formats one quantity of metrics.calculate_horizons_matrix as a side-by-side table, one column per period.
+
+    Parameters:
+    - horizons_matrix (pd.DataFrame): Result of calculate_horizons_matrix.
+    - quantity (str): 'Begin Value', 'End Value' or 'Increase Factor'.
+    - decimals (int): Number of decimal places for non-currency values.
+
+    Returns:
+    - pd.DataFrame: String table with a 'Metric' column followed by one column per period.
+    """
+    values = horizons_matrix.xs(quantity, axis=1, level='Quantity')
+    decimal_format = f"{{:.{decimals}f}}"
+    currency = values.index.isin(INVESTMENT_COLUMNS) & (quantity != 'Increase Factor')
+    table = values.apply(
+        lambda column: [f"${value:,.0f}" if is_currency else decimal_format.format(value)
+                        for value, is_currency in zip(column, currency)]
+    )
+    table.columns.name = None
+    return table.reset_index()
+
+
+# Bear markets and recessions
+
+def format_bear_market_summary(summary):
+    """
+    Formats a bears.BearMarketSummary as the two-column (Metric, Value) summary table.
+    """
+    if summary is None:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        'Metric': [
+            'Number of Bear Markets',
+            'Largest Decline (%)',
+            'Average Decline (%)',
+            'Average Time Between Bear Markets (Start to Start) (Years, Months)',
+            'Average Time Between End of Bear Market to the Start of Another (Years, Months)',
+            'Number of Bear Market Declines >= -50%'
+        ],
+        'Value': [
+            summary.count,
+            format_percent(summary.largest_decline),
+            format_percent(summary.average_decline),
+            format_years_months(summary.average_days_start_to_start),
+            format_years_months(summary.average_days_end_to_start),
+            summary.count_worse_than_threshold
+        ]
+    })
+
+
+def format_bear_markets(bear_markets):
+    """
+    Formats the bear markets of a period (bears.calculate_bear_market_metrics) for display.
+    """
+    formatted = bear_markets.copy()
+    if formatted.empty:
+        return formatted
+    formatted['Percentage Decline'] = bear_markets['Percentage Decline'].map(format_percent)
+    formatted['Peak Value'] = bear_markets['Peak Value'].map("{:.2f}".format)
+    formatted['Trough Value'] = bear_markets['Trough Value'].map("{:.2f}".format)
+    # Bear markets detected from a series (drawdowns.py) also carry the recovery to the prior peak
+    if 'Recovery Date' in bear_markets:
+        formatted['Recovery Date'] = bear_markets['Recovery Date'].dt.strftime('%Y-%m').fillna("Not recovered")
+        formatted['Recovery (Days)'] = bear_markets['Recovery (Days)'].map(
+            lambda days: "" if pd.isna(days) else f"{days:.0f}")
+    return formatted
+
+
+def format_recession_summary(summary):
+    """
+    Formats a recession_data.RecessionSummary as the two-column (Metric, Value) summary table.
+    """
+    return pd.DataFrame({
+        'Metric': [
+            'Number of Recessions',
+            'Worst GDP Decline (%)',
+            'Average Frequency Between Recessions (Years, Months)',
+            'Peak Unemployment (%)'
+        ],
+        'Value': [
+            summary.count,
+            format_percent(summary.worst_gdp_decline),
+            format_years_months(np.floor(summary.average_days_between), missing_as_zero=False),
+            format_percent(summary.peak_unemployment)
+        ]
+    })
+
+
+def format_recessions(recessions):
+    """
+    Formats the recessions of a period (recession_data.calculate_recession_metrics) for display.
+    """
+    formatted = recessions.copy()
+    for column in ['Begin Date', 'End Date']:
+        formatted[column] = pd.to_datetime(recessions[column]).dt.strftime('%Y-%m-%d')
+    for column in ['Decline (%)', 'Peak Unemployment (%)']:
+        formatted[column] = recessions[column].map(format_percent)
+    return formatted
+
+
+# Safe withdrawal rates
+
+def format_withdrawal_rate_summary(summary, decimals=2):
+    """
+    Formats a withdrawals.withdrawal_rate_summary result, rates as percentages.
+    """
+    formatted = summary.copy()
+    formatted['Value'] = summary['Value'].map(lambda rate: format_percent(rate, decimals))
+    return formatted
+
+
+# Dollar-cost averaging
+
+def format_dca_summary(summary):
+    """
+    Formats a dca.dca_summary result: currency ending values, IRRs as percentages.
+    """
+    formatted = summary.copy()
+    for column in summary.columns:
+        if column.startswith('Ending Value'):
+            formatted[column] = summary[column].map(format_currency)
+        elif column.startswith('IRR'):
+            formatted[column] = summary[column].map(lambda rate: format_percent(rate, 2))
+    return formatted
+
+
+# Allocation sweep
+
+def format_allocation_table(table):
+    """
+    Formats rows of an allocation.sweep_allocations result: percentages and currency.
+    """
+    formatted = table.copy()
+    formatted['Stock Allocation'] = table['Stock Allocation'].map(lambda share: format_percent(share, 0))
+    formatted['Ending Value'] = table['Ending Value'].map(format_currency)
+    for column in ['CAGR', 'Volatility', 'Max Drawdown']:
+        formatted[column] = table[column].map(lambda fraction: NA if pd.isna(fraction) else format_percent(fraction, 2))
+    return formatted
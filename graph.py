@@ -1,20 +1,109 @@
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
+from market_dataset import MarketDataset
 
 # November 15
 
+# Traces longer than this are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_THRESHOLD = 1000
+
+
+# Line downsampling
+
+def lttb_indices(x, y, max_points):
+    """
+    Selects the points of a line to keep with Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; the points in between are split into
+    max_points - 2 equal buckets and from each the point forming the largest triangle with the
+    previously kept point and the average of the next bucket is kept, which preserves peaks,
+    troughs and the overall shape.
+
+    Parameters:
+    x (array-like): X values in ascending order (numbers or datetimes).
+    y (array-like): Y values.
+    max_points (int): Point budget (at least 3).
+
+    Returns:
+    np.ndarray: Sorted positions of the kept points (all positions when len(x) <= max_points).
+    """
+    n = len(x)
+    if max_points is None or n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    x = pd.to_numeric(pd.Series(x)).to_numpy(dtype=float)  # datetimes become nanoseconds
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    # Gaps only steer which points are picked (the plotted values stay unchanged), so they are
+    # bridged by linear interpolation
+    present = np.isfinite(y)
+    if not present.all():
+        y = np.interp(x, x[present], y[present]) if present.any() else np.zeros(n)
+
+    # Average of every bucket, with the last point as the final "next bucket"
+    starts = np.append(edges[:-1], n - 1)
+    sizes = np.diff(np.append(starts, n))
+    average_x = np.add.reduceat(x, starts) / sizes
+    average_y = np.add.reduceat(y, starts) / sizes
+
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        dx, dy = x[previous] - average_x[bucket + 1], average_y[bucket + 1] - y[previous]
+        area = np.abs(dx * (y[start:stop] - y[previous]) - (x[previous] - x[start:stop]) * dy)
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def _line_trace(x, y, max_points=None, webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    # Downsamples a line to the point budget and switches to WebGL for long traces
+    kept = lttb_indices(x, y, max_points)
+    x, y = np.asarray(x)[kept], np.asarray(y)[kept]
+    trace_type = go.Scattergl if webgl_threshold is not None and len(kept) > webgl_threshold else go.Scatter
+    return trace_type(x=x, y=y, **kwargs)
+
+
+def figure_payload_bytes(fig):
+    """
+    Returns the size in bytes of the JSON a figure is sent to the browser as.
+    """
+    return len(fig.to_json().encode('utf-8'))
+
 
 # Existing function for creating dividend charts
-def create_dividends_ending_value_chart(df, title="Dividends and Ending Value Over Time"):
+def create_dividends_ending_value_chart(df, title="Dividends and Ending Value Over Time", max_points=None,
+                                        webgl_threshold=WEBGL_THRESHOLD):
+    """
+    Creates a two-axis line chart of the monthly income and the ending value.
+
+    Parameters:
+    df (pd.DataFrame): A divs.calculate_dividends or ltc_bonds.calculate_bond_paths result frame.
+    title (str): Chart title.
+    max_points (int, optional): Point budget per trace; longer traces are downsampled with
+                                lttb_indices. None keeps every point.
+    webgl_threshold (int, optional): Traces with more points than this are drawn with Scattergl.
+                                     None always uses SVG.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated chart.
+    """
     fig = go.Figure()
 
-    if 'Dividend Paid' in df.columns:
-        dividends_column = 'Dividend Paid'
-    elif 'Dividend Reinvested' in df.columns:
-        dividends_column = 'Dividend Reinvested'
-    else:
+    # Bond paths (ltc_bonds.calculate_bond_paths) carry interest instead of dividends
+    income_columns = {
+        'Dividend Paid': "Dividends", 'Dividend Reinvested': "Dividends",
+        'Interest Paid': "Interest", 'Interest Reinvested': "Interest",
+    }
+    dividends_column = next((column for column in income_columns if column in df.columns), None)
+    if dividends_column is None:
         fig.update_layout(title="Error: No Dividend Data Found")
         return fig
+    income_label = income_columns[dividends_column]
 
     if 'Ending Value' in df.columns:
         ending_value_column = 'Ending Value'
@@ -25,19 +114,23 @@ def create_dividends_ending_value_chart(df, title="Dividends and Ending Value Ov
         return fig
 
     fig.add_trace(
-        go.Scatter(
-            x=df['Date'],
-            y=df[dividends_column],
-            name="Dividends",
+        _line_trace(
+            df['Date'],
+            df[dividends_column],
+            max_points=max_points,
+            webgl_threshold=webgl_threshold,
+            name=income_label,
             mode="lines",
             yaxis="y1"
         )
     )
 
     fig.add_trace(
-        go.Scatter(
-            x=df['Date'],
-            y=df[ending_value_column],
+        _line_trace(
+            df['Date'],
+            df[ending_value_column],
+            max_points=max_points,
+            webgl_threshold=webgl_threshold,
             name="Ending Value",
             mode="lines",
             yaxis="y2"
@@ -48,7 +141,7 @@ def create_dividends_ending_value_chart(df, title="Dividends and Ending Value Ov
         title=title,
         xaxis=dict(title="Date"),
         yaxis=dict(
-            title="Dividends",
+            title=income_label,
             titlefont=dict(color="blue"),
             tickfont=dict(color="blue")
         ),
@@ -77,7 +170,7 @@ def create_bar_chart(df, start_date, end_date, font_size=14):
     Creates a bar chart for various increase factors over time with bold customized labels and adjustable font size.
 
     Parameters:
-    df (pd.DataFrame): DataFrame containing financial data.
+    df (MarketDataset or pd.DataFrame): Financial data.
     start_date (str): The start date for the range.
     end_date (str): The end date for the range.
     font_size (int): Font size for the bar labels.
@@ -85,23 +178,25 @@ def create_bar_chart(df, start_date, end_date, font_size=14):
     Returns:
     plotly.graph_objects.Figure: The generated bar chart.
     """
-    import pandas as pd
-
-    # Filter the DataFrame for the given date range
-    df['Date'] = pd.to_datetime(df['Date'])
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
+    # Locate the given date range in the pre-parsed dataset
+    dataset = MarketDataset.coerce(df)
+    window = dataset.window(start_date, end_date)
 
     # Validate required columns
     required_columns = ['Composite', 'Nominal Earnings', 'Nominal Dividends', 'CPI']
     for col in required_columns:
-        if col not in filtered_df.columns:
+        if col not in dataset:
             raise KeyError(f"Missing column in DataFrame: {col}")
 
+    def increase_factor(col):
+        values = window.column(col)
+        return values[-1] / values[0]
+
     # Calculate increase factors
-    composite_factor = filtered_df['Composite'].iloc[-1] / filtered_df['Composite'].iloc[0]
-    earnings_factor = filtered_df['Nominal Earnings'].iloc[-1] / filtered_df['Nominal Earnings'].iloc[0]
-    dividends_factor = filtered_df['Nominal Dividends'].iloc[-1] / filtered_df['Nominal Dividends'].iloc[0]
-    cpi_factor = filtered_df['CPI'].iloc[-1] / filtered_df['CPI'].iloc[0]
+    composite_factor = increase_factor('Composite')
+    earnings_factor = increase_factor('Nominal Earnings')
+    dividends_factor = increase_factor('Nominal Dividends')
+    cpi_factor = increase_factor('CPI')
 
     # Bar chart data
     factors = {
@@ -156,3 +251,246 @@ def create_bar_chart(df, start_date, end_date, font_size=14):
 
     return fig
     
+
+
+# Heatmap of annualized returns for every begin/end month pair
+
+def create_return_heatmap(return_window, title="Annualized Total Return by Begin and End Month"):
+    """
+    Creates a heatmap of annualized returns.
+
+    Parameters:
+    return_window (pd.DataFrame): Annualized returns (as fractions) indexed by begin month with
+                                  end months as columns, e.g. from ReturnMatrix.window.
+    title (str): Chart title.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated heatmap.
+    """
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=return_window.to_numpy() * 100,
+            x=list(return_window.columns),
+            y=list(return_window.index),
+            colorscale="RdYlGn",
+            zmid=0,
+            colorbar=dict(title="Annualized %"),
+            hovertemplate="Begin %{y}<br>End %{x}<br>%{z:.2f}%<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title="End Month"),
+        yaxis=dict(title="Begin Month", autorange="reversed"),
+    )
+    return fig
+
+
+# Percentile bands of simulated values over time
+
+def create_percentile_band_chart(bands, title="Simulated Value Percentiles", yaxis_title="Value"):
+    """
+    Creates a fan chart of simulated percentiles.
+
+    Parameters:
+    bands (pd.DataFrame): Values indexed by year with percentile columns such as 'P5', 'P25',
+                          'P50', 'P75', 'P95' (e.g. from monte_carlo.percentile_bands). The outer
+                          and inner column pairs are shaded and the middle column drawn as a line.
+    title (str): Chart title.
+    yaxis_title (str): Y-axis label.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated chart.
+    """
+    fig = go.Figure()
+    columns = list(bands.columns)
+    x = list(bands.index)
+
+    # Shade symmetric pairs from the outside in (e.g. P5-P95, then P25-P75)
+    for i, opacity in zip(range(len(columns) // 2), [0.15, 0.3, 0.45]):
+        lower, upper = columns[i], columns[-(i + 1)]
+        fig.add_trace(go.Scatter(x=x, y=bands[upper], mode="lines", line=dict(width=0),
+                                 showlegend=False, hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=x, y=bands[lower], mode="lines", line=dict(width=0), fill="tonexty",
+                                 fillcolor=f"rgba(0, 100, 200, {opacity})", name=f"{lower}-{upper}"))
+
+    median = columns[len(columns) // 2]
+    fig.add_trace(go.Scatter(x=x, y=bands[median], mode="lines", line=dict(color="navy"), name=median))
+
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title="Year"),
+        yaxis=dict(title=yaxis_title),
+        legend=dict(x=0.1, y=1.1, orientation="h"),
+    )
+    return fig
+
+
+# Safe withdrawal rates by retirement start month
+
+def create_withdrawal_rate_chart(start_dates, withdrawal_rates, title="Safe Withdrawal Rate by Start Month",
+                                 percentiles=None):
+    """
+    Creates a line chart of the safe withdrawal rate of every retirement start month.
+
+    Parameters:
+    start_dates (array-like): Retirement start months.
+    withdrawal_rates (array-like): Annual withdrawal rates as fractions, e.g. from
+                                   withdrawals.calculate_safe_withdrawal_rates.
+    title (str): Chart title.
+    percentiles (pd.DataFrame, optional): 'Metric'/'Value' rows (e.g. withdrawals.withdrawal_rate_summary)
+                                          drawn as dotted horizontal reference lines.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated chart.
+    """
+    fig = go.Figure()
+    fig.add_trace(_line_trace(start_dates, np.asarray(withdrawal_rates) * 100, mode="lines",
+                              name="Safe Withdrawal Rate", line=dict(color="seagreen")))
+    if percentiles is not None:
+        for metric, value in zip(percentiles['Metric'], percentiles['Value']):
+            fig.add_hline(y=value * 100, line=dict(color="gray", dash="dot", width=1),
+                          annotation_text=metric, annotation_position="right")
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title="Retirement Start"),
+        yaxis=dict(title="Annual Withdrawal (% of Initial Portfolio)", ticksuffix="%"),
+        hovermode="x unified",
+    )
+    return fig
+
+
+# Rolling-cohort results by start month
+
+def create_cohort_line_chart(start_dates, series, title="Results by Start Month", yaxis_title="Annualized Return (%)",
+                             as_percent=True, max_points=None):
+    """
+    Creates a line chart with one line per series over the cohort start months.
+
+    Parameters:
+    start_dates (array-like): Cohort start months.
+    series (dict): {name: values aligned with start_dates}, e.g. the IRR of each
+                   dca.calculate_dca_cohorts strategy.
+    title (str): Chart title.
+    yaxis_title (str): Y-axis label.
+    as_percent (bool): Values are decimal fractions to be shown in percent.
+    max_points (int, optional): Point budget per line (LTTB downsampling).
+
+    Returns:
+    plotly.graph_objects.Figure: The generated chart.
+    """
+    fig = go.Figure()
+    for name, values in series.items():
+        values = np.asarray(values, dtype=float) * (100 if as_percent else 1)
+        fig.add_trace(_line_trace(start_dates, values, max_points=max_points, mode="lines", name=name))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title="Start Month"),
+        yaxis=dict(title=yaxis_title, ticksuffix="%" if as_percent else None),
+        legend=dict(x=0.1, y=1.1, orientation="h"),
+        hovermode="x unified",
+    )
+    return fig
+
+
+# Stock/bond allocation frontier
+
+def create_allocation_frontier_chart(sweep, risk_column='Volatility', return_column='CAGR',
+                                     title="Stock/Bond Allocation Frontier"):
+    """
+    Creates a risk/return chart of an allocation sweep with one line per rebalancing frequency.
+
+    Parameters:
+    sweep (pd.DataFrame): Result of allocation.sweep_allocations.
+    risk_column (str): X-axis column, 'Volatility' or 'Max Drawdown' (fractions).
+    return_column (str): Y-axis column, e.g. 'CAGR' (fraction).
+    title (str): Chart title.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated chart.
+    """
+    fig = go.Figure()
+    for label, rows in sweep.groupby('Rebalancing', sort=False):
+        allocation = rows['Stock Allocation'].to_numpy() * 100
+        # Mark every 10% step so the allocations can be read off the curve
+        marker_size = np.where(np.isclose(allocation % 10, 0) | np.isclose(allocation % 10, 10), 7, 0)
+        fig.add_trace(go.Scatter(
+            x=rows[risk_column] * 100,
+            y=rows[return_column] * 100,
+            customdata=allocation,
+            mode="lines+markers",
+            marker=dict(size=marker_size),
+            name=f"Rebalanced {label}" if label != "Never" else "Never Rebalanced",
+            hovertemplate="%{customdata:.0f}% stocks<br>%{x:.2f}% / %{y:.2f}%<extra></extra>",
+        ))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title=f"{risk_column} (%)", ticksuffix="%"),
+        yaxis=dict(title=f"{return_column} (%)", ticksuffix="%"),
+        legend=dict(x=0.1, y=1.1, orientation="h"),
+    )
+    return fig
+
+
+# Bear market charts
+
+def create_decline_distribution_chart(filtered_bear_markets):
+    """
+    Creates a histogram of bear market percentage declines.
+
+    Parameters:
+    filtered_bear_markets (pd.DataFrame): Bear markets within the selected date range, as returned
+                                          by bears.calculate_bear_market_metrics.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated histogram.
+    """
+    import plotly.express as px
+
+    # Declines are decimal fractions; show them in percent
+    decline_values = filtered_bear_markets['Percentage Decline'] * 100
+
+    return px.histogram(
+        x=decline_values,
+        nbins=10,
+        title='Distribution of Bear Market Declines',
+        labels={'x': 'Percentage Decline (%)', 'y': 'Count'},
+        color_discrete_sequence=['indianred']
+    )
+
+
+def create_bear_market_timeline_chart(bear_market_data, start_date, end_date):
+    """
+    Creates a timeline of the bear markets within a date range.
+
+    Parameters:
+    bear_market_data (pd.DataFrame): Bear market periods as returned by load_bear_market_periods.
+    start_date (str or pd.Timestamp): The start date for filtering bear markets.
+    end_date (str or pd.Timestamp): The end date for filtering bear markets.
+
+    Returns:
+    plotly.graph_objects.Figure: The generated timeline.
+    """
+    import plotly.express as px
+
+    periods = bear_market_data['Bear Market Period'].str.split(' - ')
+    bear_market_periods = pd.DataFrame({
+        'Bear Market Period': bear_market_data['Bear Market Period'],
+        'Start Date': pd.to_datetime(periods.str[0]),
+        'End Date': pd.to_datetime(periods.str[1]),
+    })
+    bear_market_periods = bear_market_periods[
+        (bear_market_periods['Start Date'] >= pd.to_datetime(start_date)) &
+        (bear_market_periods['End Date'] <= pd.to_datetime(end_date))
+    ].sort_values('Start Date').reset_index(drop=True)
+
+    fig = px.timeline(
+        bear_market_periods,
+        x_start="Start Date",
+        x_end="End Date",
+        y="Bear Market Period",
+        title='Timeline of Bear Markets',
+        labels={'Bear Market Period': 'Bear Market'}
+    )
+    fig.update_yaxes(autorange="reversed")  # Optional: To display the earliest periods at the top
+    return fig
@@ -1,41 +1,46 @@
 import pandas as pd
 from investment_comparison import create_comparison_table
-from utility import format_table  # Ensure this utility is available
+from market_dataset import MarketDataset
 
-def calculate_income_metrics(data_df, bond_filtered_data, initial_investment, begin_date, end_date):
+def calculate_income_metrics(data_df, bond_filtered_data, initial_investment, begin_date, end_date, dividend_results=None,
+                             bond_metrics=None):
+    """
+    Calculates the ending value and current income of the nominal strategies.
+
+    Returns:
+        pd.DataFrame: One row per strategy ('Category') with numeric 'Initial Value', 'Ending Value',
+            'Current Income' and 'Current Income as % of Original Investment' (in percent) columns;
+            see formatting.format_income_metrics.
+    """
     try:
-        # Ensure Date column is in datetime format
-        data_df["Date"] = pd.to_datetime(data_df["Date"], format='%Y-%m', errors='coerce')
+        # Find the closest available date in the data (binary search on the parsed dates)
+        dataset = MarketDataset.coerce(data_df)
         ending_month = pd.to_datetime(end_date, format='%Y-%m')
+        nearest_position = dataset.dates.searchsorted(ending_month, side='right') - 1
 
-        # Find the closest available date in the data
-        available_dates = data_df["Date"].dropna()
-        nearest_date = available_dates[available_dates <= ending_month].max()
-
-        if pd.isna(nearest_date):
+        if nearest_position < 0:
             raise ValueError(f"No data available for or before the selected end date: {end_date}")
 
         # Create the nominal comparison table
         nominal_table = create_comparison_table(
-            sp500_data=data_df,
+            sp500_data=dataset,
             bond_data=bond_filtered_data,
             initial_investment=initial_investment,
             begin_date=begin_date,
             end_date=end_date,
             data_type="Nominal",
+            dividend_results=dividend_results,
+            bond_metrics=bond_metrics,
         )
 
         # Adjust index if necessary
         if "Strategy" in nominal_table.columns:
             nominal_table.set_index("Strategy", inplace=True)
 
-        # Convert "Ending Value" to numeric
-        nominal_table["Ending Value"] = nominal_table["Ending Value"].replace('[\$,]', '', regex=True).astype(float)
-
         # Calculate dividend rate for SPX
         dividend_rate = (
-            data_df.loc[data_df["Date"] == nearest_date, "Nominal Dividends"].values[0] /
-            data_df.loc[data_df["Date"] == nearest_date, "Composite"].values[0]
+            dataset["Nominal Dividends"][nearest_position] /
+            dataset["Composite"][nearest_position]
         )
 
         # Calculate Current Income for SPX
@@ -84,18 +89,7 @@ def calculate_income_metrics(data_df, bond_filtered_data, initial_investment, be
             ],
         })
 
-        # Apply formatting to the table
-        income_metrics_df["Initial Value"] = income_metrics_df["Initial Value"].map("${:,.0f}".format)  # Currency, no decimals
-        income_metrics_df["Ending Value"] = income_metrics_df["Ending Value"].map("${:,.0f}".format)  # Currency, no decimals
-        income_metrics_df["Current Income"] = income_metrics_df["Current Income"].map("${:,.0f}".format)  # Currency, no decimals
-        income_metrics_df["Current Income as % of Original Investment"] = income_metrics_df[
-            "Current Income as % of Original Investment"
-        ].map("{:.2f}%".format)  # Percentage, two decimals
-
-        # Format the table using the utility function (optional if required for uniform styling)
-        formatted_income_metrics_df = format_table(income_metrics_df)
-
-        return formatted_income_metrics_df
+        return income_metrics_df
 
     except Exception as e:
         raise RuntimeError(f"Error calculating income metrics: {e}")
\ No newline at end of file
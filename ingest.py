@@ -0,0 +1,184 @@
+# ingest.py
+import os
+import threading
+
+import numpy as np
+
+from data_loader import load_data
+from drawdowns import BearMarketDetections
+from ltc_bonds import load_data as load_bond_data
+from market_dataset import MarketDataset, first_changed_row
+from monte_carlo import build_monthly_returns
+from result_cache import invalidate_windows
+from window_index import WindowIndex, month_ordinals, BOND_LEVEL_COLUMNS, BOND_INTEREST_COLUMNS
+
+# Incremental monthly updates of the market and bond data.
+#
+# The workbooks gain one month at a time. Rather than rebuilding everything derived from them
+# when they change, a MarketDataStore finds the first row that differs from the data it holds
+# (normally the appended month, occasionally a provisional month that was revised) and extends
+# the window index and the detected bear markets from that row on. Cached window results are
+# only dropped when their end date reaches that month; everything ending earlier read unchanged
+# rows and stays valid. The workbook itself still has to be read once it changes, but through
+# data_loader's Parquet cache that happens once per change, not once per process.
+
+BOND_COLUMNS = list(BOND_LEVEL_COLUMNS.values()) + list(BOND_INTEREST_COLUMNS.values())
+
+
+def _month_label(month):
+    return f"{month // 12}-{month % 12 + 1:02}"
+
+
+def _first_changed_month(old_months, new_months, row):
+    """
+    Returns the month ordinal of the first changed row (None if the tables are the same).
+    """
+    candidates = [int(months[row]) for months in (old_months, new_months) if row < len(months)]
+    return min(candidates) if candidates else None
+
+
+class MarketDataStore:
+    """
+    Market and bond data plus the structures derived from them, kept current as months are added.
+
+    Parameters:
+    - data_path (str): Market data workbook (sheet 'data').
+    - bond_path (str): Bond data workbook.
+    - bond_sheet (str): Bond worksheet.
+
+    Attributes:
+    - dataset (MarketDataset), bond_data (pd.DataFrame): The current data.
+    - window_index (WindowIndex), bear_market_detections (BearMarketDetections): Derived structures.
+    - version (int): Incremented by every update that changed the data.
+    """
+
+    def __init__(self, data_path='data.xlsx', bond_path='AAA_data_2.xlsx', bond_sheet='ltc_bonds'):
+        self.data_path = data_path
+        self.bond_path = bond_path
+        self.bond_sheet = bond_sheet
+        self.version = 0
+        self.updates = []  # (version, first changed month ordinal) of every update
+        self._caches = []
+        self._lock = threading.RLock()
+
+        self._signatures = self._source_signatures()
+        self.dataset = MarketDataset.from_frame(load_data(data_path))
+        self.bond_data = load_bond_data(excel_file=bond_path, sheet_name=bond_sheet)
+        self.window_index = WindowIndex(self.dataset, self.bond_data)
+        self.bear_market_detections = BearMarketDetections(self.dataset, lock=self._lock)
+        self._monthly_returns = None
+
+    def _source_signatures(self):
+        signatures = []
+        for path in (self.data_path, self.bond_path):
+            stat = os.stat(path)
+            signatures.append((stat.st_size, stat.st_mtime_ns))
+        return signatures
+
+    def register_cache(self, cache):
+        """
+        Registers an LRUCache keyed on (begin_date, end_date) whose entries are dropped when an
+        update changes a month inside their window.
+        """
+        with self._lock:
+            if cache not in self._caches:
+                self._caches.append(cache)
+        return cache
+
+    @property
+    def monthly_returns(self):
+        """
+        Joint monthly stock/bond returns (monte_carlo.build_monthly_returns) of the current data.
+        """
+        if self._monthly_returns is None:
+            self._monthly_returns = build_monthly_returns(self.dataset, self.bond_data)
+        return self._monthly_returns
+
+    def last_complete_month(self):
+        """
+        Returns the last month ('YYYY-MM') with both a Total Return value and bond data, i.e. the
+        latest end date every section of the app can use.
+        """
+        stock_months = self.dataset.months[np.isfinite(self.dataset['Total Return'])]
+        bond_months = month_ordinals(self.bond_data['date'])
+        return _month_label(int(min(stock_months.max(), bond_months.max())))
+
+    def changed_since(self, version):
+        """
+        Returns the earliest month ('YYYY-MM') changed by the updates after `version`, or None
+        when nothing changed since.
+        """
+        months = [month for update_version, month in self.updates if update_version > version]
+        return _month_label(min(months)) if months else None
+
+    def refresh(self):
+        """
+        Picks up changed workbooks. When their size and modification time are unchanged this is
+        two os.stat calls.
+
+        Returns:
+        - dict or None: The update (see ingest), or None when the workbooks are unchanged.
+        """
+        with self._lock:
+            signatures = self._source_signatures()
+            if signatures == self._signatures:
+                return None
+            update = self.ingest(
+                load_data(self.data_path), load_bond_data(excel_file=self.bond_path, sheet_name=self.bond_sheet)
+            )
+            self._signatures = signatures
+            return update
+
+    def ingest(self, data_df, bond_df=None):
+        """
+        Switches to updated market (and bond) data, extending the derived structures from the
+        first month that differs from the current data.
+
+        Parameters:
+        - data_df (MarketDataset or pd.DataFrame): Updated market data.
+        - bond_df (pd.DataFrame, optional): Updated bond data as returned by ltc_bonds.load_data;
+          None keeps the current bond data.
+
+        Returns:
+        - dict: 'version', 'first_changed_month' ('YYYY-MM', None when nothing changed),
+          'market_rows_added' and 'bond_rows_added' (negative when rows were dropped) and
+          'invalidated' (number of cached window results dropped).
+        """
+        with self._lock:
+            dataset = MarketDataset.coerce(data_df)
+            bond_df = self.bond_data if bond_df is None else bond_df
+
+            market_row = self.dataset.first_difference(dataset)
+            old_bond_months, new_bond_months = month_ordinals(self.bond_data['date']), month_ordinals(bond_df['date'])
+            bond_row = first_changed_row(
+                old_bond_months, {col: self.bond_data[col].to_numpy(dtype=float) for col in BOND_COLUMNS},
+                new_bond_months, {col: bond_df[col].to_numpy(dtype=float) for col in BOND_COLUMNS},
+            )
+            changed = [month for month in (
+                _first_changed_month(self.dataset.months, dataset.months, market_row),
+                _first_changed_month(old_bond_months, new_bond_months, bond_row),
+            ) if month is not None]
+
+            update = {
+                'version': self.version,
+                'first_changed_month': None,
+                'market_rows_added': len(dataset) - len(self.dataset),
+                'bond_rows_added': len(bond_df) - len(self.bond_data),
+                'invalidated': 0,
+            }
+            if not changed:
+                return update
+
+            first_changed = min(changed)
+            self.window_index = self.window_index.extended(dataset, bond_df)
+            self.bear_market_detections.extend(dataset)
+            self.dataset, self.bond_data = dataset, bond_df
+            self._monthly_returns = None
+            self.version += 1
+            self.updates.append((self.version, first_changed))
+
+            update['version'] = self.version
+            update['first_changed_month'] = _month_label(first_changed)
+            update['invalidated'] = sum(invalidate_windows(cache, update['first_changed_month'])
+                                        for cache in self._caches)
+            return update
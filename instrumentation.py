@@ -0,0 +1,194 @@
+# instrumentation.py
+import collections
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Lightweight per-stage timing and memory instrumentation.
+#
+# Wrap a block in `with stage("name"):` or decorate a function with @timed to record its wall time
+# and call count. While tracemalloc is tracing (see start_memory_tracking) the peak allocation of
+# each stage is recorded too; nested stages are measured independently and still count towards
+# their parent's peak. tracemalloc's peak counter is process-wide, so it is only reset while no
+# other thread is inside a stage; stages overlapping another thread's report an upper bound. Each
+# finished stage is also logged as a one-line JSON record on the "instrumentation" logger, which
+# stays silent until a handler is attached (see enable_json_logging).
+
+logger = logging.getLogger("instrumentation")
+
+_stats = {}
+_stats_lock = threading.Lock()
+_local = threading.local()
+_open_stages = collections.Counter()  # thread id -> stages currently open on that thread
+
+
+def _stage_stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _enter_stage():
+    # Registers an open stage; returns True when this thread is the only one inside stages and
+    # may therefore reset the shared tracemalloc peak
+    thread = threading.get_ident()
+    with _stats_lock:
+        _open_stages[thread] += 1
+        return len(_open_stages) == 1
+
+
+def _exit_stage():
+    thread = threading.get_ident()
+    with _stats_lock:
+        _open_stages[thread] -= 1
+        if not _open_stages[thread]:
+            del _open_stages[thread]
+        return not _open_stages or list(_open_stages) == [thread]
+
+
+def _record(name, seconds, peak_bytes):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {
+            'calls': 0, 'total_seconds': 0.0, 'last_seconds': 0.0, 'max_seconds': 0.0, 'peak_bytes': None,
+        })
+        entry['calls'] += 1
+        entry['total_seconds'] += seconds
+        entry['last_seconds'] = seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        if peak_bytes is not None:
+            entry['peak_bytes'] = max(entry['peak_bytes'] or 0, peak_bytes)
+        calls = entry['calls']
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            'event': 'stage',
+            'stage': name,
+            'seconds': round(seconds, 6),
+            'peak_bytes': peak_bytes,
+            'calls': calls,
+        }))
+
+
+@contextmanager
+def stage(name):
+    """
+    Records the wall time (and, while tracemalloc is tracing, the peak allocation) of a block.
+
+    Parameters:
+    - name (str): Stage name the measurements are recorded under.
+    """
+    stack = _stage_stack()
+    exclusive = _enter_stage()
+    tracing = tracemalloc.is_tracing()
+    frame = {'start_bytes': 0, 'peak': 0}
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # Fold the parent's peak so far into it before the child resets the counter
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        if exclusive:
+            tracemalloc.reset_peak()
+        frame['start_bytes'] = current
+    stack.append(frame)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        exclusive = _exit_stage()
+        peak_bytes = None
+        if tracing and tracemalloc.is_tracing():
+            frame['peak'] = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            peak_bytes = max(frame['peak'] - frame['start_bytes'], 0)
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+            if exclusive:
+                tracemalloc.reset_peak()
+        _record(name, seconds, peak_bytes)
+
+
+def timed(name=None):
+    """
+    Decorator recording every call of a function as a stage.
+
+    Usable bare (@timed, recorded as "module.function") or with an explicit stage name (@timed("name")).
+    """
+    def decorate(func, stage_name):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    if callable(name):
+        return decorate(name, f"{name.__module__}.{name.__qualname__}")
+    return lambda func: decorate(func, name or f"{func.__module__}.{func.__qualname__}")
+
+
+def start_memory_tracking():
+    """
+    Starts tracemalloc so stages also record their peak allocation. Tracing is process-wide and
+    slows allocations down noticeably; the app turns it on from config.TRACE_MEMORY at startup.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def stop_memory_tracking():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def enable_json_logging(level=logging.INFO, stream=None):
+    """
+    Attaches a handler writing the stage records as bare JSON lines (once per process).
+    """
+    if not any(getattr(handler, '_instrumentation', False) for handler in logger.handlers):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler._instrumentation = True
+        logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def get_stats():
+    """
+    Returns a copy of the recorded measurements: {stage name: {'calls', 'total_seconds',
+    'last_seconds', 'max_seconds', 'peak_bytes'}}. peak_bytes is None for stages that never
+    ran with tracemalloc tracing.
+    """
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def stats_frame():
+    """
+    Returns the recorded measurements as a DataFrame sorted by total time, for display.
+    """
+    stats = get_stats()
+    columns = ['Stage', 'Calls', 'Total (ms)', 'Last (ms)', 'Max (ms)', 'Peak Memory (KiB)']
+    rows = [
+        [
+            name,
+            entry['calls'],
+            entry['total_seconds'] * 1000,
+            entry['last_seconds'] * 1000,
+            entry['max_seconds'] * 1000,
+            entry['peak_bytes'] / 1024 if entry['peak_bytes'] is not None else float('nan'),
+        ]
+        for name, entry in stats.items()
+    ]
+    return pd.DataFrame(rows, columns=columns).sort_values('Total (ms)', ascending=False).reset_index(drop=True)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -1,31 +1,46 @@
+import numpy as np
 import pandas as pd
 from ltc_bonds import calculate_non_reinvesting_strategy, calculate_reinvesting_strategy
 from divs import calculate_dividends
+from market_dataset import MarketDataset
+from instrumentation import timed
 
 
+@timed
 def create_comparison_table(
-    sp500_data, bond_data, initial_investment, begin_date, end_date, data_type="Nominal", cpi_data=None
+    sp500_data, bond_data, initial_investment, begin_date, end_date, data_type="Nominal", cpi_data=None,
+    dividend_results=None, bond_metrics=None, periods_per_year=None,
 ):
     """
     Creates a comparison table for SP500 and Bond investments.
 
     Parameters:
-        sp500_data (pd.DataFrame): DataFrame containing SP500 data.
+        sp500_data (MarketDataset or pd.DataFrame): SP500 data.
         bond_data (pd.DataFrame): DataFrame containing bond data.
         initial_investment (float): Initial investment amount.
         begin_date (str): Begin date for filtering data in 'YYYY-MM' format.
         end_date (str): End date for filtering data in 'YYYY-MM' format.
         data_type (str): Type of data ("Nominal" or "Real").
-        cpi_data (pd.DataFrame): DataFrame containing CPI data with 'Date' and 'CPI' columns.
+        cpi_data (MarketDataset or pd.DataFrame): CPI data with 'Date' and 'CPI' columns.
+        dividend_results (dict, optional): Precomputed calculate_dividends result for the same
+            period and investment; computed here when omitted.
+        bond_metrics (tuple, optional): Precomputed (non_reinvesting, reinvesting) bond metrics for
+            the same bond data and investment; computed here when omitted.
+        periods_per_year (int, optional): Rows per year of the data (12 monthly, 252 daily) used
+            when computing the results here; inferred from the data when omitted.
 
     Returns:
-        pd.DataFrame: A DataFrame representing the comparison table.
+        pd.DataFrame: A DataFrame representing the comparison table, with a 'Strategy' column and
+            numeric 'Total Dividends/Interest' and 'Ending Value' columns (NaN where a value does
+            not apply or no bond data is available; see formatting.format_comparison_table).
     """
     try:
         # Retrieve data for SP500
-        dividend_results = calculate_dividends(
-            sp500_data, start_date=begin_date, end_date=end_date, initial_investment=initial_investment
-        )
+        if dividend_results is None:
+            dividend_results = calculate_dividends(
+                sp500_data, start_date=begin_date, end_date=end_date, initial_investment=initial_investment,
+                periods_per_year=periods_per_year,
+            )
 
         if data_type == "Nominal":
             sp500_non_reinvested = dividend_results["Nominal_No_Reinvestment"][2]
@@ -46,43 +61,42 @@ def create_comparison_table(
                     f"{data_type} Bonds Investment–With Reinvestment",
                 ],
                 "Total Dividends/Interest": [
-                    f"${dividend_results[f'{data_type}_No_Reinvestment'][1]:,.0f}",
-                    "NA",
-                    "NA",
-                    "NA",
+                    dividend_results[f'{data_type}_No_Reinvestment'][1],
+                    np.nan,
+                    np.nan,
+                    np.nan,
                 ],
                 "Ending Value": [
-                    f"${sp500_non_reinvested:,.0f}",
-                    "NA",
-                    f"${sp500_with_reinvestment:,.0f}",
-                    "NA",
+                    sp500_non_reinvested,
+                    np.nan,
+                    sp500_with_reinvestment,
+                    np.nan,
                 ],
             }
         else:
             # Calculate bond metrics
-            non_reinvesting_metrics = calculate_non_reinvesting_strategy(bond_data, initial_investment)
-            reinvesting_metrics = calculate_reinvesting_strategy(bond_data, initial_investment)
+            if bond_metrics is None:
+                bond_metrics = (
+                    calculate_non_reinvesting_strategy(bond_data, initial_investment, periods_per_year),
+                    calculate_reinvesting_strategy(bond_data, initial_investment),
+                )
+            non_reinvesting_metrics, reinvesting_metrics = bond_metrics
 
             if data_type == "Nominal":
-                total_interest_bonds_non_reinvested = non_reinvesting_metrics["Total Interest Paid (Nominal)"] / 12
+                total_interest_bonds_non_reinvested = non_reinvesting_metrics["Total Interest Paid (Nominal)"]
                 bond_ending_value_non_reinvested = non_reinvesting_metrics["Ending Value (Nominal)"]
                 bond_ending_value_reinvested = reinvesting_metrics["Ending Value (Nominal)"]
             elif data_type == "Real":
-                total_interest_bonds_non_reinvested = non_reinvesting_metrics["Total Interest Paid (Real)"] / 12
+                total_interest_bonds_non_reinvested = non_reinvesting_metrics["Total Interest Paid (Real)"]
                 bond_ending_value_non_reinvested = non_reinvesting_metrics["Ending Value (Real)"]
                 bond_ending_value_reinvested = reinvesting_metrics["Ending Value (Real)"]
 
                 # Adjust Real Bonds Investment–No Reinvestment Ending Value by CPI
                 if cpi_data is not None:
-                    cpi_data['Date'] = pd.to_datetime(cpi_data['Date'], errors='coerce').dt.strftime('%Y-%m')
-                    cpi_data = cpi_data.dropna(subset=['Date'])
-                    
-                    cpi_filtered = cpi_data[
-                        (cpi_data['Date'] >= begin_date) & (cpi_data['Date'] <= end_date)
-                    ]
-                    if not cpi_filtered.empty:
-                        cpi_begin = cpi_filtered.iloc[0]['CPI']
-                        cpi_end = cpi_filtered.iloc[-1]['CPI']
+                    cpi_filtered = MarketDataset.coerce(cpi_data).window(begin_date, end_date).column('CPI')
+                    if len(cpi_filtered):
+                        cpi_begin = cpi_filtered[0]
+                        cpi_end = cpi_filtered[-1]
                         cpi_increase_factor = cpi_end / cpi_begin if cpi_begin > 0 else 1
                         bond_ending_value_non_reinvested /= cpi_increase_factor
 
@@ -95,21 +109,23 @@ def create_comparison_table(
                     f"{data_type} Bonds Investment–With Reinvestment",
                 ],
                 "Total Dividends/Interest": [
-                    f"${dividend_results[f'{data_type}_No_Reinvestment'][1]:,.0f}",
-                    f"${total_interest_bonds_non_reinvested:,.0f}",
-                    "NA",
-                    "NA",
+                    dividend_results[f'{data_type}_No_Reinvestment'][1],
+                    total_interest_bonds_non_reinvested,
+                    np.nan,
+                    np.nan,
                 ],
                 "Ending Value": [
-                    f"${sp500_non_reinvested:,.0f}",
-                    f"${bond_ending_value_non_reinvested:,.0f}",
-                    f"${sp500_with_reinvestment:,.0f}",
-                    f"${bond_ending_value_reinvested:,.0f}",
+                    sp500_non_reinvested,
+                    bond_ending_value_non_reinvested,
+                    sp500_with_reinvestment,
+                    bond_ending_value_reinvested,
                 ],
             }
 
         # Convert to DataFrame
-        comparison_table = pd.DataFrame(comparison_data)
+        comparison_table = pd.DataFrame(comparison_data).astype(
+            {"Total Dividends/Interest": float, "Ending Value": float}
+        )
         return comparison_table
 
     except Exception as e:
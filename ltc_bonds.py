@@ -1,16 +1,32 @@
 # ltc_bonds.py
 
+import numpy as np
 import pandas as pd
 import os
 import sys
-
-def load_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds'):
+from data_loader import read_excel_cached
+from instrumentation import timed
+from market_dataset import window_end, infer_periods_per_year
+from window_index import month_ordinals
+
+# Strategy keys of calculate_bond_paths / calculate_bond_windows, in the order divs.calculate_dividends uses
+BOND_PATH_STRATEGIES = [
+    "Nominal_No_Reinvestment",
+    "Nominal_With_Reinvestment",
+    "Real_No_Reinvestment",
+    "Real_With_Reinvestment",
+]
+
+@timed
+def load_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds', periods_per_year=12):
     """
     Loads the financial data from the specified Excel file and sheet.
 
     Parameters:
         excel_file (str): Path to the Excel file.
         sheet_name (str): Name of the sheet/tab containing the data.
+        periods_per_year (int): Rows per year; monthly data (12) is keyed 'YYYY-MM', daily
+                                data keeps the day ('YYYY-MM-DD').
 
     Returns:
         pd.DataFrame: Processed financial data.
@@ -23,8 +39,8 @@ def load_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds'):
         raise FileNotFoundError(f"The specified Excel file '{excel_file}' was not found.")
 
     try:
-        # Load the specified sheet from the Excel file
-        df = pd.read_excel(excel_file, sheet_name=sheet_name)
+        # Load the specified sheet from the Excel file (served from the Parquet cache when fresh)
+        df = read_excel_cached(excel_file, sheet_name=sheet_name)
         print(f"Successfully loaded '{sheet_name}' sheet from '{excel_file}'.")
     except ValueError as ve:
         raise ValueError(f"Error loading sheet '{sheet_name}': {ve}")
@@ -65,11 +81,16 @@ def load_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds'):
         if df['real_total_return'].isnull().any():
             raise ValueError("Some 'real_total_return' values could not be converted to float.")
 
-    # Convert 'date' column to datetime in 'YYYY-MM' format
-    df['date_dt'] = pd.to_datetime(df['date'], format='%Y-%m', errors='coerce')
+    # Monthly rows are read and keyed as 'YYYY-MM'; higher-frequency rows accept any ISO 8601
+    # date and are keyed as 'YYYY-MM-DD'
+    if periods_per_year <= 12:
+        parse_format, output_format, accepted = '%Y-%m', '%Y-%m', "'YYYY-MM'"
+    else:
+        parse_format, output_format, accepted = 'ISO8601', '%Y-%m-%d', "ISO 8601 ('YYYY-MM-DD')"
+    df['date_dt'] = pd.to_datetime(df['date'], format=parse_format, errors='coerce')
     if df['date_dt'].isnull().any():
-        raise ValueError("Some 'date' values could not be parsed. Ensure they are in 'YYYY-MM' format.")
-    df['date'] = df['date_dt'].dt.strftime('%Y-%m')
+        raise ValueError(f"Some 'date' values could not be parsed. Ensure they are in {accepted} format.")
+    df['date'] = df['date_dt'].dt.strftime(output_format)
     df.drop(columns=['date_dt'], inplace=True)
 
     # Drop rows with any NaN values in critical columns
@@ -81,40 +102,57 @@ def load_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds'):
 
     return df
 
-def calculate_non_reinvesting_strategy(data_df, initial_investment):
+def filter_bond_data(bond_data, begin_date, end_date):
+    """
+    Selects the bond rows between two months (or days, for daily data).
+
+    Parameters:
+        bond_data (pd.DataFrame): Bond data as returned by load_data.
+        begin_date (str): First month to include, in 'YYYY-MM' format.
+        end_date (str): Last month to include, in 'YYYY-MM' format (the whole month for daily data).
+
+    Returns:
+        pd.DataFrame: A new DataFrame with the selected rows sorted by date; bond_data is left unchanged.
+    """
+    dates = pd.to_datetime(bond_data['date'], format='ISO8601', errors='coerce')
+    mask = (dates >= pd.Timestamp(begin_date)) & (dates <= window_end(end_date))
+    return bond_data.loc[dates[mask].sort_values(kind='stable').index].copy()
+
+def _periods_per_year(data_df, periods_per_year):
+    # Rows per year of the bond data unless given explicitly (12 for the monthly sheet)
+    if periods_per_year is not None:
+        return periods_per_year
+    return infer_periods_per_year(pd.to_datetime(data_df['date'], format='ISO8601'))
+
+@timed
+def calculate_non_reinvesting_strategy(data_df, initial_investment, periods_per_year=None):
     """
     Calculates metrics for the Non-Reinvesting Strategy for both Nominal and Real.
 
     Parameters:
-        data_df (pd.DataFrame): Financial data containing 'nominal_interest', 'real_interest',
+        data_df (pd.DataFrame): Financial data containing 'date', 'nominal_interest', 'real_interest',
                                 'nominal_total_return', and 'real_total_return'.
         initial_investment (float): The initial investment amount.
+        periods_per_year (int, optional): Rows per year; each row pays 1 / periods_per_year of the
+                                          annual rate. Inferred from the dates when omitted.
 
     Returns:
         dict: Metrics including total interest paid and ending value for both Nominal and Real strategies.
     """
     metrics = {}
+    periods_per_year = _periods_per_year(data_df, periods_per_year)
 
     # Nominal Strategy
-    data_df['nominal_interest_paid'] = data_df['nominal_interest'] * initial_investment
-    total_nominal_interest = data_df['nominal_interest_paid'].sum()
-    metrics['Total Interest Paid (Nominal)'] = total_nominal_interest
+    metrics['Total Interest Paid (Nominal)'] = (data_df['nominal_interest'] * initial_investment).sum() / periods_per_year
     metrics['Ending Value (Nominal)'] = initial_investment  # Should remain as initial investment
 
     # Real Strategy
-    data_df['real_interest_paid'] = data_df['real_interest'] * initial_investment
-    total_real_interest = data_df['real_interest_paid'].sum()
-    metrics['Total Interest Paid (Real)'] = total_real_interest
+    metrics['Total Interest Paid (Real)'] = (data_df['real_interest'] * initial_investment).sum() / periods_per_year
     metrics['Ending Value (Real)'] = initial_investment  # Should remain as initial investment
 
-    # # Debugging Outputs
-    # print(f"Debug - Total Interest Paid (Nominal): ${metrics['Total Interest Paid (Nominal)']:.2f}")
-    # print(f"Debug - Ending Value (Nominal): ${metrics['Ending Value (Nominal)']:.2f}")
-    # print(f"Debug - Total Interest Paid (Real): ${metrics['Total Interest Paid (Real)']:.2f}")
-    # print(f"Debug - Ending Value (Real): ${metrics['Ending Value (Real)']:.2f}")
-
     return metrics
 
+@timed
 def calculate_reinvesting_strategy(data_df, initial_investment):
     """
     Calculates metrics for the Reinvesting Strategy for both Nominal and Real.
@@ -160,6 +198,131 @@ def calculate_reinvesting_strategy(data_df, initial_investment):
 
     return metrics
 
+def _bond_columns(data_df):
+    return {
+        col: data_df[col].to_numpy(dtype=float)
+        for col in ['nominal_interest', 'real_interest', 'nominal_total_return', 'real_total_return']
+    }
+
+
+@timed
+def calculate_bond_paths(data_df, initial_investment, periods_per_year=None):
+    """
+    Calculates the per-period income and ending-value paths of the four bond strategies.
+
+    Each period pays 1 / periods_per_year of the annual rate on the position held. Without
+    reinvestment the position stays at the initial investment in nominal terms and loses the
+    CPI increase (nominal over real total return) in real terms; with reinvestment it follows
+    the total return index. Real income is quoted in the same dollars as 'real_interest'.
+    data_df is not modified.
+
+    Parameters:
+        data_df (pd.DataFrame): Bond rows for one window, sorted by date (see filter_bond_data).
+        initial_investment (float): The initial investment amount.
+        periods_per_year (int, optional): Rows per year (12 for monthly data, 252 for daily data);
+                                          inferred from the dates when omitted.
+
+    Returns:
+        dict: {strategy: (DataFrame, total income, final ending value)} for each key of
+              BOND_PATH_STRATEGIES, shaped like divs.calculate_dividends. The DataFrames have
+              'Date', 'Interest Rate', 'Interest Paid' or 'Interest Reinvested' and
+              'Ending Value' or 'Real Ending Value' columns.
+    """
+    if len(data_df) == 0:
+        raise ValueError("No bond data available to calculate bond paths.")
+
+    columns = _bond_columns(data_df)
+    dates = pd.to_datetime(data_df['date'], format='ISO8601').to_numpy()
+    periods_per_year = _periods_per_year(data_df, periods_per_year)
+    nominal_rate = columns['nominal_interest'] / periods_per_year
+    real_rate = columns['real_interest'] / periods_per_year
+    nominal_growth = columns['nominal_total_return'] / columns['nominal_total_return'][0]
+    real_growth = columns['real_total_return'] / columns['real_total_return'][0]
+
+    flat_value = np.full(len(data_df), float(initial_investment))
+    reinvested_value = initial_investment * nominal_growth
+    paths = {
+        "Nominal_No_Reinvestment": ('Interest Paid', flat_value * nominal_rate, 'Ending Value', flat_value),
+        "Nominal_With_Reinvestment": (
+            'Interest Reinvested', reinvested_value * nominal_rate, 'Ending Value', reinvested_value),
+        "Real_No_Reinvestment": (
+            'Interest Paid', flat_value * real_rate, 'Real Ending Value', flat_value * real_growth / nominal_growth),
+        "Real_With_Reinvestment": (
+            'Interest Reinvested', reinvested_value * real_rate, 'Real Ending Value', initial_investment * real_growth),
+    }
+
+    results = {}
+    for key, (income_column, income, value_column, value) in paths.items():
+        df = pd.DataFrame({
+            'Date': dates,
+            'Interest Rate': columns['real_interest' if key.startswith('Real') else 'nominal_interest'],
+            income_column: income,
+            value_column: value,
+        })
+        results[key] = (df, income.sum(), value[-1])
+    return results
+
+
+@timed
+def calculate_bond_windows(bond_data, begin_dates, end_dates, initial_investment=1.0, periods_per_year=None):
+    """
+    Batch form of calculate_bond_paths: the total income and final ending value of the four bond
+    strategies for many windows at once, from prefix sums over the full bond data.
+
+    Parameters:
+        bond_data (pd.DataFrame): Bond data as returned by load_data.
+        begin_dates (array-like): First month of each window ('YYYY-MM' strings or datetimes).
+        end_dates (array-like): Last month of each window, aligned with begin_dates; daily rows
+                                are included for the whole begin and end months.
+        initial_investment (float): The initial investment amount.
+        periods_per_year (int, optional): Rows per year (12 for monthly data, 252 for daily data);
+                                          inferred from the dates when omitted.
+
+    Returns:
+        dict: {strategy: {'Total Interest': np.ndarray, 'Ending Value': np.ndarray}} for each key of
+              BOND_PATH_STRATEGIES, aligned with the windows. Windows without bond rows are NaN.
+    """
+    # Daily rows are ordered by day, then matched to the windows by month
+    dates = pd.to_datetime(bond_data['date'], format='ISO8601')
+    order = np.argsort(dates.to_numpy(), kind='stable')
+    months = month_ordinals(dates)[order]
+    periods_per_year = _periods_per_year(bond_data, periods_per_year)
+    columns = {col: values[order] for col, values in _bond_columns(bond_data).items()}
+
+    b = np.searchsorted(months, month_ordinals(np.asarray(begin_dates)), side='left')
+    e = np.searchsorted(months, month_ordinals(np.asarray(end_dates)), side='right') - 1
+    valid = (b <= e) & (b < len(months)) & (e >= 0)
+    b, e = np.where(valid, b, 0), np.where(valid, e, 0)
+
+    def window_sum(values):
+        prefix = np.concatenate([[0.0], np.cumsum(values)])
+        return prefix[e + 1] - prefix[b]
+
+    nominal_tr, real_tr = columns['nominal_total_return'], columns['real_total_return']
+    nominal_growth = nominal_tr[e] / nominal_tr[b]
+    real_growth = real_tr[e] / real_tr[b]
+    # Reinvested income is the rate times the position, i.e. the rate weighted by the total return index
+    reinvested_scale = initial_investment / nominal_tr[b] / periods_per_year
+
+    windows = {
+        "Nominal_No_Reinvestment": (
+            initial_investment * window_sum(columns['nominal_interest']) / periods_per_year,
+            np.full(len(b), float(initial_investment))),
+        "Nominal_With_Reinvestment": (
+            reinvested_scale * window_sum(nominal_tr * columns['nominal_interest']),
+            initial_investment * nominal_growth),
+        "Real_No_Reinvestment": (
+            initial_investment * window_sum(columns['real_interest']) / periods_per_year,
+            initial_investment * real_growth / nominal_growth),
+        "Real_With_Reinvestment": (
+            reinvested_scale * window_sum(nominal_tr * columns['real_interest']),
+            initial_investment * real_growth),
+    }
+    return {
+        key: {'Total Interest': np.where(valid, total, np.nan), 'Ending Value': np.where(valid, value, np.nan)}
+        for key, (total, value) in windows.items()
+    }
+
 def main():
     # This module is intended to be imported, not run directly.
     pass
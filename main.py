@@ -1,32 +1,69 @@
 # main.py
 
 import streamlit as st
-from data_loader import load_data, load_bear_market_periods, load_recession_data
-from bears import calculate_bear_market_metrics
-from recession_data import calculate_recession_metrics
-from divs import calculate_dividends
-from ltc_bonds import load_data as load_bond_data, calculate_non_reinvesting_strategy, calculate_reinvesting_strategy
+from data_loader import load_bear_market_periods, load_recession_data
+from bears import calculate_bear_market_metrics, build_bear_market_index
+from drawdowns import DETECTION_COLUMNS
+from recession_data import calculate_recession_metrics, build_recession_index
+from ltc_bonds import calculate_non_reinvesting_strategy, calculate_reinvesting_strategy, filter_bond_data, calculate_bond_paths
 import graph
 from utility import format_table
-from metrics import calculate_metrics, calculate_comparison_table
+from metrics import (
+    calculate_metrics, calculate_comparison_table, period_begin_date, calculate_horizons_matrix, HORIZON_QUANTITIES,
+)
+from formatting import (
+    format_comparison_table, format_income_metrics, format_metrics_table, format_horizons_table,
+    format_bear_market_summary, format_bear_markets, format_recession_summary, format_recessions,
+    format_withdrawal_rate_summary, format_dca_summary, format_allocation_table,
+)
+import config
 from investment_comparison import create_comparison_table
 import pandas as pd
 import numpy as np
 from income_metrics import calculate_income_metrics
-
-
-# Define the default end date
-DEFAULT_END_DATE = "2024-09"
+from return_matrix import load_return_matrix, RETURN_SERIES
+from compute_graph import ComputeGraph
+from ingest import MarketDataStore
+from result_cache import LRUCache, compute_unit_results, scale_dividend_results, scale_bond_metrics, window_touches
+from monte_carlo import simulate, percentile_summary, percentile_bands, STRATEGIES
+from withdrawals import calculate_safe_withdrawal_rates, withdrawal_rate_summary, worst_start_date
+from dca import calculate_dca_cohorts, dca_summary, DCA_STRATEGIES
+from allocation import sweep_allocations, best_allocations, REBALANCING_FREQUENCIES
+from instrumentation import stage, timed, start_memory_tracking, enable_json_logging, stats_frame, reset_stats
+
+
+# Dividend and bond results are cached per period for a unit investment and scaled on use,
+# so changing the initial investment never recomputes them.
+@st.cache_resource
+def get_result_cache():
+    return LRUCache(maxsize=64)
+
+result_cache = get_result_cache()
+
+# The market and bond data are parsed once into a store shared by every session, together with
+# the window index and detected bear markets derived from them. Each rerun checks whether the
+# workbooks changed; a newly added month extends those structures and only drops the cached
+# results of periods reaching it.
+@st.cache_resource
+def get_data_store():
+    with stage("main.load_market_data"):
+        store = MarketDataStore(data_path='data.xlsx', bond_path='AAA_data_2.xlsx', bond_sheet='ltc_bonds')
+    store.register_cache(result_cache)
+    return store
+
+data_store = get_data_store()
+with stage("main.refresh_data"):
+    data_store.refresh()
+market_data = data_store.dataset
+
+# The default end date is the last month with both stock and bond data
+DEFAULT_END_DATE = data_store.last_complete_month()
 
 # Sidebar for user inputs
 st.sidebar.header("Inputs")
 
 # Generate date options for dropdowns
-date_options = [
-    f"{year}-{month:02}" for year in range(1875, 2025)
-    for month in range(1, 13)
-    if not (year == 2024 and month > 9)
-]
+date_options = pd.period_range("1875-01", DEFAULT_END_DATE, freq="M").strftime("%Y-%m").tolist()
 
 # Checkbox to choose between custom dates or predefined periods
 custom_date_mode = st.sidebar.checkbox("Use Custom Begin and End Dates", value=False)
@@ -43,24 +80,7 @@ if custom_date_mode:
         end_date = DEFAULT_END_DATE  # Fallback if default end date not found
 else:
     # If not custom, use predefined periods
-    predefined_periods_dict = {
-        "Last 1 Year": 1,
-        "Last 3 Years": 3,
-        "Last 5 Years": 5,
-        "Last 10 Years": 10,
-        "Last 15 Years": 15,
-        "Last 20 Years": 20,
-        "Last 25 Years": 25,
-        "Last 30 Years": 30,
-        "Last 35 Years": 35,
-        "Last 40 Years": 40,
-        "Last 50 Years": 50,
-        "Last 60 Years": 60,
-        "Last 70 Years": 70,
-        "Last 80 Years": 80,
-        "Last 90 Years": 90,
-        "Since End of WW II": "1945-09",
-    }
+    predefined_periods_dict = config.PREDEFINED_PERIODS
 
     # Set default selected period to "Last 30 Years"
     try:
@@ -77,15 +97,8 @@ else:
     except ValueError:
         end_date = DEFAULT_END_DATE  # Fallback if default end date not found
 
-    end_date_dt = pd.to_datetime(end_date)
-
-    if selected_period_label == "Since End of WW II":
-        begin_date = "1945-09"  # Set the specific begin date for WW2
-    else:
-        # Calculate the begin date for other predefined periods
-        years_offset = predefined_periods_dict[selected_period_label]
-        begin_date_dt = end_date_dt - pd.DateOffset(years=years_offset)
-        begin_date = begin_date_dt.strftime("%Y-%m")
+    # Years back from the end date, or the fixed begin date of "Since End of WW II"
+    begin_date = period_begin_date(predefined_periods_dict[selected_period_label], end_date)
 
 # Input box for Initial Investment
 initial_investment = st.sidebar.number_input(
@@ -96,76 +109,254 @@ initial_investment = st.sidebar.number_input(
     step=10000
 )
 
-# Cache loaded data to avoid redundant reloads
-@st.cache_data
+# Bear markets from the hand-maintained list, or detected from a price series at any threshold
+HISTORICAL_BEAR_MARKETS = "Historical List"
+bear_market_source = st.sidebar.selectbox("Bear Markets", [HISTORICAL_BEAR_MARKETS, *DETECTION_COLUMNS])
+bear_market_threshold = None
+if bear_market_source != HISTORICAL_BEAR_MARKETS:
+    bear_market_threshold = st.sidebar.slider(
+        "Bear Market Decline Threshold (%)", min_value=-60.0, max_value=-5.0, value=-20.0, step=0.5
+    ) / 100
+
+# Memory tracing and JSON stage logs are process-wide settings (config.py); the optional
+# per-stage panel only reads the measurements
+if config.TRACE_MEMORY:
+    start_memory_tracking()
+if config.JSON_STAGE_LOGGING:
+    enable_json_logging()
+show_debug_panel = st.sidebar.checkbox("Show Performance Debug Panel", value=False)
+
+# The bear market and recession tables are parsed once into read-only interval indexes shared
+# by every session, so a date change is a pair of binary searches rather than a re-parse.
+@st.cache_resource
 def get_data():
-    return {
-        "data_df": load_data(),
-        "bear_market_data": load_bear_market_periods(),
-        "recession_data": load_recession_data(),
-    }
+    with stage("main.load_event_data"):
+        return {
+            "bear_market_data": build_bear_market_index(load_bear_market_periods()),
+            "recession_data": build_recession_index(load_recession_data()),
+        }
 
 data = get_data()
 
-# Cache loaded bond data to avoid redundant reloads
-@st.cache_data
 def get_bond_data():
-    return load_bond_data(excel_file='AAA_data_2.xlsx', sheet_name='ltc_bonds')
-
-# Load bond data
-bond_data = get_bond_data()
-
-# Ensure 'date' is in datetime format for filtering
-bond_data['date_dt'] = pd.to_datetime(bond_data['date'], format='%Y-%m', errors='coerce')
+    return data_store.bond_data
 
-# Filter bond data based on user-selected date range
-bond_mask = (bond_data['date_dt'] >= pd.to_datetime(begin_date, format='%Y-%m')) & (bond_data['date_dt'] <= pd.to_datetime(end_date, format='%Y-%m'))
-bond_filtered_data = bond_data.loc[bond_mask].sort_values('date_dt').copy()
-
-if bond_filtered_data.empty:
-    st.warning("No bond data available for the selected date range.")
-else:
-    # Drop the temporary 'date_dt' column
-    bond_filtered_data.drop(columns=['date_dt'], inplace=True)
+# Detected bear markets are cached per (series, threshold) in the data store and shared by every
+# session, so moving the threshold slider back to a value seen before costs nothing
+def get_bear_market_detections():
+    return data_store.bear_market_detections
 
 # Utility to display tables with proper formatting
 def display_table(title, dataframe):
     st.write(title)
     st.table(format_table(dataframe))
 
-# Calculate and display Bear Market Metrics
-bear_metrics_summary, bear_filtered_data = calculate_bear_market_metrics(
-    data["bear_market_data"], start_date=begin_date, end_date=end_date
+# Utility to show the (level, text) messages the calculations return instead of rendering
+def show_messages(messages):
+    for level, message in messages:
+        getattr(st, level)(message)
+
+
+# -----------------------------
+# Page computations
+# -----------------------------
+# Each section below is a node of a per-session dependency graph. A node only runs when a
+# visible widget asks for it and is memoized for the inputs it depends on, so hidden sections
+# cost nothing and e.g. changing the initial investment leaves the bear/recession metrics alone.
+
+if "compute_graph" not in st.session_state:
+    st.session_state["compute_graph"] = ComputeGraph()
+page = st.session_state["compute_graph"]
+page.set_inputs(
+    begin_date=begin_date, end_date=end_date, initial_investment=initial_investment,
+    bear_market_source=bear_market_source, bear_market_threshold=bear_market_threshold,
 )
-display_table("Bear Market Summary Table", bear_metrics_summary)
+
+# After a data update, drop the sections whose period reaches the changed month. Detected bear
+# markets can change for earlier periods too (a decline completes or recovers later on).
+changed_month = data_store.changed_since(st.session_state.get("data_version", data_store.version))
+if changed_month is not None:
+    page.invalidate_where(
+        lambda inputs: "end_date" not in inputs
+        or window_touches(inputs["end_date"], changed_month)
+        or inputs.get("bear_market_source", HISTORICAL_BEAR_MARKETS) != HISTORICAL_BEAR_MARKETS
+    )
+st.session_state["data_version"] = data_store.version
+
+
+@page.node("bond_filtered_data", depends_on=["begin_date", "end_date"])
+@timed("main.bond_filtered_data")
+def bond_filtered_data(begin_date, end_date):
+    # Filter bond data based on user-selected date range
+    return filter_bond_data(get_bond_data(), begin_date, end_date)
+
+
+@page.node("bear_market_index", depends_on=["bear_market_source", "bear_market_threshold"])
+@timed("main.bear_market_index")
+def bear_market_index(bear_market_source, bear_market_threshold):
+    if bear_market_source == HISTORICAL_BEAR_MARKETS:
+        return data["bear_market_data"]
+    return get_bear_market_detections().index(bear_market_source, bear_market_threshold)
+
+
+@page.node("bear_metrics", depends_on=["bear_market_index", "begin_date", "end_date"])
+@timed("main.bear_metrics")
+def bear_metrics(bear_market_index, begin_date, end_date):
+    return calculate_bear_market_metrics(bear_market_index, start_date=begin_date, end_date=end_date)
+
+
+@page.node("recession_metrics", depends_on=["begin_date", "end_date"])
+@timed("main.recession_metrics")
+def recession_metrics(begin_date, end_date):
+    return calculate_recession_metrics(data["recession_data"], start_date=begin_date, end_date=end_date)
+
+
+@page.node("bar_chart", depends_on=["begin_date", "end_date"])
+@timed("main.bar_chart")
+def bar_chart(begin_date, end_date):
+    return graph.create_bar_chart(market_data, start_date=begin_date, end_date=end_date)
+
+
+@page.node("unit_results", depends_on=["bond_filtered_data", "begin_date", "end_date"])
+@timed("main.unit_results")
+def unit_results(bond_filtered_data, begin_date, end_date):
+    return result_cache.get_or_compute(
+        (begin_date, end_date),
+        lambda: compute_unit_results(market_data, bond_filtered_data, begin_date, end_date),
+    )
+
+
+@page.node("dividend_results", depends_on=["unit_results", "initial_investment"])
+@timed("main.dividend_results")
+def dividend_results(unit_results, initial_investment):
+    return scale_dividend_results(unit_results["dividends"], initial_investment)
+
+
+@page.node("bond_metrics", depends_on=["unit_results", "initial_investment"])
+@timed("main.bond_metrics")
+def bond_metrics(unit_results, initial_investment):
+    return scale_bond_metrics(unit_results["bonds"], initial_investment)
+
+
+@page.node("bond_paths", depends_on=["bond_filtered_data", "initial_investment"])
+@timed("main.bond_paths")
+def bond_paths(bond_filtered_data, initial_investment):
+    # Monthly bond paths are only needed for the charts, so they are computed on demand
+    if len(bond_filtered_data) < 2:
+        return None
+    return calculate_bond_paths(bond_filtered_data, initial_investment)
+
+
+@page.node("income_metrics", depends_on=[
+    "bond_filtered_data", "dividend_results", "bond_metrics", "initial_investment", "begin_date", "end_date"])
+@timed("main.income_metrics")
+def income_metrics(bond_filtered_data, dividend_results, bond_metrics, initial_investment, begin_date, end_date):
+    return calculate_income_metrics(
+        data_df=market_data,
+        bond_filtered_data=bond_filtered_data,
+        initial_investment=initial_investment,
+        begin_date=begin_date,
+        end_date=end_date,
+        dividend_results=dividend_results,
+        bond_metrics=bond_metrics,
+    )
+
+
+@page.node("additional_metrics", depends_on=["begin_date", "end_date", "initial_investment"])
+@timed("main.additional_metrics")
+def additional_metrics(begin_date, end_date, initial_investment):
+    return calculate_metrics(
+        market_data,
+        start_date=begin_date,
+        end_date=end_date,
+        initial_investment=initial_investment,
+    )
+
+
+@page.node("horizons_matrix", depends_on=["end_date", "initial_investment"])
+@timed("main.horizons_matrix")
+def horizons_matrix(end_date, initial_investment):
+    return calculate_horizons_matrix(market_data, end_date, config.PREDEFINED_PERIODS, initial_investment)
+
+
+@page.node("comparison_tables", depends_on=[
+    "bond_filtered_data", "dividend_results", "bond_metrics", "initial_investment", "begin_date", "end_date"])
+@timed("main.comparison_tables")
+def comparison_tables(bond_filtered_data, dividend_results, bond_metrics, initial_investment, begin_date, end_date):
+    cpi_data = market_data  # The CPI series lives in the market dataset
+
+    # Generate Nominal and Real comparison tables
+    nominal_table = create_comparison_table(
+        sp500_data=market_data,
+        bond_data=bond_filtered_data,
+        initial_investment=initial_investment,
+        begin_date=begin_date,
+        end_date=end_date,
+        data_type="Nominal",
+        dividend_results=dividend_results,
+        bond_metrics=bond_metrics,
+    )
+
+    real_table = create_comparison_table(
+        sp500_data=market_data,
+        bond_data=bond_filtered_data,
+        initial_investment=initial_investment,
+        begin_date=begin_date,
+        end_date=end_date,
+        data_type="Real",
+        cpi_data=cpi_data,  # Pass the CPI data
+        dividend_results=dividend_results,
+        bond_metrics=bond_metrics,
+    )
+    return nominal_table, real_table
+
+
+@page.node("allocation_sweep", depends_on=["begin_date", "end_date", "initial_investment"])
+@timed("main.allocation_sweep")
+def allocation_sweep(begin_date, end_date, initial_investment):
+    # Every stock share from 0 to 100% for each rebalancing frequency, nominal and real
+    return {
+        data_type: sweep_allocations(get_monthly_returns(), begin_date, end_date, data_type, initial_investment)
+        for data_type in ["Nominal", "Real"]
+    }
+
+
+def get_bond_filtered_data():
+    bond_filtered_data = page.get("bond_filtered_data")
+    if bond_filtered_data.empty:
+        st.warning("No bond data available for the selected date range.")
+    return bond_filtered_data
+
+
+# -----------------------------
+# Page layout
+# -----------------------------
+
+# Calculate and display Bear Market Metrics
+bear_metrics_summary, bear_filtered_data, bear_messages = page.get("bear_metrics")
+show_messages(bear_messages)
+display_table("Bear Market Summary Table", format_bear_market_summary(bear_metrics_summary))
 
 # Display Bear Markets and Recessions During the Period
 if st.checkbox("Show Bear Markets During This Period"):
-    display_table("Bear Markets During This Period", bear_filtered_data)
+    display_table("Bear Markets During This Period", format_bear_markets(bear_filtered_data))
 
 
 
 
 # Calculate and display Recession Metrics
-recession_metrics_summary, recession_filtered_data = calculate_recession_metrics(
-    data["recession_data"], start_date=begin_date, end_date=end_date
-)
-display_table("Recession Summary Table", recession_metrics_summary)
+recession_metrics_summary, recession_filtered_data = page.get("recession_metrics")
+display_table("Recession Summary Table", format_recession_summary(recession_metrics_summary))
 
 if st.checkbox("Show Recessions During This Period"):
-    display_table("Recessions During This Period", recession_filtered_data)
+    display_table("Recessions During This Period", format_recessions(recession_filtered_data))
 
 
 
 
 # Add the new bar chart after the Recession Summary Table
 st.header("What did The Managers of The Great Companies of America Produce in the Face of Such Trauma...")
-bar_chart_fig = graph.create_bar_chart(
-    data["data_df"], 
-    start_date=begin_date, 
-    end_date=end_date
-)
-st.plotly_chart(bar_chart_fig, use_container_width=True)
+st.plotly_chart(page.get("bar_chart"), use_container_width=True)
 
 st.header("A Deeper Dive Into Data")
 
@@ -173,115 +364,247 @@ st.header("A Deeper Dive Into Data")
 # Place this checkbox at the top
 if st.checkbox("Show Detailed Income Metrics Table"):
     try:
-        # Call the calculate_income_metrics function
-        income_metrics_df = calculate_income_metrics(
-            data_df=data["data_df"],
-            bond_filtered_data=bond_filtered_data,
-            initial_investment=initial_investment,
-            begin_date=begin_date,
-            end_date=end_date,
-        )
+        get_bond_filtered_data()
+        income_metrics_df = page.get("income_metrics")
 
         # Display the formatted table
         st.subheader("Detailed Income Metrics Table")
-        st.table(income_metrics_df)
+        st.table(format_table(format_income_metrics(income_metrics_df)))
 
     except RuntimeError as e:
         st.error(str(e))
 
 
+# Annualized return heatmap served from the precomputed, memory-mapped return matrices
+@st.cache_resource(max_entries=1)
+def get_return_matrices(data_version):
+    # A new data version finds the matrix files stale and extends them by the added months
+    return {data_type: load_return_matrix(data_type, data_df=market_data) for data_type in RETURN_SERIES}
+
+if st.checkbox("Show Annualized Return Heatmap"):
+    heatmap_type = st.radio("Return Series", list(RETURN_SERIES.keys()), horizontal=True)
+    return_matrix = get_return_matrices(data_store.version)[heatmap_type]
+
+    annualized_return = return_matrix.lookup(begin_date, end_date)
+    st.write(f"**Annualized {heatmap_type} Total Return ({begin_date} to {end_date}):** {annualized_return:.2%}")
+
+    # Sample the window so the heatmap stays around 80x80 cells however long the period is
+    window_months = (pd.to_datetime(end_date).to_period('M') - pd.to_datetime(begin_date).to_period('M')).n
+    heatmap_step = max(1, int(np.ceil(window_months / 80)))
+    heatmap_fig = graph.create_return_heatmap(
+        return_matrix.window(begin_date, end_date, step=heatmap_step),
+        title=f"Annualized {heatmap_type} Total Return by Begin and End Month",
+    )
+    st.plotly_chart(heatmap_fig, use_container_width=True)
+
+
 # Additional Financial Metrics
 if st.checkbox("Show Additional Financial Metrics"):
     try:
-        metrics_df = calculate_metrics(
-            data["data_df"], 
-            start_date=begin_date, 
-            end_date=end_date, 
-            initial_investment=initial_investment, 
-            decimals=2
-        )
-        display_table("Additional Financial Metrics During This Period", metrics_df)
+        display_table("Additional Financial Metrics During This Period", format_metrics_table(page.get("additional_metrics")))
     except Exception as e:
         st.error(f"Error calculating metrics: {e}")
 
+    # The same metrics for every predefined period ending at the selected end date
+    horizon_quantity = st.radio("All Periods Ending at the End Date", HORIZON_QUANTITIES, index=2, horizontal=True)
+    display_table(
+        f"{horizon_quantity} by Period Ending {end_date}",
+        format_horizons_table(page.get("horizons_matrix"), horizon_quantity),
+    )
 
 
 
 
 
 
-# Display Bond Results
-try:
-    cpi_data = data["data_df"]  # Assuming the CPI data is loaded in the 'data_df'
-
-    # Generate Nominal and Real comparison tables
-    nominal_table = create_comparison_table(
-        sp500_data=data["data_df"],
-        bond_data=bond_filtered_data,
-        initial_investment=initial_investment,
-        begin_date=begin_date,
-        end_date=end_date,
-        data_type="Nominal",
-    )
 
-    real_table = create_comparison_table(
-        sp500_data=data["data_df"],
-        bond_data=bond_filtered_data,
-        initial_investment=initial_investment,
-        begin_date=begin_date,
-        end_date=end_date,
-        data_type="Real",
-        cpi_data=cpi_data,  # Pass the CPI data
-    )
-    # Checkbox to control the display of both tables
-    show_tables = st.checkbox("Show Nominal and Real Comparison Tables")
+# Display Bond Results
+# Checkbox to control the display of both tables
+if st.checkbox("Show Nominal and Real Comparison Tables"):
+    try:
+        get_bond_filtered_data()
+        nominal_table, real_table = page.get("comparison_tables")
 
-    if show_tables:
         # Format and display the Nominal Comparison Table
         st.subheader("Comparison of Nominal Investments")
-        formatted_nominal_table = format_table(nominal_table)
+        formatted_nominal_table = format_table(format_comparison_table(nominal_table))
         st.table(formatted_nominal_table)
 
         # Format and display the Real Comparison Table
         st.subheader("Comparison of Real Investments")
-        formatted_real_table = format_table(real_table)
+        formatted_real_table = format_table(format_comparison_table(real_table))
         st.table(formatted_real_table)
 
-except Exception as e:
-    st.error(f"Error displaying the comparison tables: {e}")
+    except Exception as e:
+        st.error(f"Error displaying the comparison tables: {e}")
 
-# Add checkboxes for optional display of Nominal and Real Dividends
-show_nominal = st.checkbox("Show Nominal Dividend Charts")
-show_real = st.checkbox("Show Real Dividend Charts")
+# Joint monthly stock/bond returns shared by the simulation, the withdrawal rate solver and the allocation sweep
+def get_monthly_returns():
+    return data_store.monthly_returns
 
-# Calculate dividends
-dividend_results = calculate_dividends(
-    data["data_df"], start_date=begin_date, end_date=end_date, initial_investment=initial_investment
-)
+# Stock/bond mix and rebalancing frequency over the selected period
+if st.checkbox("Show Stock/Bond Allocation Sweep"):
+    try:
+        sweeps = page.get("allocation_sweep")
+    except ValueError as e:
+        st.error(str(e))
+    else:
+        sweep_cols = st.columns(2)
+        sweep_type = sweep_cols[0].radio("Allocation Values", ["Nominal", "Real"], horizontal=True)
+        sweep_risk = sweep_cols[1].radio("Risk Measure", ["Volatility", "Max Drawdown"], horizontal=True)
+        sweep = sweeps[sweep_type]
+        frontier_fig = graph.create_allocation_frontier_chart(
+            sweep, risk_column=sweep_risk,
+            title=f"{sweep_type} Return vs {sweep_risk} by Stock Allocation ({begin_date} to {end_date})",
+        )
+        st.plotly_chart(frontier_fig, use_container_width=True)
+        sweep_frequency = st.radio("Rebalancing", list(REBALANCING_FREQUENCIES), horizontal=True)
+        sweep_rows = sweep[(sweep['Rebalancing'] == sweep_frequency)
+                           & np.isclose(sweep['Stock Allocation'] * 10, np.round(sweep['Stock Allocation'] * 10))]
+        display_table(f"{sweep_type} Results in 10% Steps, Rebalanced {sweep_frequency}", format_allocation_table(sweep_rows))
+        display_table("Lowest Drawdown by Rebalancing Frequency",
+                      format_allocation_table(best_allocations(sweep, 'Max Drawdown')))
+
+# Monte Carlo simulation next to the historical comparison tables
+@st.cache_data
+def run_simulation(horizon_years, initial_investment, n_paths, block_months, seed, data_type, data_version):
+    return simulate(
+        get_monthly_returns(), horizon_months=horizon_years * 12, initial_investment=initial_investment,
+        n_paths=n_paths, block_months=block_months, seed=seed, data_type=data_type,
+    )
+
+if st.checkbox("Show Monte Carlo Simulation"):
+    sim_cols = st.columns(4)
+    sim_horizon_years = sim_cols[0].number_input("Horizon (Years)", min_value=1, max_value=90, value=30)
+    sim_paths = sim_cols[1].selectbox("Paths", [10_000, 50_000, 100_000], index=2)
+    sim_block_months = sim_cols[2].number_input("Block Length (Months)", min_value=1, max_value=120, value=12)
+    sim_data_type = sim_cols[3].radio("Values", ["Nominal", "Real"])
+
+    simulation = run_simulation(
+        int(sim_horizon_years), initial_investment, sim_paths, int(sim_block_months), 0, sim_data_type,
+        data_store.version,
+    )
+    display_table(f"Simulated {sim_data_type} Outcomes After {sim_horizon_years} Years", percentile_summary(simulation).round(0))
+
+    sim_strategy = st.selectbox("Strategy to Chart", STRATEGIES)
+    band_fig = graph.create_percentile_band_chart(
+        percentile_bands(simulation, sim_strategy),
+        title=f"{sim_strategy} - Simulated {sim_data_type} Value Percentiles",
+        yaxis_title=f"{sim_data_type} Value",
+    )
+    st.plotly_chart(band_fig, use_container_width=True)
+
+# Safe withdrawal rate of every historical retirement start month, all solved in one pass
+@st.cache_data
+def safe_withdrawal_rates(horizon_years, stock_allocation, data_version):
+    with stage("main.safe_withdrawal_rates"):
+        return calculate_safe_withdrawal_rates(get_monthly_returns(), horizon_years * 12, stock_allocation)
 
-for key, (df, total, final_value) in dividend_results.items():
-    if "With_Reinvestment" in key:
-        # Reinvested strategies
-        if ("Nominal" in key and show_nominal) or ("Real" in key and show_real):
-            st.subheader(f"{key.replace('_', ' ')}")
-            # st.write("**Total Dividends/Interest:** NA")
-            st.write(f"**Final Ending Value:** ${final_value:,.2f}")
-
-            # Create and display charts
-            chart_title = key.replace('_', ' ') + " - Dividends and Ending Value"
-            fig = graph.create_dividends_ending_value_chart(df, title=chart_title)
-            st.plotly_chart(fig, use_container_width=True)
+if st.checkbox("Show Safe Withdrawal Rates"):
+    swr_cols = st.columns(2)
+    swr_horizon_years = swr_cols[0].number_input("Retirement Length (Years)", min_value=1, max_value=90, value=30)
+    swr_stock_percent = swr_cols[1].slider("Stock Allocation (%)", 0, 100, 60, step=5, key="swr_stock_percent")
+
+    try:
+        withdrawal_rates = safe_withdrawal_rates(int(swr_horizon_years), swr_stock_percent / 100, data_store.version)
+    except ValueError as e:
+        st.error(str(e))
+    else:
+        swr_summary = withdrawal_rate_summary(withdrawal_rates)
+        display_table(
+            f"Safe Withdrawal Rates Over {swr_horizon_years} Years ({swr_stock_percent}% Stocks, Rebalanced Monthly)",
+            format_withdrawal_rate_summary(swr_summary),
+        )
+        st.write(f"**Worst Start Month:** {worst_start_date(withdrawal_rates):%Y-%m}")
+        swr_fig = graph.create_withdrawal_rate_chart(
+            withdrawal_rates['Start Date'], withdrawal_rates['Withdrawal Rate'],
+            title=f"Maximum Constant Real Withdrawal by Start Month ({swr_horizon_years} Years)",
+            percentiles=swr_summary[swr_summary['Metric'].isin(['P5', 'P50', 'P95'])],
+        )
+        st.plotly_chart(swr_fig, use_container_width=True)
+
+# Dollar-cost averaging: fixed monthly contributions for every historical start month
+@st.cache_data
+def dca_cohorts(horizon_years, monthly_contribution, data_version):
+    with stage("main.dca_cohorts"):
+        return calculate_dca_cohorts(
+            market_data, get_bond_data(), horizon_years * 12, monthly_contribution, index=data_store.window_index
+        )
+
+if st.checkbox("Show Dollar-Cost Averaging Across Start Months"):
+    dca_cols = st.columns(2)
+    dca_horizon_years = dca_cols[0].number_input("Contribution Period (Years)", min_value=1, max_value=90, value=30)
+    dca_contribution = dca_cols[1].number_input("Monthly Contribution", min_value=100, max_value=100000, value=500, step=100)
+
+    try:
+        dca_results = dca_cohorts(int(dca_horizon_years), dca_contribution, data_store.version)
+    except ValueError as e:
+        st.error(str(e))
     else:
-        # Non-reinvested strategies
-        if ("Nominal" in key and show_nominal) or ("Real" in key and show_real):
-            st.subheader(f"{key.replace('_', ' ')}")
-            st.write(f"**Total Dividends/Interest:** ${total:,.2f}")
-            st.write(f"**Final Ending Value:** ${final_value:,.2f}")
-
-            # Create and display charts
-            chart_title = key.replace('_', ' ') + " - Dividends and Ending Value"
-            fig = graph.create_dividends_ending_value_chart(df, title=chart_title)
-            st.plotly_chart(fig, use_container_width=True)
+        st.write(f"**Total Contributions per Cohort:** ${dca_results['Total Contributions']:,.0f}")
+        display_table(
+            f"Ending Value and Money-Weighted Return of Every {dca_horizon_years}-Year Cohort",
+            format_dca_summary(dca_summary(dca_results)),
+        )
+        dca_strategies = st.multiselect(
+            "Strategies to Chart", DCA_STRATEGIES,
+            default=["Nominal_With_Reinvestment", "Bonds_Nominal_With_Reinvestment"],
+            format_func=lambda strategy: strategy.replace('_', ' '),
+        )
+        dca_fig = graph.create_cohort_line_chart(
+            dca_results['Start Date'],
+            {strategy.replace('_', ' '): dca_results[strategy]['IRR'] for strategy in dca_strategies},
+            title=f"Annualized Money-Weighted Return by Start Month ({dca_horizon_years} Years of Contributions)",
+            yaxis_title="IRR (%)",
+        )
+        st.plotly_chart(dca_fig, use_container_width=True)
+
+# Add checkboxes for optional display of Nominal and Real Dividends
+show_nominal = st.checkbox("Show Nominal Dividend and Interest Charts")
+show_real = st.checkbox("Show Real Dividend and Interest Charts")
+
+def show_income_chart(key, df, total, final_value, label, max_points):
+    st.subheader(f"{label} {key.replace('_', ' ')}")
+    if "No_Reinvestment" in key:
+        st.write(f"**Total Dividends/Interest:** ${total:,.2f}")
+    st.write(f"**Final Ending Value:** ${final_value:,.2f}")
+
+    # Create and display charts
+    income = "Dividends" if label == "Stocks" else "Interest"
+    chart_title = f"{label} {key.replace('_', ' ')} - {income} and Ending Value"
+    fig = graph.create_dividends_ending_value_chart(df, title=chart_title, max_points=max_points)
+    st.plotly_chart(fig, use_container_width=True)
+    if show_debug_panel:
+        st.caption(f"Chart payload: {graph.figure_payload_bytes(fig) / 1024:,.1f} KiB")
+
+
+if show_nominal or show_real:
+    # Long periods are downsampled so every chart ships about the same number of points
+    chart_point_budget = st.slider("Chart Point Budget (points per line)", 100, 2000, 400, step=100)
+    bond_path_results = page.get("bond_paths")
+    for key, (df, total, final_value) in page.get("dividend_results").items():
+        if not (("Nominal" in key and show_nominal) or ("Real" in key and show_real)):
+            continue
+        # Stock strategy on the left, the matching bond strategy next to it
+        stock_column, bond_column = st.columns(2)
+        with stock_column:
+            show_income_chart(key, df, total, final_value, "Stocks", chart_point_budget)
+        with bond_column:
+            if bond_path_results is None:
+                st.info("Not enough bond data for the selected date range.")
+            else:
+                show_income_chart(key, *bond_path_results[key], "Bonds", chart_point_budget)
+
+if show_debug_panel:
+    with st.sidebar.expander("Performance Debug Panel", expanded=True):
+        st.caption("Wall time and peak traced allocation per stage, accumulated across reruns and sessions."
+                   + ("" if config.TRACE_MEMORY else " Set TRACE_MEMORY=1 to record peak memory."))
+        st.dataframe(stats_frame().round(2), hide_index=True)
+        if st.button("Reset Measurements"):
+            reset_stats()
+        st.caption("Result cache statistics and page evaluations.")
+        st.write(result_cache.stats())
+        st.write({"evaluations": page.evaluations})
 
 
 
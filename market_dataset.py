@@ -0,0 +1,290 @@
+# market_dataset.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (
+    default_cache_dir, read_cache_metadata, write_json_atomic, read_excel_cached,
+    signature_matches, source_signature, content_hash, CACHE_VERSION,
+)
+
+# Immutable, pre-parsed market data.
+#
+# load_data returns 'Date' as 'YYYY-MM' strings; every compute function used to re-parse it with
+# pd.to_datetime and write the result back into the shared (cached) DataFrame. A MarketDataset
+# parses the dates once, keeps each numeric column as a read-only float64 array, and hands out
+# windows as zero-copy slices, so nothing downstream needs to parse, copy or mutate.
+#
+# A dataset also knows its sampling frequency (periods_per_year: 12 for the monthly workbook,
+# 252 for daily trading data) and can be saved as one .npy file per column and reopened
+# memory-mapped, so a long daily history is paged in on demand instead of parsed into memory.
+# Columns may be stored as float32 to halve the footprint; windows hand them out as float64.
+
+# Periods per year of each supported sampling frequency and the typical spacing of its rows in days
+FREQUENCIES = {'daily': (252, 1.4), 'weekly': (52, 7.0), 'monthly': (12, 30.44), 'quarterly': (4, 91.3), 'annual': (1, 365.25)}
+
+# Layout version of MarketDataset.save directories
+DATASET_VERSION = 1
+
+
+def infer_periods_per_year(dates):
+    """
+    Returns the periods per year of the FREQUENCIES entry whose row spacing is closest (on a log
+    scale) to the median spacing between distinct dates; 12 when there are fewer than two.
+    """
+    gaps = np.diff(pd.DatetimeIndex(dates).asi8)
+    gaps = gaps[gaps > 0]
+    if len(gaps) == 0:
+        return 12
+    spacing = np.median(gaps) / 86_400e9
+    periods, _ = min(FREQUENCIES.values(), key=lambda entry: abs(np.log(spacing / entry[1])))
+    return periods
+
+
+def window_end(end_date):
+    """
+    Returns the last instant a window ending at end_date covers: a 'YYYY-MM' end date means the
+    whole month (the row dated on the 1st for monthly data, every trading day for daily data).
+    """
+    if isinstance(end_date, str) and len(end_date) == 7:
+        return pd.Period(end_date, freq='M').end_time
+    return pd.Timestamp(end_date)
+
+
+def first_changed_row(old_keys, old_columns, new_keys, new_columns):
+    """
+    Returns the first row position at which two tables differ, comparing the row keys (dates or
+    month ordinals) and every column of old_columns (NaN equals NaN).
+
+    A table that only gained rows at the end returns len(old_keys); rows that were revised,
+    inserted or dropped return the position of the first affected row.
+
+    Parameters:
+    - old_keys, new_keys (array-like): Row keys of the previous and current table.
+    - old_columns, new_columns (dict): Column name -> values; a column missing from new_columns
+      counts as changed from row 0.
+    """
+    old_keys, new_keys = np.asarray(old_keys), np.asarray(new_keys)
+    n = min(len(old_keys), len(new_keys))
+    same = old_keys[:n] == new_keys[:n]
+    for name, old in old_columns.items():
+        if name not in new_columns:
+            return 0
+        old = np.asarray(old, dtype=float)[:n]
+        new = np.asarray(new_columns[name], dtype=float)[:n]
+        same &= (old == new) | (np.isnan(old) & np.isnan(new))
+    changed = np.flatnonzero(~same)
+    return int(changed[0]) if len(changed) else n
+
+
+def _save_array(path, values):
+    # Written next to the target and renamed, so readers that still map the old file keep it intact
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, values)
+    os.replace(tmp_path, path)
+
+
+def _read_only(values):
+    # float32 columns (e.g. memory-mapped compact storage) are kept as they are
+    dtype = values.dtype if isinstance(values, np.ndarray) and values.dtype in (np.float32, np.float64) else np.float64
+    values = np.ascontiguousarray(values, dtype=dtype)
+    values.flags.writeable = False
+    return values
+
+
+class MarketWindow:
+    """
+    Zero-copy view of the rows of a MarketDataset between two positions (inclusive).
+    """
+
+    def __init__(self, dataset, begin, end):
+        self.dataset = dataset
+        self.begin = begin
+        self.end = end
+
+    def __len__(self):
+        return max(self.end - self.begin + 1, 0)
+
+    @property
+    def dates(self):
+        return self.dataset.dates[self.begin:self.end + 1]
+
+    def column(self, name):
+        """
+        Returns the array of one column inside the window as float64 (read-only, and zero-copy
+        unless the column is stored as float32).
+        """
+        return np.asarray(self.dataset[name][self.begin:self.end + 1], dtype=np.float64)
+
+    def to_frame(self):
+        return self.dataset.to_frame().iloc[self.begin:self.end + 1].reset_index(drop=True)
+
+
+class MarketDataset:
+    """
+    Market data with parsed dates and read-only float64 column arrays.
+
+    Parameters:
+    - dates (array-like): Row dates in ascending order.
+    - columns (dict): Column name -> numeric values, in display order.
+    - periods_per_year (int, optional): Rows per year (12 monthly, 252 daily); inferred from
+      the dates when omitted.
+    """
+
+    def __init__(self, dates, columns, periods_per_year=None):
+        self.dates = pd.DatetimeIndex(dates)
+        if not self.dates.is_monotonic_increasing:
+            raise ValueError("MarketDataset dates must be in ascending order.")
+        self._columns = {name: _read_only(values) for name, values in columns.items()}
+        for name, values in self._columns.items():
+            if len(values) != len(self.dates):
+                raise ValueError(f"Column '{name}' has {len(values)} rows, expected {len(self.dates)}.")
+        months = (self.dates.year * 12 + self.dates.month - 1).to_numpy(dtype=np.int64)
+        months.flags.writeable = False
+        self.months = months
+        self.periods_per_year = periods_per_year or infer_periods_per_year(self.dates)
+
+    @classmethod
+    def from_frame(cls, df, date_column='Date', periods_per_year=None):
+        """
+        Builds a dataset from a DataFrame such as the one returned by load_data. Rows are
+        sorted by date and non-numeric columns other than the date column are dropped.
+        """
+        dates = pd.to_datetime(df[date_column])
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        columns = {
+            col: df[col].to_numpy()[order]
+            for col in df.columns
+            if col != date_column and pd.api.types.is_numeric_dtype(df[col])
+        }
+        return cls(dates.to_numpy()[order], columns, periods_per_year)
+
+    @classmethod
+    def open(cls, directory):
+        """
+        Opens a dataset written by save(), memory-mapping every column read-only.
+        """
+        manifest = read_cache_metadata(os.path.join(directory, 'manifest.json'))
+        if manifest is None or manifest.get('dataset_version') != DATASET_VERSION:
+            raise ValueError(f"'{directory}' does not hold a saved MarketDataset.")
+        dates = np.load(os.path.join(directory, 'dates.npy'), mmap_mode='r')
+        columns = {
+            entry['name']: np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+            for entry in manifest['columns']
+        }
+        return cls(dates, columns, manifest['periods_per_year'])
+
+    def save(self, directory, dtypes=None, metadata=None):
+        """
+        Writes the dataset as one .npy file per column plus a JSON manifest, for open().
+
+        Parameters:
+        - directory (str): Target directory (created if needed; existing files are replaced).
+        - dtypes (dict, optional): Column name -> np.float32 or np.float64 (default float64).
+          float32 halves the size at about seven significant digits.
+        - metadata (dict, optional): Extra entries stored in the manifest.
+        """
+        os.makedirs(directory, exist_ok=True)
+        dtypes = dtypes or {}
+        _save_array(os.path.join(directory, 'dates.npy'), self.dates.to_numpy(dtype='datetime64[ns]'))
+        entries = []
+        for i, name in enumerate(self._columns):
+            file_name = f"column_{i}.npy"
+            _save_array(os.path.join(directory, file_name), self._columns[name].astype(dtypes.get(name, np.float64)))
+            entries.append({'name': name, 'file': file_name, 'dtype': np.dtype(dtypes.get(name, np.float64)).name})
+        write_json_atomic(os.path.join(directory, 'manifest.json'), {
+            **(metadata or {}),
+            'dataset_version': DATASET_VERSION,
+            'periods_per_year': int(self.periods_per_year),
+            'rows': len(self),
+            'columns': entries,
+        })
+        return directory
+
+    @classmethod
+    def coerce(cls, data):
+        """
+        Returns data unchanged if it already is a MarketDataset, otherwise builds one from a DataFrame.
+        """
+        return data if isinstance(data, cls) else cls.from_frame(data)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def positions(self, start_date, end_date):
+        """
+        Returns the (begin, end) row positions of the rows with start_date <= Date <= end_date
+        (end < begin when the window is empty), found by binary search. A 'YYYY-MM' end date
+        includes the whole month (see window_end).
+        """
+        begin = int(self.dates.searchsorted(pd.Timestamp(start_date), side='left'))
+        end = int(self.dates.searchsorted(window_end(end_date), side='right')) - 1
+        return begin, end
+
+    def window(self, start_date, end_date):
+        """
+        Returns the rows with start_date <= Date <= end_date as a MarketWindow.
+        """
+        return MarketWindow(self, *self.positions(start_date, end_date))
+
+    def first_difference(self, other):
+        """
+        Returns the first row position at which another dataset differs from this one (see
+        first_changed_row); len(self) when other only appends months.
+        """
+        return first_changed_row(self.months, self._columns, other.months, {name: other[name] for name in other.columns})
+
+    def to_frame(self):
+        """
+        Returns a new DataFrame with a datetime 'Date' column followed by the numeric columns.
+        """
+        return pd.DataFrame({'Date': self.dates, **self._columns})
+
+
+def load_dataset_cached(filepath, sheet_name='data', cache_dir=None, dtypes=None, periods_per_year=None):
+    """
+    Reads a worksheet as a memory-mapped MarketDataset, stored as column files next to the workbook.
+
+    The column files are keyed on the workbook's signature like read_excel_cached, so the sheet
+    is only parsed (through the Parquet cache) when the workbook changed; otherwise opening the
+    dataset maps the files without reading them.
+
+    Parameters:
+    - filepath (str): Path to the Excel workbook.
+    - sheet_name (str): Worksheet to read (needs a 'Date' column).
+    - cache_dir (str, optional): Directory for cache files (default: '.cache' next to the workbook).
+    - dtypes (dict, optional): Column name -> storage dtype (see MarketDataset.save).
+    - periods_per_year (int, optional): Rows per year; inferred from the dates when omitted.
+
+    Returns:
+    - MarketDataset: The dataset with memory-mapped columns.
+    """
+    cache_dir = cache_dir or default_cache_dir(filepath)
+    directory = os.path.join(cache_dir, f"{os.path.basename(filepath)}.{sheet_name}.columns")
+    manifest = read_cache_metadata(os.path.join(directory, 'manifest.json'))
+    fresh, sha256 = signature_matches(filepath, manifest)
+    if fresh:
+        # The stored files must also match the requested layout
+        stored_dtypes = {entry['name']: entry['dtype'] for entry in manifest['columns']}
+        fresh = all(stored_dtypes.get(name) == np.dtype(dtype).name for name, dtype in (dtypes or {}).items())
+        fresh &= periods_per_year is None or manifest['periods_per_year'] == periods_per_year
+    if fresh and sha256 is not None:
+        # Content unchanged but the file was touched: refresh the stored signature
+        write_json_atomic(os.path.join(directory, 'manifest.json'), {**manifest, **source_signature(filepath)})
+    elif not fresh:
+        dataset = MarketDataset.from_frame(read_excel_cached(filepath, sheet_name, cache_dir), periods_per_year=periods_per_year)
+        dataset.save(directory, dtypes, metadata={
+            'version': CACHE_VERSION, 'sha256': content_hash(filepath), **source_signature(filepath),
+        })
+    return MarketDataset.open(directory)
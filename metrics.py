@@ -1,76 +1,128 @@
+import numpy as np
 import pandas as pd
-import streamlit as st
-from data_loader import load_data
+import config
+from market_dataset import MarketDataset, window_end
+from instrumentation import timed
 
 # November 16
 
-def calculate_metrics(df, start_date, end_date, initial_investment=10000, decimals=2):
+# Columns whose begin value is replaced by the initial investment
+INVESTMENT_COLUMNS = ['Total Return', 'Real Total Return']
+
+# Numeric quantities of calculate_horizons_matrix, per (period, column)
+HORIZON_QUANTITIES = ['Begin Value', 'End Value', 'Increase Factor']
+
+
+def _metric_columns(dataset):
+    # Every column except Date and Date Fraction
+    return [col for col in dataset.columns if col not in ['Date', 'Date Fraction']]
+
+
+def _gather(dataset, columns, begin_positions, end_positions, initial_investment):
+    """
+    Returns (begin values, end values, increase factors), each of shape (windows, columns), for the
+    windows [begin_positions[i], end_positions[i]]; empty windows are NaN.
+    """
+    begin_positions = np.asarray(begin_positions)
+    end_positions = np.asarray(end_positions)
+    empty = (end_positions < begin_positions) | (end_positions < 0) | (begin_positions >= len(dataset))
+    positions = np.concatenate([begin_positions, end_positions]).clip(0, max(len(dataset) - 1, 0))
+    # Gather first so float32 (memory-mapped) columns are only converted at the gathered rows
+    gathered = np.stack([np.asarray(dataset[col][positions], dtype=float) for col in columns], axis=1)
+    gathered[np.concatenate([empty, empty])] = np.nan
+
+    begin_values, end_values = gathered[:len(begin_positions)], gathered[len(begin_positions):]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        increase_factors = end_values / begin_values
+
+    # Total Return and Real Total Return start from the initial investment
+    investment = np.isin(columns, INVESTMENT_COLUMNS)
+    begin_values = np.where(investment, np.where(empty[:, None], np.nan, initial_investment), begin_values)
+    end_values = np.where(investment, begin_values * increase_factors, end_values)
+    return begin_values, end_values, increase_factors
+
+
+def _metrics_frame(columns, begin_values, end_values, increase_factors):
+    return pd.DataFrame({
+        'Metric': columns,
+        'Begin Value': begin_values,
+        'End Value': end_values,
+        'Increase Factor': increase_factors,
+    })
+
+
+@timed
+def calculate_metrics(df, start_date, end_date, initial_investment=10000):
     """
     Calculates the beginning value, ending value, and increase factor for each column except Date Fraction and Date.
     Uses initial investment for Total Return and Real Total Return calculations.
 
     Parameters:
-    df (pd.DataFrame): The data containing financial metrics.
+    df (MarketDataset or pd.DataFrame): The data containing financial metrics.
     start_date (str): The starting date in 'YYYY-MM' format.
     end_date (str): The ending date in 'YYYY-MM' format.
     initial_investment (float): The initial investment value for Total Return and Real Total Return.
-    decimals (int): Number of decimal places to display for non-currency values.
 
     Returns:
-    pd.DataFrame: A DataFrame with calculated metrics.
+    pd.DataFrame: A DataFrame with a 'Metric' column and numeric 'Begin Value', 'End Value' and
+                  'Increase Factor' columns (see formatting.format_metrics_table).
     """
-    # Set decimal format string
-    decimal_format = f"{{:.{decimals}f}}"
-    
-    # Convert the Date column to datetime format
-    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m')
-    # Filter the DataFrame for the specified date range
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-    
-    # Define columns to include, excluding Date and Date Fraction
-    columns_to_include = [col for col in df.columns if col not in ['Date', 'Date Fraction']]
-
-    # Initialize an empty dictionary to store metrics
-    metrics = {
-        'Metric': [],
-        'Begin Value': [],
-        'End Value': [],
-        'Increase Factor': []
-    }
-    
-    # Calculate metrics for each numeric column
-    for column in columns_to_include:
-        begin_value = filtered_df[column].iloc[0]
-        end_value = filtered_df[column].iloc[-1]
-
-        # Special handling for Total Return and Real Total Return
-        if column in ['Total Return', 'Real Total Return']:
-            begin_value = initial_investment
-            increase_factor = end_value / filtered_df[column].iloc[0]
-            end_value = begin_value * increase_factor
-
-            # Format begin and end values as currency with no decimals
-            begin_value = f"${begin_value:,.0f}"
-            end_value = f"${end_value:,.0f}"
-            # Apply decimal format for Increase Factor
-            increase_factor = decimal_format.format(increase_factor)
-        else:
-            increase_factor = end_value / begin_value
-
-            # Apply decimal formatting for other values
-            begin_value = decimal_format.format(begin_value)
-            end_value = decimal_format.format(end_value)
-            increase_factor = decimal_format.format(increase_factor)
-
-        # Append results to the metrics dictionary
-        metrics['Metric'].append(column)
-        metrics['Begin Value'].append(begin_value)
-        metrics['End Value'].append(end_value)
-        metrics['Increase Factor'].append(increase_factor)
-
-    return pd.DataFrame(metrics)
+    # Locate the specified date range in the pre-parsed dataset
+    dataset = MarketDataset.coerce(df)
+    begin, end = dataset.positions(start_date, end_date)
+    if end < begin:
+        raise IndexError(f"No data between {start_date} and {end_date}.")
+
+    columns = _metric_columns(dataset)
+    begin_values, end_values, increase_factors = _gather(dataset, columns, [begin], [end], initial_investment)
+    return _metrics_frame(columns, begin_values[0], end_values[0], increase_factors[0])
+
 
+@timed
+def calculate_horizons_matrix(df, end_date, periods=None, initial_investment=10000):
+    """
+    Calculates the begin value, end value and increase factor of every column for many periods
+    ending at the same date, with one binary search and one gather over the dataset.
 
+    Parameters:
+    df (MarketDataset or pd.DataFrame): The data containing financial metrics.
+    end_date (str): The ending date in 'YYYY-MM' format.
+    periods (dict): Period label -> number of years before end_date or a fixed 'YYYY-MM' begin date
+                    (default: config.PREDEFINED_PERIODS).
+    initial_investment (float): The initial investment value for Total Return and Real Total Return.
+
+    Returns:
+    pd.DataFrame: Float matrix indexed by column name ('Metric') with (period label, quantity)
+                  MultiIndex columns, quantity being one of HORIZON_QUANTITIES. Periods without
+                  data are NaN.
+    """
+    if periods is None:
+        periods = config.PREDEFINED_PERIODS
+    dataset = MarketDataset.coerce(df)
+    columns = _metric_columns(dataset)
+
+    end_timestamp = pd.to_datetime(end_date)
+    begin_dates = pd.DatetimeIndex([
+        pd.to_datetime(period) if isinstance(period, str) else end_timestamp - pd.DateOffset(years=period)
+        for period in periods.values()
+    ])
+    begin_positions = dataset.dates.searchsorted(begin_dates, side='left')
+    end_position = int(dataset.dates.searchsorted(window_end(end_date), side='right')) - 1
+    end_positions = np.full(len(begin_positions), end_position)
+
+    begin_values, end_values, increase_factors = _gather(
+        dataset, columns, begin_positions, end_positions, initial_investment
+    )
+    # (periods, quantities, columns) -> rows per column, (period, quantity) columns
+    matrix = np.stack([begin_values, end_values, increase_factors], axis=1)
+    return pd.DataFrame(
+        matrix.reshape(len(periods) * len(HORIZON_QUANTITIES), len(columns)).T,
+        index=pd.Index(columns, name='Metric'),
+        columns=pd.MultiIndex.from_product([list(periods), HORIZON_QUANTITIES], names=['Period', 'Quantity']),
+    )
+
+
+@timed
 def calculate_comparison_table(bond_results, dividend_results, initial_investment):
     """
     Prepares a DataFrame with bond and dividend comparison metrics.
@@ -123,40 +175,50 @@ def calculate_comparison_table(bond_results, dividend_results, initial_investmen
     return pd.DataFrame(comparison_table_data)
 
 
+def period_begin_date(period, end_date):
+    """
+    Returns the 'YYYY-MM' begin date of a predefined period (see config.PREDEFINED_PERIODS).
+
+    Parameters:
+    period (int or str): Number of years before end_date, or a fixed 'YYYY-MM' begin date.
+    end_date (str): The ending date in 'YYYY-MM' format.
+    """
+    if isinstance(period, str):
+        return period
+    return (pd.to_datetime(end_date) - pd.DateOffset(years=period)).strftime("%Y-%m")
+
+
+@timed
 def calculate_periods_metrics(data_df, predefined_periods, end_date, initial_investment=10000):
     """
     Calculates metrics for predefined periods ending at a specific date.
 
     Parameters:
-    data_df (pd.DataFrame): The data containing financial metrics.
+    data_df (MarketDataset or pd.DataFrame): The data containing financial metrics.
     predefined_periods (list): List of predefined periods in years.
     end_date (str): The ending date in 'YYYY-MM' format.
     initial_investment (float): Initial investment value for Total Return and Real Total Return.
 
     Returns:
-    dict: A dictionary of DataFrames for each predefined period.
+    dict: A dictionary of calculate_metrics DataFrames for each predefined period.
     """
-    # Convert the Date column to datetime format
-    data_df['Date'] = pd.to_datetime(data_df['Date'], format='%Y-%m')
-
-    # Convert end_date to datetime
-    end_date = pd.to_datetime(end_date)
-
-    # Prepare results for each predefined period
-    results = {}
-    for years in predefined_periods:
-        start_date = end_date - pd.DateOffset(years=years)
-        filtered_df = data_df[(data_df['Date'] >= start_date) & (data_df['Date'] <= end_date)]
-
-        # Calculate metrics for this period
-        metrics_df = calculate_metrics(filtered_df, start_date=start_date, end_date=end_date, initial_investment=initial_investment)
-        results[f"Last {years} Years"] = metrics_df
-
-    return results
+    periods = {f"Last {years} Years": years for years in predefined_periods}
+    matrix = calculate_horizons_matrix(data_df, end_date, periods, initial_investment)
+
+    # One calculate_metrics-shaped frame per period
+    columns = list(matrix.index)
+    return {
+        label: _metrics_frame(columns, *(matrix[(label, quantity)].to_numpy() for quantity in HORIZON_QUANTITIES))
+        for label in periods
+    }
 
 
 # Streamlit Testing Code
 if __name__ == "__main__":
+    import streamlit as st
+    from data_loader import load_data
+    from formatting import format_metrics_table
+
     # Define default start and end dates
     BEGIN_DATE = '1959-10'
     END_DATE = '2024-09'
@@ -171,9 +233,9 @@ if __name__ == "__main__":
     decimals = st.number_input("Number of Decimals for Non-Currency Values", min_value=0, max_value=5, value=2)
 
     # Calculate metrics and display them
-    metrics_df = calculate_metrics(data_df, start_date=BEGIN_DATE, end_date=END_DATE, initial_investment=initial_investment, decimals=decimals)
+    metrics_df = calculate_metrics(data_df, start_date=BEGIN_DATE, end_date=END_DATE, initial_investment=initial_investment)
     st.write("Financial Metrics for Specified Period")
-    st.dataframe(metrics_df)
+    st.dataframe(format_metrics_table(metrics_df, decimals))
 
     # Testing predefined periods
     predefined_periods = [1, 3, 5, 10, 15, 20, 25, 30, 35, 40, 50]
@@ -181,7 +243,7 @@ if __name__ == "__main__":
 
     for period, df in periods_metrics.items():
         st.write(f"Metrics for {period}")
-        st.dataframe(df)
+        st.dataframe(format_metrics_table(df))
 
     # Testing the comparison table
     # Simulate bond and dividend data for testing
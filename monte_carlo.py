@@ -0,0 +1,201 @@
+# monte_carlo.py
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from market_dataset import MarketDataset
+from window_index import month_ordinals
+
+# Block-bootstrap Monte Carlo over the historical monthly series.
+#
+# Monthly stock price/total returns, dividend yields, CPI changes and bond total returns are
+# resampled jointly (the same historical months for every series) in contiguous blocks, which
+# keeps the cross-series and short-range serial correlation of the history. Paths are generated
+# in chunks, each seeded from its own child of one SeedSequence, so results are identical
+# whether chunks run in-process or across a process pool.
+
+STRATEGIES = ["SP500 With Reinvestment", "SP500 No Reinvestment", "Bonds With Reinvestment"]
+
+
+def build_monthly_returns(data_df, bond_df):
+    """
+    Aligns the stock and bond data on common months and returns the joint monthly series.
+
+    Parameters:
+    - data_df (MarketDataset or pd.DataFrame): Market data.
+    - bond_df (pd.DataFrame): Bond data as returned by ltc_bonds.load_data.
+
+    Returns:
+    - dict: NumPy arrays (one entry per month after the first common month) of
+      'price' (Composite ratio), 'total' (Total Return ratio), 'dividend_yield' (monthly
+      dividend % as in divs.py, on the month's closing price), 'cpi' (CPI ratio), 'bond'
+      (nominal_total_return ratio), 'real_total' (Real Total Return ratio) and 'real_bond'
+      (real_total_return ratio), plus 'months' (integer month ordinals of the month each ratio
+      ends in).
+    """
+    dataset = MarketDataset.coerce(data_df)
+    stocks = pd.DataFrame({
+        'month': dataset.months,
+        **{col: dataset[col] for col in ['Composite', 'Total Return', 'Real Total Return', 'Nominal Dividends', 'CPI']},
+    })
+    bonds = pd.DataFrame({
+        'month': month_ordinals(bond_df['date']),
+        'bond': bond_df['nominal_total_return'].to_numpy(dtype=float),
+        'real_bond': bond_df['real_total_return'].to_numpy(dtype=float),
+    })
+    joint = stocks.merge(bonds, on='month').dropna().sort_values('month')
+    if len(joint) < 2 or not np.all(np.diff(joint['month'].to_numpy()) == 1):
+        raise ValueError("Stock and bond data must share a contiguous run of at least two months.")
+
+    def ratio(col):
+        values = joint[col].to_numpy()
+        return values[1:] / values[:-1]
+
+    return {
+        'months': joint['month'].to_numpy()[1:],
+        'price': ratio('Composite'),
+        'total': ratio('Total Return'),
+        'dividend_yield': (joint['Nominal Dividends'].to_numpy() / joint['Composite'].to_numpy())[1:] / 12,
+        'cpi': ratio('CPI'),
+        'bond': ratio('bond'),
+        'real_total': ratio('Real Total Return'),
+        'real_bond': ratio('real_bond'),
+    }
+
+
+def _simulate_chunk(monthly_returns, n_paths, horizon_months, block_months, seed_sequence,
+                    initial_investment, data_type):
+    """
+    Simulates one chunk of paths, walking the horizon one block at a time so memory stays
+    at n_paths x block_months regardless of the horizon.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    # Growth ratios gathered together so each block needs one fancy-index and one cumprod
+    ratios = np.stack([monthly_returns[key] for key in ['total', 'price', 'bond', 'cpi']])
+    dividend_yield = monthly_returns['dividend_yield']
+    n_history = ratios.shape[1]
+    block_months = min(block_months, n_history)
+
+    # Rows: SP500 with reinvestment, SP500 price only, bonds with reinvestment, CPI index
+    state = np.ones((4, n_paths))
+    state[:3] = initial_investment
+    total_dividends = np.zeros(n_paths)
+    final_income = np.zeros(n_paths)
+
+    n_checkpoints = horizon_months // 12
+    checkpoints = np.empty((3, n_paths, n_checkpoints), dtype=np.float32)
+    real = data_type == "Real"
+
+    for block_start in range(0, horizon_months, block_months):
+        length = min(block_months, horizon_months - block_start)
+        starts = rng.integers(0, n_history - block_months + 1, size=n_paths)
+        rows = starts[:, None] + np.arange(length)
+
+        paths = state[:, :, None] * np.cumprod(ratios[:, rows], axis=2)
+        dividends = dividend_yield[rows] * paths[1]
+        if real:
+            dividends = dividends / paths[3]
+
+        total_dividends += dividends.sum(axis=1)
+        month_numbers = block_start + np.arange(length) + 1
+        final_income += dividends[:, month_numbers > horizon_months - 12].sum(axis=1)
+
+        at_checkpoint = month_numbers % 12 == 0
+        if at_checkpoint.any():
+            slots = month_numbers[at_checkpoint] // 12 - 1
+            values = paths[:3][:, :, at_checkpoint]
+            if real:
+                values = values / paths[3][:, at_checkpoint]
+            checkpoints[:, :, slots] = values
+
+        state = paths[:, :, -1]
+
+    ending_values = state[:3] / state[3] if real else state[:3]
+    return {
+        'Ending Value': {strategy: ending_values[i] for i, strategy in enumerate(STRATEGIES)},
+        'Total Dividends': total_dividends,
+        'Final Annual Income': final_income,
+        'Checkpoints': {strategy: checkpoints[i] for i, strategy in enumerate(STRATEGIES)},
+    }
+
+
+def _run_chunk(args):
+    return _simulate_chunk(*args)
+
+
+def simulate(monthly_returns, horizon_months, initial_investment=10000, n_paths=100_000, block_months=12,
+             seed=0, data_type="Nominal", chunk_size=10_000, workers=None):
+    """
+    Runs a block-bootstrap simulation of the historical monthly series.
+
+    Parameters:
+    - monthly_returns (dict): Output of build_monthly_returns.
+    - horizon_months (int): Length of each simulated path in months.
+    - initial_investment (float): Starting value of every strategy.
+    - n_paths (int): Number of simulated paths.
+    - block_months (int): Length of the resampled blocks in months.
+    - seed (int): Seed of the root SeedSequence; results depend only on (seed, chunk_size).
+    - data_type (str): "Nominal" or "Real" (values and income deflated by the simulated CPI).
+    - chunk_size (int): Paths generated per chunk.
+    - workers (int, optional): Spread chunks over a process pool with this many workers;
+      runs in-process when None or 1.
+
+    Returns:
+    - dict: 'Ending Value' (dict of per-strategy arrays), 'Total Dividends' and
+      'Final Annual Income' (no-reinvestment dividends over the horizon and its last 12 months),
+      'Checkpoints' (dict of per-strategy float32 arrays of value at each year end) and
+      'Checkpoint Years'.
+    """
+    if horizon_months < 1:
+        raise ValueError("horizon_months must be at least 1.")
+
+    chunk_sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [
+        (monthly_returns, size, horizon_months, block_months, seed_sequence, initial_investment, data_type)
+        for size, seed_sequence in zip(chunk_sizes, seeds)
+    ]
+
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_run_chunk, tasks))
+    else:
+        chunks = [_run_chunk(task) for task in tasks]
+
+    return {
+        'Ending Value': {
+            strategy: np.concatenate([chunk['Ending Value'][strategy] for chunk in chunks]) for strategy in STRATEGIES
+        },
+        'Total Dividends': np.concatenate([chunk['Total Dividends'] for chunk in chunks]),
+        'Final Annual Income': np.concatenate([chunk['Final Annual Income'] for chunk in chunks]),
+        'Checkpoints': {
+            strategy: np.concatenate([chunk['Checkpoints'][strategy] for chunk in chunks]) for strategy in STRATEGIES
+        },
+        'Checkpoint Years': np.arange(1, horizon_months // 12 + 1),
+    }
+
+
+def percentile_summary(result, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Summarizes ending values and income of a simulation as a DataFrame of percentiles.
+    """
+    rows = {f"{strategy} Ending Value": values for strategy, values in result['Ending Value'].items()}
+    rows["SP500 No Reinvestment Total Dividends"] = result['Total Dividends']
+    rows["SP500 No Reinvestment Final Annual Income"] = result['Final Annual Income']
+    summary = pd.DataFrame(
+        {label: np.percentile(values, percentiles) for label, values in rows.items()},
+        index=[f"P{p}" for p in percentiles],
+    ).T
+    summary.index.name = "Metric"
+    return summary.reset_index()
+
+
+def percentile_bands(result, strategy, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Returns the value percentiles of one strategy at every year end as a DataFrame
+    indexed by year with one column per percentile.
+    """
+    bands = np.percentile(result['Checkpoints'][strategy], percentiles, axis=0)
+    return pd.DataFrame(bands.T, index=pd.Index(result['Checkpoint Years'], name="Year"),
+                        columns=[f"P{p}" for p in percentiles])
@@ -1,67 +1,90 @@
 # recession_data.py
+from dataclasses import asdict, dataclass
+
 import pandas as pd
-import streamlit as st
 import config  # To access BEGIN_DATE and END_DATE constants
 from data_loader import load_recession_data
+from event_index import EventIndex
+from instrumentation import timed
 
 # November 15
 
 
+@dataclass(frozen=True)
+class RecessionSummary:
+    """
+    Recession statistics of one period (declines and unemployment as decimal fractions).
+    Values are NaN when the period holds no recession (or, for the frequency, a single one).
+    """
+    count: int
+    worst_gdp_decline: float
+    average_days_between: float
+    peak_unemployment: float
+
+    def to_frame(self):
+        """
+        Returns the statistics as a numeric (Metric, Value) DataFrame.
+        """
+        values = asdict(self)
+        return pd.DataFrame({'Metric': list(values), 'Value': [float(value) for value in values.values()]})
+
+
+def build_recession_index(recession_data):
+    """
+    Parses the recession table once into an EventIndex for calculate_recession_metrics.
+
+    Parameters:
+    - recession_data (pd.DataFrame): Recessions as returned by load_recession_data (left unchanged).
+
+    Returns:
+    - EventIndex: Events keyed by 'Begin Date'/'End Date', with the numeric 'Decline (%)' and
+      'Peak Unemployment (%)'.
+    """
+    events = recession_data.copy()
+    events['Begin Date'] = pd.to_datetime(recession_data['Begin Date'])
+    events['End Date'] = pd.to_datetime(recession_data['End Date'])
+
+    values = {
+        'Decline (%)': recession_data['Decline (%)'].to_numpy(dtype=float),
+        'Peak Unemployment (%)': recession_data['Peak Unemployment (%)'].to_numpy(dtype=float),
+    }
+    return EventIndex(events['Begin Date'], events['End Date'], values, events)
+
+
+@timed
 def calculate_recession_metrics(recession_data, start_date, end_date):
-    # Convert dates to datetime format
-    recession_data['Begin Date'] = pd.to_datetime(recession_data['Begin Date'])
-    recession_data['End Date'] = pd.to_datetime(recession_data['End Date'])
-
-    # Filter data for the given date range
-    filtered_recessions = recession_data[
-        (recession_data['Begin Date'] >= start_date) & 
-        (recession_data['End Date'] <= end_date)
-    ].reset_index(drop=True)
-
-    # Calculate metrics
-    num_recessions = len(filtered_recessions)
-    worst_gdp_decline = filtered_recessions['Decline (%)'].min()
-    average_frequency_days = filtered_recessions['Begin Date'].diff().mean().days
-    peak_unemployment = filtered_recessions['Peak Unemployment (%)'].max()
-
-    # Convert frequency from days to years and months
-    average_years = average_frequency_days // 365
-    average_months = (average_frequency_days % 365) // 30
-
-    # Format metrics
-    worst_gdp_decline_formatted = f"{worst_gdp_decline * 100:.1f}%"
-    peak_unemployment_formatted = f"{peak_unemployment * 100:.1f}%"
-
-    # Create summary table
-    summary_table = pd.DataFrame({
-        'Metric': [
-            'Number of Recessions',
-            'Worst GDP Decline (%)',
-            'Average Frequency Between Recessions (Years, Months)',
-            'Peak Unemployment (%)'
-        ],
-        'Value': [
-            num_recessions,
-            worst_gdp_decline_formatted,
-            f"{average_years} years, {average_months} months",
-            peak_unemployment_formatted
-        ]
-    })
-
-    # Format Decline (%) and Peak Unemployment (%) columns
-    filtered_recessions['Decline (%)'] = filtered_recessions['Decline (%)'] * 100
-    filtered_recessions['Decline (%)'] = filtered_recessions['Decline (%)'].apply(lambda x: f"{x:.1f}%")
-
-    filtered_recessions['Peak Unemployment (%)'] = filtered_recessions['Peak Unemployment (%)'] * 100
-    filtered_recessions['Peak Unemployment (%)'] = filtered_recessions['Peak Unemployment (%)'].apply(lambda x: f"{x:.1f}%")
-
-    # Format Begin Date and End Date to remove time component
-    filtered_recessions['Begin Date'] = filtered_recessions['Begin Date'].dt.strftime('%Y-%m-%d')
-    filtered_recessions['End Date'] = filtered_recessions['End Date'].dt.strftime('%Y-%m-%d')
-
-    return summary_table, filtered_recessions
+    """
+    Calculates recession metrics within a specified date range.
+
+    Parameters:
+    - recession_data (EventIndex or pd.DataFrame): Recessions, ideally indexed once with
+      build_recession_index; a DataFrame is indexed on every call.
+    - start_date (str or pd.Timestamp): The start date for filtering recessions.
+    - end_date (str or pd.Timestamp): The end date for filtering recessions.
+
+    Returns:
+    - summary (RecessionSummary): Recession statistics (see formatting.format_recession_summary).
+    - filtered_recessions (pd.DataFrame): The recessions within the date range, with numeric
+      values and datetime dates (see formatting.format_recessions).
+    """
+    if not isinstance(recession_data, EventIndex):
+        recession_data = build_recession_index(recession_data)
+
+    # Recessions within the given date range
+    window = recession_data.window(start_date, end_date)
+
+    summary = RecessionSummary(
+        count=recession_data.count(window),
+        worst_gdp_decline=float(recession_data.minimum('Decline (%)', window)),
+        average_days_between=float(recession_data.mean_start_gap_days(window)),
+        peak_unemployment=float(recession_data.maximum('Peak Unemployment (%)', window)),
+    )
+    return summary, recession_data.rows(window)
 
 if __name__ == "__main__":
+    import streamlit as st
+    from formatting import format_recession_summary, format_recessions
+
     # Load recession data
     recession_data = load_recession_data()
 
@@ -74,6 +97,6 @@ if __name__ == "__main__":
 
     # Display results in Streamlit
     st.write("Recession Summary Table")
-    st.dataframe(recession_metrics_summary)
+    st.dataframe(format_recession_summary(recession_metrics_summary))
     st.write("Recessions During This Period")
-    st.dataframe(recession_filtered_data)
\ No newline at end of file
+    st.dataframe(format_recessions(recession_filtered_data))
\ No newline at end of file
@@ -0,0 +1,179 @@
+# result_cache.py
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from divs import calculate_dividends
+from ltc_bonds import calculate_non_reinvesting_strategy, calculate_reinvesting_strategy
+
+# Investment-normalized result cache.
+#
+# Every dividend and bond result scales linearly with initial_investment, so results are
+# computed once per (begin_date, end_date) for a unit investment and multiplied out when
+# they are displayed. Changing the investment amount is then always a cache hit.
+
+# Dividend result columns that are money amounts (and therefore scale with the investment)
+SCALED_DIVIDEND_COLUMNS = ['Dividend Paid', 'Dividend Reinvested', 'Ending Value', 'Real Ending Value']
+
+# Bond metrics that are money amounts; the relative return factors are investment-independent
+SCALED_BOND_METRICS = [
+    'Total Interest Paid (Nominal)', 'Total Interest Paid (Real)', 'Ending Value (Nominal)', 'Ending Value (Real)'
+]
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used cache that counts hits, misses and evictions.
+
+    Parameters:
+    - maxsize (int): Maximum number of entries kept.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, calling compute() and storing its result on a miss.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, predicate):
+        """
+        Drops every entry whose key satisfies predicate(key).
+
+        Returns:
+        - int: Number of entries removed.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self):
+        """
+        Returns the cache counters as a dict (hits, misses, evictions, size, maxsize, hit rate).
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def window_touches(end_date, first_changed_month):
+    """
+    Returns True if a window ending at end_date includes first_changed_month or a later month,
+    i.e. if its results may differ after the data changed from that month on.
+    """
+    return pd.Timestamp(end_date).to_period('M') >= pd.Timestamp(first_changed_month).to_period('M')
+
+
+def invalidate_windows(cache, first_changed_month):
+    """
+    Drops the cached (begin_date, end_date) results whose window reaches first_changed_month.
+    Windows that end earlier only read unchanged rows and stay cached.
+
+    Returns:
+    - int: Number of entries removed.
+    """
+    return cache.invalidate(lambda key: window_touches(key[1], first_changed_month))
+
+
+def compute_unit_results(data_df, bond_filtered_data, begin_date, end_date, periods_per_year=None):
+    """
+    Computes the dividend and bond results for a unit (1.0) initial investment.
+
+    periods_per_year (rows per year, 12 for monthly data) defaults to the frequency of each
+    dataset; see divs.calculate_dividends and ltc_bonds.calculate_non_reinvesting_strategy.
+
+    Returns:
+    - dict: 'dividends' (calculate_dividends result) and 'bonds' ((non_reinvesting, reinvesting)
+      metrics, or None when the bond window is too short for the bond strategies).
+    """
+    bonds = None
+    if len(bond_filtered_data) >= 2:
+        bonds = (
+            calculate_non_reinvesting_strategy(bond_filtered_data, 1.0, periods_per_year),
+            calculate_reinvesting_strategy(bond_filtered_data, 1.0),
+        )
+    return {
+        'dividends': calculate_dividends(data_df, start_date=begin_date, end_date=end_date, initial_investment=1.0,
+                                         periods_per_year=periods_per_year),
+        'bonds': bonds,
+    }
+
+
+def scale_dividend_results(unit_dividend_results, initial_investment, frames=True):
+    """
+    Scales a unit-investment calculate_dividends result to initial_investment.
+
+    With frames=False only the totals and final values are scaled and the monthly DataFrames are
+    replaced by None, for callers that only read the summary numbers.
+    """
+    scaled = {}
+    for key, (df, total, final_value) in unit_dividend_results.items():
+        if frames:
+            df = df.copy()
+            for column in SCALED_DIVIDEND_COLUMNS:
+                if column in df.columns:
+                    df[column] = df[column] * initial_investment
+        else:
+            df = None
+        scaled[key] = (df, total * initial_investment, final_value * initial_investment)
+    return scaled
+
+
+def scale_bond_metrics(unit_bond_metrics, initial_investment):
+    """
+    Scales unit-investment (non_reinvesting, reinvesting) bond metrics to initial_investment.
+    """
+    if unit_bond_metrics is None:
+        return None
+    return tuple(
+        {name: value * initial_investment if name in SCALED_BOND_METRICS else value for name, value in metrics.items()}
+        for metrics in unit_bond_metrics
+    )
@@ -0,0 +1,181 @@
+# return_matrix.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (
+    load_data, default_cache_dir, read_cache_metadata, write_json_atomic,
+    signature_matches, source_signature, content_hash, CACHE_VERSION,
+)
+from market_dataset import MarketDataset, first_changed_row
+from window_index import month_ordinal
+
+# Precomputed annualized returns for every (begin month, end month) pair.
+#
+# Each series is stored as a square float32 .npy file (row = begin month, column = end
+# month, NaN on and below the diagonal) that the app memory-maps read-only, so a custom
+# date selection is a single cell lookup and every server process shares the same pages.
+# The metadata keeps the log levels the matrix was built from; when months are appended, the
+# block of unchanged months is copied from the previous file and only the new rows and
+# columns are computed.
+
+RETURN_SERIES = {'Nominal': 'Total Return', 'Real': 'Real Total Return'}
+
+# Rows written per block while building, to bound the float64 scratch memory
+BUILD_BLOCK_ROWS = 256
+
+
+def matrix_paths(data_type, filepath='data.xlsx', cache_dir=None):
+    """
+    Returns the (.npy, metadata) paths of one return matrix.
+    """
+    cache_dir = cache_dir or default_cache_dir(filepath)
+    stem = f"{os.path.basename(filepath)}.return_matrix.{data_type.lower()}"
+    return os.path.join(cache_dir, f"{stem}.npy"), os.path.join(cache_dir, f"{stem}.json")
+
+
+def _annualized_block(months, log_level, rows, columns):
+    years = (months[None, columns] - months[rows, None]) / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        block = np.expm1((log_level[None, columns] - log_level[rows, None]) / years)
+    block[years <= 0] = np.nan
+    return block
+
+
+def _reusable_months(npy_path, meta, months, log_level):
+    """
+    Returns how many leading months of an existing matrix still hold for the given levels.
+    """
+    if meta is None or meta.get('version') != CACHE_VERSION or 'log_levels' not in meta:
+        return 0
+    if not os.path.exists(npy_path):
+        return 0
+    previous_levels = np.array(meta['log_levels'], dtype=float)
+    return first_changed_row(meta['months'], {'level': previous_levels}, months, {'level': log_level})
+
+
+def build_return_matrix(data_df, data_type, filepath='data.xlsx', cache_dir=None):
+    """
+    Materializes the annualized return matrix of one series and writes it next to the data cache.
+
+    If a matrix built from the same leading months already exists, its cells between those
+    months are copied over and only the cells involving later months are computed.
+
+    Parameters:
+    - data_df (MarketDataset or pd.DataFrame): Market data.
+    - data_type (str): "Nominal" (Total Return) or "Real" (Real Total Return).
+    - filepath (str): Source workbook the data came from; its signature is stored for invalidation.
+    - cache_dir (str, optional): Directory for the matrix files.
+
+    Returns:
+    - str: Path of the written .npy file.
+    """
+    npy_path, meta_path = matrix_paths(data_type, filepath, cache_dir)
+    os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+
+    dataset = MarketDataset.coerce(data_df)
+    months = dataset.months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_level = np.log(dataset[RETURN_SERIES[data_type]])
+    n = len(months)
+
+    reused = _reusable_months(npy_path, read_cache_metadata(meta_path), months, log_level)
+    previous = np.load(npy_path, mmap_mode='r') if reused else None
+
+    tmp_path = f"{npy_path}.tmp.npy"
+    matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(n, n))
+    for start in range(0, n, BUILD_BLOCK_ROWS):
+        rows = slice(start, min(start + BUILD_BLOCK_ROWS, n))
+        first_column = reused if rows.stop <= reused else 0
+        if first_column:
+            matrix[rows, :first_column] = previous[rows, :first_column]
+        matrix[rows, first_column:] = _annualized_block(months, log_level, rows, slice(first_column, n))
+    matrix.flush()
+    del matrix, previous
+    os.replace(tmp_path, npy_path)
+
+    write_json_atomic(meta_path, {
+        'version': CACHE_VERSION,
+        'series': RETURN_SERIES[data_type],
+        'months': months.tolist(),
+        'log_levels': log_level.tolist(),
+        'sha256': content_hash(filepath),
+        **source_signature(filepath),
+    })
+    return npy_path
+
+
+class ReturnMatrix:
+    """
+    Read-only, memory-mapped view of an annualized return matrix.
+
+    Parameters:
+    - matrix (np.ndarray): Square (begin month, end month) matrix, typically an np.memmap.
+    - months (np.ndarray): Integer month ordinals labelling both axes.
+    """
+
+    def __init__(self, matrix, months):
+        self.matrix = matrix
+        self.months = np.asarray(months, dtype=np.int64)
+
+    def _position(self, date, side):
+        ordinal = month_ordinal(date, side)
+        if side == 'begin':
+            return int(np.searchsorted(self.months, ordinal, side='left'))
+        return int(np.searchsorted(self.months, ordinal, side='right')) - 1
+
+    def lookup(self, begin_date, end_date):
+        """
+        Returns the annualized return between two months (NaN if the window is empty or out of range).
+        """
+        b, e = self._position(begin_date, 'begin'), self._position(end_date, 'end')
+        if not (0 <= b < e < len(self.months)):
+            return np.nan
+        return float(self.matrix[b, e])
+
+    def window(self, begin_date, end_date, step=1):
+        """
+        Returns the sub-matrix for begin/end months inside a window, sampled every `step` months,
+        as a DataFrame indexed by begin month with end months as columns.
+        """
+        b, e = self._position(begin_date, 'begin'), self._position(end_date, 'end')
+        positions = np.arange(max(b, 0), e + 1, step)
+        labels = [f"{m // 12}-{m % 12 + 1:02}" for m in self.months[positions]]
+        sub_matrix = self.matrix[np.ix_(positions, positions)]
+        return pd.DataFrame(sub_matrix, index=pd.Index(labels, name='Begin'), columns=pd.Index(labels, name='End'))
+
+
+def load_return_matrix(data_type, filepath='data.xlsx', cache_dir=None, data_df=None):
+    """
+    Memory-maps a return matrix, building it first when it is missing or stale.
+
+    Parameters:
+    - data_type (str): "Nominal" or "Real".
+    - filepath (str): Source workbook.
+    - cache_dir (str, optional): Directory for the matrix files.
+    - data_df (MarketDataset or pd.DataFrame, optional): Already-loaded market data used if a rebuild is needed.
+
+    Returns:
+    - ReturnMatrix: The memory-mapped matrix.
+    """
+    npy_path, meta_path = matrix_paths(data_type, filepath, cache_dir)
+    meta = read_cache_metadata(meta_path)
+    fresh, sha256 = signature_matches(filepath, meta)
+    if not (fresh and os.path.exists(npy_path)):
+        build_return_matrix(data_df if data_df is not None else load_data(filepath), data_type, filepath, cache_dir)
+        meta = read_cache_metadata(meta_path)
+    elif sha256 is not None:
+        write_json_atomic(meta_path, {**meta, **source_signature(filepath)})
+    return ReturnMatrix(np.load(npy_path, mmap_mode='r'), meta['months'])
+
+
+if __name__ == "__main__":
+    # Build step: python return_matrix.py [data.xlsx]
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data.xlsx'
+    market_data = load_data(source)
+    for series_type in RETURN_SERIES:
+        path = build_return_matrix(market_data, series_type, source)
+        print(f"Wrote {series_type} return matrix to '{path}'.")
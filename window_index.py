@@ -0,0 +1,339 @@
+# window_index.py
+import numpy as np
+import pandas as pd
+
+from market_dataset import MarketDataset, first_changed_row
+
+# Prefix-product / prefix-sum index over the monthly market and bond data.
+#
+# Every value the app reports for a (begin_date, end_date) window is either a ratio of a
+# level series between two months or a sum of a monthly cash-flow series over the window.
+# Storing log levels and prefix sums once lets any window be answered by two array lookups
+# instead of filtering a DataFrame.
+
+# Level series (value column, dividend column, price column) behind each divs.py strategy
+DIVIDEND_STRATEGIES = {
+    "Nominal_No_Reinvestment": ('Composite', 'Nominal Dividends', 'Composite'),
+    "Nominal_With_Reinvestment": ('Total Return', 'Nominal Dividends', 'Composite'),
+    "Real_No_Reinvestment": ('Real Composite', 'Real Dividends', 'Real Composite'),
+    "Real_With_Reinvestment": ('Real Total Return', 'Real Dividends', 'Real Composite'),
+}
+
+BOND_LEVEL_COLUMNS = {'Nominal': 'nominal_total_return', 'Real': 'real_total_return'}
+BOND_INTEREST_COLUMNS = {'Nominal': 'nominal_interest', 'Real': 'real_interest'}
+
+# Market data columns whose window ratios are answered from log levels
+STOCK_LEVEL_COLUMNS = ['Composite', 'Total Return', 'Real Composite', 'Real Total Return', 'CPI']
+
+
+def month_ordinal(date, side='begin'):
+    """
+    Converts a date to an integer month count (year * 12 + month - 1).
+
+    Monthly rows are dated on the first of the month, so a begin date part-way through a
+    month selects the following month (side='begin') while an end date selects its own
+    month (side='end') -- the same rows `df['Date'] >= start` / `<= end` keeps.
+    """
+    ts = pd.Timestamp(date)
+    ordinal = ts.year * 12 + ts.month - 1
+    if side == 'begin' and ts > pd.Timestamp(year=ts.year, month=ts.month, day=1):
+        ordinal += 1
+    return ordinal
+
+
+def month_ordinals(dates):
+    """
+    Converts a Series/array of dates ('YYYY-MM' strings or datetimes) to integer month counts.
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+
+
+def months_to_dates(months):
+    """
+    Converts integer month counts back to dates on the first of each month (the inverse of
+    month_ordinals).
+    """
+    months = np.asarray(months)
+    return pd.DatetimeIndex(pd.to_datetime({'year': months // 12, 'month': months % 12 + 1, 'day': 1}))
+
+
+def _prefix_sum(values):
+    """
+    Returns (prefix sums, prefix NaN counts), both of length len(values) + 1.
+    """
+    missing = np.isnan(values)
+    prefix = np.zeros(len(values) + 1)
+    np.cumsum(np.where(missing, 0.0, values), out=prefix[1:])
+    nan_count = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(missing, out=nan_count[1:])
+    return prefix, nan_count
+
+
+class _MonthlyArrays:
+    """
+    Log levels and prefix sums for one monthly table, addressed by integer position.
+    """
+
+    def __init__(self, months, columns):
+        self.months = months
+        self.first_month = int(months[0]) if len(months) else 0
+        self.contiguous = bool(len(months) == 0 or np.all(np.diff(months) == 1))
+        self.values = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        self.log_levels = {}
+        self.prefix_sums = {}
+
+    def __len__(self):
+        return len(self.months)
+
+    def add_log_level(self, name):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.log_levels[name] = np.log(self.values[name])
+
+    def add_prefix_sum(self, name, values):
+        self.prefix_sums[name] = _prefix_sum(np.asarray(values, dtype=float))
+
+    def extended(self, months, columns, start, flows):
+        """
+        Returns the arrays of a table that matches this one before row `start` (e.g. the same
+        months plus appended ones): the log levels and prefix sums of the rows before start are
+        reused and only the rest are computed.
+
+        Parameters:
+        - months, columns: The updated table, as passed to the constructor.
+        - start (int): First row that differs from this table.
+        - flows (dict): Prefix-sum name -> monthly values of the rows from start on.
+        """
+        arrays = _MonthlyArrays(months, columns)
+        for name, log_level in self.log_levels.items():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tail = np.log(arrays.values[name][start:])
+            arrays.log_levels[name] = np.concatenate([log_level[:start], tail])
+        for name, (prefix, nan_count) in self.prefix_sums.items():
+            tail_prefix, tail_nan_count = _prefix_sum(np.asarray(flows[name], dtype=float))
+            arrays.prefix_sums[name] = (
+                np.concatenate([prefix[:start], prefix[start] + tail_prefix]),
+                np.concatenate([nan_count[:start], nan_count[start] + tail_nan_count]),
+            )
+        return arrays
+
+    def position(self, ordinal, side):
+        """
+        Maps month ordinals to row positions: the first row at/after a begin month or the
+        last row at/before an end month. Constant time for contiguous monthly data.
+        """
+        ordinal = np.asarray(ordinal, dtype=np.int64)
+        if self.contiguous:
+            pos = ordinal - self.first_month
+        elif side == 'begin':
+            pos = np.searchsorted(self.months, ordinal, side='left')
+        else:
+            pos = np.searchsorted(self.months, ordinal, side='right') - 1
+        return np.clip(pos, 0, len(self) - 1) if side == 'begin' else np.clip(pos, -1, len(self) - 1)
+
+    def window(self, begin_date, end_date):
+        b = int(self.position(month_ordinal(begin_date, 'begin'), 'begin'))
+        e = int(self.position(month_ordinal(end_date, 'end'), 'end'))
+        if len(self) == 0 or e < b or self.months[b] < month_ordinal(begin_date, 'begin'):
+            raise ValueError(f"No data available between {begin_date} and {end_date}.")
+        return b, e
+
+    def windows(self, begin_months, end_months):
+        """
+        Vectorized window(): row positions of many windows given as begin/end month ordinals.
+        Returns (b, e, valid); windows without rows are not valid and get positions 0.
+        """
+        begin_months = np.asarray(begin_months, dtype=np.int64)
+        if len(self) == 0:
+            zeros = np.zeros(len(begin_months), dtype=np.int64)
+            return zeros, zeros, np.zeros(len(begin_months), dtype=bool)
+        b = self.position(begin_months, 'begin')
+        e = self.position(end_months, 'end')
+        valid = (e >= b) & (self.months[b] >= begin_months)
+        return np.where(valid, b, 0), np.where(valid, e, 0), valid
+
+    def growth(self, name, b, e):
+        log_level = self.log_levels[name]
+        return np.exp(log_level[e] - log_level[b])
+
+    def window_sum(self, name, b, e):
+        prefix, nan_count = self.prefix_sums[name]
+        total = prefix[np.asarray(e) + 1] - prefix[b]
+        return np.where(nan_count[np.asarray(e) + 1] - nan_count[b] > 0, np.nan, total)
+
+
+def _stock_columns(dataset):
+    return {col: dataset[col] for col in dataset.columns if col != 'Date Fraction'}
+
+
+def _dividend_flows(columns, rows=slice(None)):
+    # Dividend paid in month i is (D_i / P_i / 12) * initial * V_i / V_b, so the window total
+    # is initial / V_b times a window sum of (D / P / 12) * V.
+    flows = {}
+    for strategy, (value_col, dividend_col, price_col) in DIVIDEND_STRATEGIES.items():
+        if {value_col, dividend_col, price_col} <= set(columns):
+            flows[strategy] = (columns[dividend_col][rows] / columns[price_col][rows]) / 12 * columns[value_col][rows]
+    return flows
+
+
+def _bond_columns(bond_df):
+    return {col: bond_df[col].to_numpy(dtype=float)
+            for col in list(BOND_LEVEL_COLUMNS.values()) + list(BOND_INTEREST_COLUMNS.values())}
+
+
+class WindowIndex:
+    """
+    Precomputed index answering window queries over the monthly dataset in constant time.
+
+    Parameters:
+    - data_df (MarketDataset or pd.DataFrame): Market data (needs the columns used by divs.py).
+    - bond_df (pd.DataFrame, optional): Bond data as returned by ltc_bonds.load_data.
+
+    All query methods take begin/end dates (anything pd.Timestamp accepts) and select the same
+    rows as the DataFrame filters in divs.py and main.py. The *_at variants take integer row
+    positions (scalars or NumPy arrays) so many windows can be evaluated in one call.
+    """
+
+    def __init__(self, data_df, bond_df=None):
+        dataset = MarketDataset.coerce(data_df)
+        columns = _stock_columns(dataset)
+        self.stocks = _MonthlyArrays(dataset.months, columns)
+        for col in STOCK_LEVEL_COLUMNS:
+            if col in columns:
+                self.stocks.add_log_level(col)
+        for strategy, monthly in _dividend_flows(columns).items():
+            self.stocks.add_prefix_sum(strategy, monthly)
+
+        self.bonds = None
+        if bond_df is not None:
+            self.bonds = self._bond_arrays(bond_df)
+
+    @staticmethod
+    def _bond_arrays(bond_df):
+        bond_columns = _bond_columns(bond_df)
+        bonds = _MonthlyArrays(month_ordinals(bond_df['date']), bond_columns)
+        for col in BOND_LEVEL_COLUMNS.values():
+            bonds.add_log_level(col)
+        for col in BOND_INTEREST_COLUMNS.values():
+            bonds.add_prefix_sum(col, bond_columns[col])
+        return bonds
+
+    def extended(self, data_df, bond_df=None):
+        """
+        Returns an index over updated data, computing only the rows from the first month that
+        differs from the data this index was built on. When a month is appended that is just the
+        new row; a revised earlier row recomputes from there on.
+
+        Parameters:
+        - data_df (MarketDataset or pd.DataFrame): Updated market data.
+        - bond_df (pd.DataFrame, optional): Updated bond data; None keeps the current bond arrays.
+
+        Returns:
+        - WindowIndex: A new index; this one is left unchanged for readers still using it.
+        """
+        dataset = MarketDataset.coerce(data_df)
+        columns = _stock_columns(dataset)
+        start = first_changed_row(self.stocks.months, self.stocks.values, dataset.months, columns)
+        index = object.__new__(WindowIndex)
+        index.stocks = self.stocks.extended(dataset.months, columns, start,
+                                            _dividend_flows(columns, slice(start, None)))
+
+        index.bonds = self.bonds
+        if bond_df is not None and self.bonds is None:
+            index.bonds = self._bond_arrays(bond_df)
+        elif bond_df is not None:
+            months, bond_columns = month_ordinals(bond_df['date']), _bond_columns(bond_df)
+            start = first_changed_row(self.bonds.months, self.bonds.values, months, bond_columns)
+            interest = {col: bond_columns[col][start:] for col in BOND_INTEREST_COLUMNS.values()}
+            index.bonds = self.bonds.extended(months, bond_columns, start, interest)
+        return index
+
+    # -----------------------------
+    # Window positions
+    # -----------------------------
+
+    def stock_window(self, begin_date, end_date):
+        """
+        Returns the (begin, end) row positions of a window in the market data.
+        """
+        return self.stocks.window(begin_date, end_date)
+
+    def bond_window(self, begin_date, end_date):
+        """
+        Returns the (begin, end) row positions of a window in the bond data.
+        """
+        if self.bonds is None:
+            raise ValueError("WindowIndex was built without bond data.")
+        return self.bonds.window(begin_date, end_date)
+
+    def stock_windows(self, begin_dates, end_dates):
+        """
+        Returns the (begin, end, valid) row position arrays of many market data windows given as
+        'YYYY-MM' months, for the *_at queries. Windows without rows have valid False.
+        """
+        return self.stocks.windows(month_ordinals(begin_dates), month_ordinals(end_dates))
+
+    def bond_windows(self, begin_dates, end_dates):
+        """
+        Returns the (begin, end, valid) row position arrays of many bond data windows (see stock_windows).
+        """
+        if self.bonds is None:
+            raise ValueError("WindowIndex was built without bond data.")
+        return self.bonds.windows(month_ordinals(begin_dates), month_ordinals(end_dates))
+
+    # -----------------------------
+    # Position-based (vectorized) queries
+    # -----------------------------
+
+    def increase_factor_at(self, column, b, e):
+        values = self.stocks.values[column]
+        return values[e] / values[b]
+
+    def ending_value_at(self, strategy, b, e, initial_investment=10000):
+        value_col = DIVIDEND_STRATEGIES[strategy][0]
+        return initial_investment * self.stocks.growth(value_col, b, e)
+
+    def total_dividends_at(self, strategy, b, e, initial_investment=10000):
+        value_col = DIVIDEND_STRATEGIES[strategy][0]
+        return initial_investment / self.stocks.values[value_col][b] * self.stocks.window_sum(strategy, b, e)
+
+    def bond_ending_value_at(self, data_type, b, e, initial_investment=10000):
+        return initial_investment * self.bonds.growth(BOND_LEVEL_COLUMNS[data_type], b, e)
+
+    def bond_total_interest_at(self, data_type, b, e, initial_investment=10000):
+        # Annual interest rates paid monthly, as in ltc_bonds.calculate_non_reinvesting_strategy
+        return initial_investment * self.bonds.window_sum(BOND_INTEREST_COLUMNS[data_type], b, e) / 12
+
+    # -----------------------------
+    # Date-based queries
+    # -----------------------------
+
+    def increase_factor(self, column, begin_date, end_date):
+        """
+        Returns end / begin value of any market data column over the window.
+        """
+        return self.increase_factor_at(column, *self.stock_window(begin_date, end_date))
+
+    def ending_value(self, strategy, begin_date, end_date, initial_investment=10000):
+        """
+        Returns the final ending value of a divs.py strategy (e.g. "Nominal_With_Reinvestment").
+        """
+        return self.ending_value_at(strategy, *self.stock_window(begin_date, end_date), initial_investment)
+
+    def total_dividends(self, strategy, begin_date, end_date, initial_investment=10000):
+        """
+        Returns the total dividends paid/reinvested by a divs.py strategy over the window.
+        """
+        return self.total_dividends_at(strategy, *self.stock_window(begin_date, end_date), initial_investment)
+
+    def bond_ending_value(self, data_type, begin_date, end_date, initial_investment=10000):
+        """
+        Returns the reinvested bond ending value ("Nominal" or "Real") over the window.
+        """
+        return self.bond_ending_value_at(data_type, *self.bond_window(begin_date, end_date), initial_investment)
+
+    def bond_total_interest(self, data_type, begin_date, end_date, initial_investment=10000):
+        """
+        Returns the total bond interest paid without reinvestment ("Nominal" or "Real") over the window.
+        """
+        return self.bond_total_interest_at(data_type, *self.bond_window(begin_date, end_date), initial_investment)
@@ -0,0 +1,96 @@
+# withdrawals.py
+import numpy as np
+import pandas as pd
+
+from window_index import months_to_dates
+
+# Historical safe withdrawal rates for every retirement start month.
+#
+# A portfolio of stocks (Real Total Return) and bonds (real_total_return) is rebalanced to a fixed
+# stock allocation every month and pays a constant real withdrawal at the start of each month.
+# With P_k the real growth of the portfolio over the first k months, the value after n months is
+#
+#     V_n = P_n * (V_0 - W * sum_{k<n} 1 / P_k),
+#
+# so the portfolio lasts the horizon exactly when W <= V_0 / sum_{k<horizon} 1 / P_k. Writing P_k
+# as a ratio of one portfolio level series turns that sum into a difference of prefix sums of
+# 1 / level, which gives the maximum withdrawal of every start month in one vectorized pass.
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def portfolio_levels(monthly_returns, stock_allocation):
+    """
+    Returns the real level of a monthly rebalanced stock/bond portfolio (1.0 at the first month).
+
+    Parameters:
+    - monthly_returns (dict): Output of monte_carlo.build_monthly_returns.
+    - stock_allocation (float): Share of stocks between 0 and 1, the rest in bonds.
+
+    Returns:
+    - np.ndarray: One level per month, one longer than the monthly return arrays.
+    """
+    if not 0 <= stock_allocation <= 1:
+        raise ValueError("stock_allocation must be between 0 and 1.")
+    growth = stock_allocation * monthly_returns['real_total'] + (1 - stock_allocation) * monthly_returns['real_bond']
+    levels = np.ones(len(growth) + 1)
+    np.cumprod(growth, out=levels[1:])
+    return levels
+
+
+def calculate_safe_withdrawal_rates(monthly_returns, horizon_months, stock_allocation=0.6):
+    """
+    Solves the maximum constant real withdrawal for every historical start month.
+
+    Parameters:
+    - monthly_returns (dict): Output of monte_carlo.build_monthly_returns.
+    - horizon_months (int): Retirement length in months (>= 1).
+    - stock_allocation (float): Share of stocks between 0 and 1, the rest in bonds.
+
+    Returns:
+    - dict: 'Start Date' (pd.DatetimeIndex of the retirement start months), 'End Date' (the month
+      after the last withdrawal) and 'Withdrawal Rate' (NumPy array of the maximum annual real
+      withdrawal as a fraction of the initial portfolio, i.e. 12 monthly withdrawals).
+    """
+    if horizon_months < 1:
+        raise ValueError("horizon_months must be at least 1.")
+    levels = portfolio_levels(monthly_returns, stock_allocation)
+    n_cohorts = len(levels) - horizon_months
+    if n_cohorts <= 0:
+        raise ValueError(f"Not enough data for a {horizon_months}-month horizon.")
+
+    # sum_{k<horizon} level[s] / level[s + k] for every start position s
+    inverse_prefix = np.zeros(len(levels) + 1)
+    np.cumsum(1 / levels, out=inverse_prefix[1:])
+    starts = np.arange(n_cohorts)
+    discount_sum = levels[starts] * (inverse_prefix[starts + horizon_months] - inverse_prefix[starts])
+
+    # build_monthly_returns dates each ratio by the month it ends in
+    first_month = int(monthly_returns['months'][0]) - 1
+    return {
+        'Start Date': months_to_dates(first_month + starts),
+        'End Date': months_to_dates(first_month + starts + horizon_months),
+        'Withdrawal Rate': 12 / discount_sum,
+    }
+
+
+def withdrawal_rate_summary(results, percentiles=PERCENTILES):
+    """
+    Summarizes the safe withdrawal rates of calculate_safe_withdrawal_rates.
+
+    Returns:
+    - pd.DataFrame: 'Metric' and numeric 'Value' (annual rate as a fraction) for the minimum, the
+      given percentiles and the maximum across start months.
+    """
+    rates = results['Withdrawal Rate']
+    return pd.DataFrame({
+        'Metric': ['Minimum', *[f"P{p}" for p in percentiles], 'Maximum'],
+        'Value': [rates.min(), *np.percentile(rates, percentiles), rates.max()],
+    })
+
+
+def worst_start_date(results):
+    """
+    Returns the start month with the lowest safe withdrawal rate.
+    """
+    return results['Start Date'][int(np.argmin(results['Withdrawal Rate']))]